@@ -57,7 +57,14 @@ async def get_current_user_optional(
     if not credentials:
         return None
     
-    token = credentials.credentials
+    return get_user_by_token(credentials.credentials)
+
+
+def get_user_by_token(token: str) -> dict | None:
+    """按令牌获取已启用的用户，令牌无效时返回None（用于无法携带Authorization头的WebSocket连接）"""
+    if not token:
+        return None
+    
     token_data = AuthService.verify_token(token)
     
     if token_data is None:
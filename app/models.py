@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, EmailStr
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 
 
@@ -11,6 +11,7 @@ class ApiInfo(BaseModel):
     request_example: str = Field(..., description="请求报文示例")
     response_example: str = Field(..., description="响应报文示例")
     database_tables: List[str] = Field(default_factory=list, description="关联数据库表DDL列表")
+    table_refs: List[str] = Field(default_factory=list, description="引用DDL目录中已登记的表名（可用 表名@哈希前缀 固定版本）")
 
 
 class PromptRequest(BaseModel):
@@ -18,11 +19,21 @@ class PromptRequest(BaseModel):
     apis: List[ApiInfo] = Field(..., min_items=1, description="接口信息列表")
 
 
+class DdlCatalogRegister(BaseModel):
+    """DDL目录登记请求模型"""
+    ddl: str = Field(..., min_length=1, description="一条或多条CREATE TABLE语句")
+
+
 class PromptResponse(BaseModel):
     """Prompt生成响应模型"""
     success: bool = Field(description="是否成功")
     prompt: Optional[str] = Field(None, description="生成的prompt内容")
     error: Optional[str] = Field(None, description="错误信息")
+    resolved_fields: Optional[int] = Field(None, description="根据DDL在本地匹配到数据库字段的响应字段数")
+    total_fields: Optional[int] = Field(None, description="响应字段总数")
+    remembered_fields: Optional[int] = Field(None, description="由字段映射记忆预先填写的响应字段数")
+    token_estimates: Optional[List[Dict[str, Any]]] = Field(None, description="每次AI调用压缩前后的token估算")
+    chunking: Optional[Dict[str, Any]] = Field(None, description="响应参数表AI填充的分块情况")
 
 
 class FieldInfo(BaseModel):
@@ -138,4 +149,25 @@ class AITestResponse(BaseModel):
     error: Optional[str] = Field(None, description="错误信息")
     test_message: Optional[str] = Field(None, description="发送的测试消息")
     ai_model: Optional[str] = Field(None, description="使用的AI模型")
-    response_time: Optional[float] = Field(None, description="响应时间（秒）")
\ No newline at end of file
+    response_time: Optional[float] = Field(None, description="响应时间（秒）")
+
+class AIProfileCreate(BaseModel):
+    """AI服务配置档案创建模型（一个用户可以配置多个档案）"""
+    name: str = Field(..., min_length=1, max_length=50, description="配置名称")
+    api_type: str = Field(..., description="API类型", pattern="^(openai|deepseek)$")
+    api_url: str = Field(..., description="API URL地址")
+    api_key: str = Field(..., description="API密钥")
+    model_name: str = Field(..., description="模型名称")
+    is_small_model: bool = Field(False, description="是否为低成本快速模型（用于小型请求）")
+    enabled: bool = Field(True, description="是否参与路由")
+
+
+class AIProfileUpdate(BaseModel):
+    """AI服务配置档案更新模型"""
+    name: Optional[str] = Field(None, min_length=1, max_length=50, description="配置名称")
+    api_type: Optional[str] = Field(None, description="API类型", pattern="^(openai|deepseek)$")
+    api_url: Optional[str] = Field(None, description="API URL地址")
+    api_key: Optional[str] = Field(None, description="API密钥")
+    model_name: Optional[str] = Field(None, description="模型名称")
+    is_small_model: Optional[bool] = Field(None, description="是否为低成本快速模型")
+    enabled: Optional[bool] = Field(None, description="是否参与路由")
@@ -3,14 +3,18 @@
 用于快速修复404问题
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from pydantic import BaseModel
 from typing import Optional, Dict, Any
+import asyncio
 import json
 import time
 import httpx
 from app.dependencies import get_current_user
 from app.storage import get_storage
+from app.models import AIProfileCreate, AIProfileUpdate
+from app.services.ai_router import get_ai_router
+from app.services.usage_service import get_usage_tracker
 
 router = APIRouter(prefix="/ai", tags=["AI配置"])
 
@@ -77,6 +81,78 @@ async def update_ai_config(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"配置更新失败: {str(e)}")
 
+@router.get("/profiles")
+async def list_ai_profiles(current_user: dict = Depends(get_current_user)):
+    """获取当前用户的全部AI服务档案及路由统计（不包含密钥）"""
+    return {"profiles": get_ai_router().get_user_profile_stats(current_user['id'])}
+
+@router.post("/profiles", status_code=status.HTTP_201_CREATED)
+async def create_ai_profile(
+    profile: AIProfileCreate,
+    current_user: dict = Depends(get_current_user)
+):
+    """新增AI服务档案"""
+    try:
+        storage = get_storage()
+        created = storage.add_user_ai_profile(current_user['id'], profile.dict())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if not created:
+        raise HTTPException(status_code=500, detail="AI服务档案创建失败")
+    
+    return {"message": "AI服务档案创建成功", "id": created['id']}
+
+@router.put("/profiles/{profile_id}")
+async def update_ai_profile(
+    profile_id: int,
+    profile: AIProfileUpdate,
+    current_user: dict = Depends(get_current_user)
+):
+    """更新AI服务档案"""
+    updates = {k: v for k, v in profile.dict().items() if v is not None}
+    try:
+        storage = get_storage()
+        updated = storage.update_user_ai_profile(current_user['id'], profile_id, updates)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if not updated:
+        raise HTTPException(status_code=404, detail="AI服务档案不存在")
+    
+    return {"message": "AI服务档案更新成功"}
+
+@router.delete("/profiles/{profile_id}")
+async def delete_ai_profile(
+    profile_id: int,
+    current_user: dict = Depends(get_current_user)
+):
+    """删除AI服务档案"""
+    storage = get_storage()
+    if not storage.delete_user_ai_profile(current_user['id'], profile_id):
+        raise HTTPException(status_code=404, detail="AI服务档案不存在")
+    
+    return {"message": "AI服务档案删除成功"}
+
+@router.get("/usage")
+async def get_ai_usage(
+    group_by: str = Query("model,stage", description="分组维度，逗号分隔：day、model、stage"),
+    days: int = Query(7, ge=1, le=365, description="统计最近多少天"),
+    current_user: dict = Depends(get_current_user)
+):
+    """获取当前用户的AI调用用量统计（token、上游延迟、首字节时间、状态）"""
+    fields = [field.strip() for field in group_by.split(",") if field.strip()]
+    invalid = [field for field in fields if field not in ("day", "model", "stage")]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"不支持的分组维度: {', '.join(invalid)}")
+    
+    return {
+        "group_by": fields,
+        "days": days,
+        # 读取统计文件是阻塞操作，在线程中执行
+        "items": await asyncio.to_thread(get_usage_tracker().query, current_user['id'], fields, days)
+    }
+
 @router.post("/test", response_model=SimpleAITestResponse)
 async def test_ai_connection(
     test_request: SimpleAITestRequest = SimpleAITestRequest(),
@@ -0,0 +1,294 @@
+"""
+批量转译路由模块
+上传接口文档创建批量任务，查询任务进度（支持Server-Sent Events实时推送）、取消/重试任务以及导出结果
+"""
+
+from fastapi import APIRouter, Depends, File, Form, Header, HTTPException, UploadFile
+from fastapi.responses import StreamingResponse
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+import asyncio
+import json
+import re
+import shutil
+from urllib.parse import quote
+
+from app.dependencies import get_current_user
+from app.services.batch_jobs import (
+    get_batch_job_queue, JOB_ACTIVE_STATUSES, JOB_MODES, MODE_AI, BATCH_UPLOAD_MAX_BYTES
+)
+from app.services.zip_stream import ZipManifest, ZipTooLargeError
+
+router = APIRouter(prefix="/batch-translation", tags=["批量转译"])
+
+# 上传文件每次读取的字节数
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# 进度推送在没有变化时发送心跳的间隔（秒）
+PROGRESS_KEEPALIVE_SECONDS = 15
+# 缓存的ZIP导出清单数（断点续传的后续请求不必重新计算各文件的CRC）
+ZIP_MANIFEST_CACHE_SIZE = 16
+# ZIP中文件名的接口名称部分的最大长度
+ZIP_NAME_MAX_LENGTH = 80
+
+# (任务ID, 修订号) -> ZIP导出清单
+_zip_manifests: "OrderedDict[Tuple[str, int], ZipManifest]" = OrderedDict()
+
+
+async def _get_owned_job(job_id: str, current_user: dict) -> dict:
+    """获取当前用户的任务（在线程中查询），不存在时返回404"""
+    job = await asyncio.to_thread(get_batch_job_queue().store.get_job, current_user['id'], job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return job
+
+
+@router.post("/jobs")
+async def create_batch_job(
+    files: List[UploadFile] = File(..., description="接口文档（JSON或JSON Lines）"),
+    name: str = Form("", description="任务名称"),
+    mode: str = Form(MODE_AI, description="生成方式：ai（AI增强）或 basic（基础版本）"),
+    current_user: dict = Depends(get_current_user)
+):
+    """上传接口文档并创建批量转译任务，任务在后台执行"""
+    if mode not in JOB_MODES:
+        raise HTTPException(status_code=400, detail=f"不支持的生成方式: {mode}")
+
+    queue = get_batch_job_queue()
+    staging = await asyncio.to_thread(queue.staging_dir)
+    saved = []
+    try:
+        # 分块写入磁盘（文件操作在线程中执行），不在内存中保存整个文件
+        for index, upload in enumerate(files):
+            path = queue.upload_path(staging, index, upload.filename or "")
+            size = 0
+            f = await asyncio.to_thread(open, path, "wb")
+            try:
+                while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > BATCH_UPLOAD_MAX_BYTES:
+                        raise ValueError(f"文件 {upload.filename} 超过 {BATCH_UPLOAD_MAX_BYTES // (1024 * 1024)}MB")
+                    await asyncio.to_thread(f.write, chunk)
+            finally:
+                await asyncio.to_thread(f.close)
+            saved.append(path)
+    except Exception as e:
+        await asyncio.to_thread(shutil.rmtree, staging, ignore_errors=True)
+        if isinstance(e, ValueError):
+            raise HTTPException(status_code=400, detail=str(e))
+        raise
+    finally:
+        for upload in files:
+            await upload.close()
+
+    try:
+        job = await queue.submit(current_user['id'], name.strip() or queue.original_name(saved[0]), mode, staging, saved)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    print(f"批量转译任务已创建: {job['id']}，接口数: {job['total']}")
+    return {"success": True, "job": job}
+
+
+@router.get("/jobs")
+async def list_batch_jobs(current_user: dict = Depends(get_current_user)):
+    """当前用户的批量任务（最新的在前）"""
+    return {"success": True, "jobs": await asyncio.to_thread(get_batch_job_queue().store.list_jobs, current_user['id'])}
+
+
+@router.get("/jobs/{job_id}")
+async def get_batch_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    """任务详情及各接口的状态（不含生成的Prompt）"""
+    job = await _get_owned_job(job_id, current_user)
+    items = await asyncio.to_thread(get_batch_job_queue().store.list_items, job_id)
+    return {"success": True, "job": job, "items": items}
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_batch_job_events(
+    job_id: str,
+    since: int = 0,
+    last_event_id: Optional[str] = Header(None),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    以Server-Sent Events推送任务进度
+
+    每个 progress 事件包含任务信息和自上次推送以来状态变化的接口，事件ID为任务的修订号；
+    断线重连时通过 Last-Event-ID（或 since 参数）只接收之后的变化。任务结束后发送 done 事件
+    """
+    await _get_owned_job(job_id, current_user)
+    queue = get_batch_job_queue()
+    if last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+
+    async def events():
+        revision = since
+        while True:
+            changed = queue.changes()
+            job = await asyncio.to_thread(queue.store.get_job, current_user['id'], job_id)
+            if job is None:
+                yield "event: deleted\ndata: {}\n\n"
+                return
+            if job["rev"] > revision:
+                items = await asyncio.to_thread(queue.store.list_items, job_id, revision)
+                data = {"job": job, "items": items}
+                yield f"id: {job['rev']}\nevent: progress\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+                revision = job["rev"]
+            if job["status"] not in JOB_ACTIVE_STATUSES:
+                yield f"event: done\ndata: {json.dumps(job, ensure_ascii=False)}\n\n"
+                return
+            try:
+                await asyncio.wait_for(changed.wait(), PROGRESS_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+
+    return StreamingResponse(
+        events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/jobs/{job_id}/items/{seq}")
+async def get_batch_job_item(job_id: str, seq: int, current_user: dict = Depends(get_current_user)):
+    """单个接口的结果（含生成的Prompt）"""
+    await _get_owned_job(job_id, current_user)
+    item = await asyncio.to_thread(get_batch_job_queue().store.get_item, job_id, seq)
+    if item is None:
+        raise HTTPException(status_code=404, detail="接口不存在")
+    return {"success": True, "item": item}
+
+
+@router.get("/jobs/{job_id}/export")
+async def export_batch_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    """把生成成功的Prompt按接口顺序合并为一个Markdown文件下载"""
+    job = await _get_owned_job(job_id, current_user)
+    store = get_batch_job_queue().store
+
+    # 同步生成器由 StreamingResponse 在线程池中迭代，分批读取数据库不占用事件循环
+    def content():
+        yield f"# {job['name']}\n\n"
+        for item in store.iter_prompts(job_id):
+            yield f"<!-- {item['file']} #{item['seq'] + 1} {item['name']} {item['route']} -->\n\n"
+            yield item["prompt"].rstrip("\n") + "\n\n---\n\n"
+
+    file_name = quote(f"{job['name']}.md")
+    return StreamingResponse(
+        content(), media_type="text/markdown; charset=utf-8",
+        headers={"Content-Disposition": f"attachment; filename*=UTF-8''{file_name}"}
+    )
+
+
+def _build_zip_manifest(job_id: str) -> ZipManifest:
+    """逐个读取生成成功的Prompt，计算各文件的大小和CRC（不保存内容）"""
+    manifest = ZipManifest()
+    for item in get_batch_job_queue().store.iter_prompts(job_id):
+        name = re.sub(r"[^\w\-]+", "_", item["name"]).strip("_")[:ZIP_NAME_MAX_LENGTH] or "api"
+        manifest.add(item["seq"], f"{item['seq'] + 1:05d}-{name}.md", item["prompt"].encode("utf-8"), item["updated_at"])
+    return manifest
+
+
+async def _get_zip_manifest(job: dict) -> ZipManifest:
+    """获取任务当前修订号的导出清单（任务有变化时重新计算）"""
+    key = (job["id"], job["rev"])
+    manifest = _zip_manifests.get(key)
+    if manifest is None:
+        manifest = await asyncio.to_thread(_build_zip_manifest, job["id"])
+        _zip_manifests[key] = manifest
+        while len(_zip_manifests) > ZIP_MANIFEST_CACHE_SIZE:
+            _zip_manifests.popitem(last=False)
+    else:
+        _zip_manifests.move_to_end(key)
+    return manifest
+
+
+def _parse_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    解析单个字节范围（bytes=start-end、bytes=start-、bytes=-suffix）
+
+    Returns:
+        (start, end)，end含在范围内；没有Range头或为多个范围时返回None（返回整个文件）
+
+    Raises:
+        HTTPException: 范围无法满足（416）
+    """
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        return None
+    first, _, last = range_header[len("bytes="):].strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        else:
+            start, end = max(size - int(last), 0), size - 1
+    except ValueError:
+        return None
+    if start > end or start >= size:
+        raise HTTPException(status_code=416, detail="请求的范围无效", headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+
+@router.get("/jobs/{job_id}/export.zip")
+async def export_batch_job_zip(
+    job_id: str,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    if_range: Optional[str] = Header(None),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    把生成成功的Prompt打包为ZIP下载（每个接口一个Markdown文件）
+
+    ZIP边读取边生成，不在内存中保存整个归档；支持Range请求断点续传，
+    ETag 对应任务的修订号，任务有变化后 If-Range 不匹配时返回完整文件
+    """
+    job = await _get_owned_job(job_id, current_user)
+    try:
+        manifest = await _get_zip_manifest(job)
+    except ZipTooLargeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    size = manifest.size
+    etag = f'"{job_id}-{job["rev"]}"'
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Content-Disposition": f"attachment; filename*=UTF-8''{quote(job['name'] + '.zip')}"
+    }
+    byte_range = _parse_range(range_header, size) if if_range in (None, etag) else None
+    if byte_range is None:
+        start, end, status_code = 0, size - 1, 200
+    else:
+        (start, end), status_code = byte_range, 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+
+    store = get_batch_job_queue().store
+
+    def load(from_seq: int):
+        return ((item["seq"], item["prompt"].encode("utf-8")) for item in store.iter_prompts(job_id, from_seq=from_seq))
+
+    return StreamingResponse(
+        manifest.iter_range(start, end, load), status_code=status_code, media_type="application/zip", headers=headers
+    )
+
+
+@router.post("/jobs/{job_id}/cancel")
+async def cancel_batch_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    """取消任务：尚未开始的接口不再执行"""
+    await _get_owned_job(job_id, current_user)
+    if not await get_batch_job_queue().cancel(job_id):
+        raise HTTPException(status_code=400, detail="任务已结束")
+    return {"success": True}
+
+
+@router.post("/jobs/{job_id}/retry")
+async def retry_batch_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    """重新执行失败和已取消的接口"""
+    await _get_owned_job(job_id, current_user)
+    return {"success": True, "retried": await get_batch_job_queue().retry(job_id)}
+
+
+@router.delete("/jobs/{job_id}")
+async def delete_batch_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    """删除任务、结果和上传的文档"""
+    await _get_owned_job(job_id, current_user)
+    await get_batch_job_queue().delete(job_id)
+    return {"success": True}
@@ -3,16 +3,33 @@ AI Prompt生成器路由模块
 提供Web界面和API接口用于生成AI Prompt模板
 """
 
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import HTMLResponse, FileResponse, StreamingResponse
+from pydantic import ValidationError
+from starlette.requests import ClientDisconnect
+from typing import Any, AsyncIterator, Deque, List, Optional
+from collections import deque
+import asyncio
+import json
 import os
 
-from app.models import PromptRequest, PromptResponse
-from app.services.prompt_service import PromptService
-from app.dependencies import get_current_user
+from app.models import PromptRequest, PromptResponse, DdlCatalogRegister
+from app.services.ai_pipeline import AIPipelineService
+from app.services.section_cache import get_section_cache
+from app.services.ddl_catalog import get_ddl_catalog, DdlCatalogError
+from app.services.ai_jobs import get_ai_job_store, AIJob, AIJobError
+from app.services.batch_render import (
+    get_batch_renderer, render_prompt_item, BatchItem, BATCH_MAX_ITEMS, BATCH_MAX_BODY_BYTES
+)
+from app.services.render_offload import get_render_offloader
+from app.services.prompt_preview import PreviewSession, PreviewError
+from app.dependencies import get_current_user, get_user_by_token
 
 router = APIRouter(prefix="/prompt-generator", tags=["AI Prompt生成器"])
 
+# 任务订阅在没有变化时发送心跳的间隔（秒）
+AI_JOB_KEEPALIVE_SECONDS = 15
+
 
 @router.get("/", response_class=HTMLResponse)
 async def prompt_generator_page():
@@ -43,17 +60,21 @@ async def generate_prompt(
         # 使用当前登录用户作为开发者
         developer = current_user['username']
         
+        # 展开引用的DDL目录表
+        prompt_data = get_ddl_catalog().expand_request(current_user['id'], prompt_data)
+        
         # 打印接收到的数据用于调试
         print(f"接收到的接口数量: {len(prompt_data.apis)}")
         for i, api in enumerate(prompt_data.apis, 1):
             print(f"接口{i}: {api.name}, DDL数量: {len(api.database_tables)}")
         
-        generated_prompt = PromptService.generate_prompt_template(prompt_data, developer)
-        
-        return PromptResponse(
-            success=True,
-            prompt=generated_prompt
+        # 报文较大时在线程池中渲染，避免阻塞事件循环
+        offloader = get_render_offloader()
+        rendered = await offloader.run(
+            offloader.should_offload(prompt_data), render_prompt_item, prompt_data, developer
         )
+        
+        return PromptResponse(success=True, **rendered)
     
     except Exception as e:
         print(f"生成prompt时出错: {str(e)}")
@@ -70,160 +91,347 @@ async def generate_ai_prompt(
 ):
     """使用AI生成增强版Prompt模板"""
     try:
-        # 首先生成基础prompt
-        developer = current_user['username']
-        base_prompt = PromptService.generate_prompt_template(prompt_data, developer)
-        
-        # 检查用户是否配置了AI服务
-        from app.storage import get_storage
-        storage = get_storage()
-        ai_config = storage.get_user_ai_config_with_key(current_user['id'])
-        
-        if not ai_config or not all(field in ai_config and ai_config[field] 
-                                   for field in ["api_type", "api_url", "api_key", "model_name"]):
-            return PromptResponse(
-                success=False,
-                error="请先在个人中心配置AI服务"
-            )
-        
-        # 提取prompt信息用于AI调用
-        prompt_info = PromptService.extract_prompt_info_for_ai(prompt_data)
-        
-        # 填充AI请求模板
-        ai_request_content = PromptService.fill_ai_request_template(prompt_info)
-        
-        # 使用AI处理响应参数表
-        import httpx
-        
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {ai_config['api_key']}"
-        }
-        
-        data = {
-            "model": ai_config["model_name"],
-            "messages": [{
-                "role": "user", 
-                "content": ai_request_content
-            }],
-            "max_tokens": 4000,
-            "temperature": 0.3
-        }
-        
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(ai_config["api_url"], headers=headers, json=data)
-            
-            if response.status_code == 200:
-                result = response.json()
-                if "choices" in result and len(result["choices"]) > 0:
-                    ai_response = result["choices"][0].get("message", {}).get("content", "")
-                    
-                    # 记录AI聊天交互
-                    PromptService.log_chat_interaction(
-                        ai_request_content, 
-                        ai_response, 
-                        current_user.get('id')
-                    )
-                    
-                    if ai_response:
-                        # 将AI返回的响应参数表替换到原始prompt中
-                        enhanced_prompt = PromptService.replace_response_table_in_prompt(
-                            base_prompt, 
-                            ai_response.strip()
-                        )
-                        
-                        # 第二次AI调用：业务逻辑分析
-                        try:
-                            # 提取业务逻辑分析所需信息
-                            business_info = PromptService.extract_business_logic_info_for_ai(enhanced_prompt)
-                            
-                            # 填充业务逻辑AI请求模板
-                            business_ai_request_content = PromptService.fill_business_logic_ai_request_template(business_info)
-                            
-                            # 第二次AI调用
-                            business_data = {
-                                "model": ai_config["model_name"],
-                                "messages": [{
-                                    "role": "user", 
-                                    "content": business_ai_request_content
-                                }],
-                                "max_tokens": 4000,
-                                "temperature": 0.3
-                            }
-                            
-                            async with httpx.AsyncClient(timeout=60.0) as business_client:
-                                business_response = await business_client.post(ai_config["api_url"], headers=headers, json=business_data)
-                                
-                                if business_response.status_code == 200:
-                                    business_result = business_response.json()
-                                    if "choices" in business_result and len(business_result["choices"]) > 0:
-                                        business_logic_response = business_result["choices"][0].get("message", {}).get("content", "")
-                                        
-                                        # 记录第二次AI聊天交互
-                                        PromptService.log_chat_interaction(
-                                            business_ai_request_content, 
-                                            business_logic_response, 
-                                            current_user.get('id')
-                                        )
-                                        
-                                        if business_logic_response:
-                                            # 将业务逻辑注入到prompt中
-                                            final_prompt = PromptService.inject_business_logic_into_prompt(
-                                                enhanced_prompt, 
-                                                business_logic_response.strip()
-                                            )
-                                            
-                                            return PromptResponse(
-                                                success=True,
-                                                prompt=final_prompt
-                                            )
-                                else:
-                                    # 记录失败的第二次AI调用
-                                    business_error_msg = f"业务逻辑AI调用失败，状态码: {business_response.status_code}"
-                                    PromptService.log_chat_interaction(
-                                        business_ai_request_content, 
-                                        f"错误: {business_error_msg}", 
-                                        current_user.get('id')
-                                    )
-                        
-                        except Exception as business_e:
-                            print(f"业务逻辑AI调用失败: {str(business_e)}")
-                            # 第二次AI调用失败，但第一次成功，返回第一次的结果
-                        
-                        # 返回第一次AI增强的结果（如果第二次失败）
-                        return PromptResponse(
-                            success=True,
-                            prompt=enhanced_prompt
-                        )
-            else:
-                # 记录失败的AI调用
-                error_msg = f"AI调用失败，状态码: {response.status_code}"
-                PromptService.log_chat_interaction(
-                    ai_request_content, 
-                    f"错误: {error_msg}", 
-                    current_user.get('id')
-                )
-        
-        # AI调用失败，返回基础prompt
-        return PromptResponse(
-            success=True,
-            prompt=base_prompt,
-            error="AI增强失败，返回基础版本"
-        )
+        # 展开引用的DDL目录表
+        prompt_data = get_ddl_catalog().expand_request(current_user['id'], prompt_data)
+    except DdlCatalogError as e:
+        return PromptResponse(success=False, error=str(e))
     
-    except Exception as e:
-        print(f"生成AI prompt时出错: {str(e)}")
-        # 失败时返回基础prompt
+    return await AIPipelineService.generate_ai_prompt_or_base(prompt_data, current_user)
+
+
+@router.post("/generate-ai/jobs", status_code=202)
+async def submit_ai_prompt_job(
+    prompt_data: PromptRequest,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    异步模式的AI增强生成：立即返回任务ID，流水线在后台执行
+
+    通过 GET /generate-ai/jobs/{job_id} 轮询或 /events 订阅结果；
+    携带 Idempotency-Key 时，相同的键在结果过期前返回已有任务（200），不会重复调用AI
+    """
+    try:
+        job, created = await get_ai_job_store().submit(prompt_data, current_user, idempotency_key)
+    except AIJobError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+    if not created:
+        response.status_code = 200
+    return job.to_dict()
+
+
+async def _get_owned_ai_job(job_id: str, current_user: dict) -> AIJob:
+    """获取当前用户的AI增强生成任务，不存在或已过期时返回404"""
+    job = await get_ai_job_store().get(current_user['id'], job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在或结果已过期")
+    return job
+
+
+@router.get("/generate-ai/jobs/{job_id}")
+async def get_ai_prompt_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    """查询AI增强生成任务的状态，结束后包含生成结果"""
+    return (await _get_owned_ai_job(job_id, current_user)).to_dict()
+
+
+@router.get("/generate-ai/jobs/{job_id}/events")
+async def stream_ai_prompt_job_events(job_id: str, current_user: dict = Depends(get_current_user)):
+    """以Server-Sent Events订阅任务：状态变化时发送 status 事件，结束时发送 result 事件（含生成结果）"""
+    store = get_ai_job_store()
+    job = await _get_owned_ai_job(job_id, current_user)
+    loop = asyncio.get_running_loop()
+
+    async def events():
+        nonlocal job
+        status = None
+        last_sent = loop.time()
+        while True:
+            if job is None:
+                yield f"event: error\ndata: {json.dumps({'detail': '任务不存在或结果已过期'}, ensure_ascii=False)}\n\n"
+                return
+            data = job.to_dict()
+            if job.finished:
+                yield f"event: result\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+                return
+            if job.status != status:
+                status = job.status
+                last_sent = loop.time()
+                yield f"event: status\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+            elif loop.time() - last_sent >= AI_JOB_KEEPALIVE_SECONDS:
+                last_sent = loop.time()
+                yield ": keep-alive\n\n"
+            # 任务可能由其他服务进程执行：等待本进程的通知或轮询间隔后重新查询
+            await store.wait_for_change(job_id, AI_JOB_KEEPALIVE_SECONDS)
+            job = await store.get(current_user['id'], job_id)
+
+    return StreamingResponse(
+        events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+class _BatchBodyReader:
+    """
+    在后台任务中边接收边读取批量请求体：NDJSON按行切分，JSON读完后整体解析
+
+    读取不受响应写出的阻塞（客户端上传完才读取响应时也不会互相等待），请求体超过上限时停止接收；
+    请求体读完后继续等待接收通道上的断开消息，用于检测客户端断开
+    """
+
+    def __init__(self, request: Request, split_lines: bool, max_bytes: int = BATCH_MAX_BODY_BYTES):
+        self.request = request
+        self.split_lines = split_lines
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.chunks: Deque[bytes] = deque()
+        self.error: Optional[Exception] = None
+        self.done = False
+        self.disconnected = False
+        self._partial = b""
+        self._ready = asyncio.Event()
+
+    def _add(self, chunk: bytes):
+        if not self.split_lines:
+            self.chunks.append(chunk)
+            return
+        lines = (self._partial + chunk).split(b"\n")
+        self._partial = lines.pop()
+        self.chunks.extend(line for line in lines if line.strip())
+
+    async def run(self):
+        try:
+            async for chunk in self.request.stream():
+                self.size += len(chunk)
+                if self.size > self.max_bytes:
+                    self.error = ValueError(f"请求体超过上限（{self.max_bytes // (1024 * 1024)}MB），其余请求未处理")
+                    break
+                self._add(chunk)
+                self._ready.set()
+        except ClientDisconnect:
+            self.disconnected = True
+        finally:
+            if self._partial.strip() and self.error is None:
+                self.chunks.append(self._partial)
+            self._partial = b""
+            self.done = True
+            self._ready.set()
+
+        # 请求体已读完（或超过上限后剩余部分直接丢弃），接收通道之后只会收到断开消息
+        while not self.disconnected:
+            message = await self.request.receive()
+            if message["type"] == "http.disconnect":
+                self.disconnected = True
+
+    async def lines(self) -> AsyncIterator[bytes]:
+        """按到达顺序产出NDJSON的每个非空行"""
+        while True:
+            if self.chunks:
+                yield self.chunks.popleft()
+            elif self.done or self.disconnected:
+                return
+            else:
+                self._ready.clear()
+                await self._ready.wait()
+
+    async def body(self) -> bytes:
+        """等待请求体读完，返回完整内容（JSON格式）"""
+        while not self.done:
+            self._ready.clear()
+            await self._ready.wait()
+        return b"".join(self.chunks)
+
+
+class _DuplexStreamingResponse(StreamingResponse):
+    """
+    边读取请求体边写出的流式响应
+
+    StreamingResponse 会在写出期间读取接收通道以检测断开，与生成器读取请求体冲突；
+    这里只写出，断开由 _BatchBodyReader 检测
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+async def _parse_batch_items(reader: _BatchBodyReader, user_id: int) -> AsyncIterator[BatchItem]:
+    """
+    解析批量请求：NDJSON（每行一个PromptRequest）或JSON（列表或 {"requests": [...]}）
+
+    NDJSON边接收边逐项校验并展开引用的DDL目录表，交给渲染器；校验失败的项以错误返回
+    """
+    catalog = get_ddl_catalog()
+    too_many = ValueError(f"超出批量上限（{BATCH_MAX_ITEMS}条），其余请求未处理")
+
+    def parse_item(index: int, item: Any) -> BatchItem:
         try:
-            developer = current_user['username']
-            base_prompt = PromptService.generate_prompt_template(prompt_data, developer)
-            return PromptResponse(
-                success=True,
-                prompt=base_prompt,
-                error=f"AI生成失败，返回基础版本: {str(e)}"
+            if isinstance(item, bytes):
+                prompt_data = PromptRequest.model_validate_json(item)
+            else:
+                prompt_data = PromptRequest.model_validate(item)
+            return index, catalog.expand_request(user_id, prompt_data)
+        except ValidationError as e:
+            details = "; ".join(
+                f"{'.'.join(str(part) for part in error['loc']) or '请求体'}: {error['msg']}" for error in e.errors()
             )
-        except:
-            return PromptResponse(
-                success=False,
-                error=f"生成prompt时出错: {str(e)}"
-            )
\ No newline at end of file
+            return index, ValueError(f"请求格式不正确: {details}")
+        except DdlCatalogError as e:
+            return index, e
+
+    index = 0
+    if reader.split_lines:
+        async for line in reader.lines():
+            if index >= BATCH_MAX_ITEMS:
+                yield index, too_many
+                return
+            yield parse_item(index, line)
+            index += 1
+    else:
+        body = await reader.body()
+        if reader.error is None:
+            try:
+                data = json.loads(body)
+            except ValueError:
+                yield 0, ValueError("请求体不是有效的JSON")
+                return
+            items: List[Any] = data.get("requests") if isinstance(data, dict) else data
+            if not isinstance(items, list):
+                yield 0, ValueError('请求体应为Prompt请求列表或 {"requests": [...]}')
+                return
+            for index, item in enumerate(items):
+                if index >= BATCH_MAX_ITEMS:
+                    yield index, too_many
+                    return
+                yield parse_item(index, item)
+            index = len(items)
+
+    if reader.error is not None:
+        yield index, reader.error
+
+
+@router.post("/generate-batch")
+async def generate_prompt_batch(
+    request: Request,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    批量生成Prompt模板
+
+    请求体为NDJSON（Content-Type: application/x-ndjson，每行一个PromptRequest）
+    或JSON（PromptRequest列表，或 {"requests": [...]}），不超过 BATCH_MAX_BODY_BYTES；
+    NDJSON边上传边渲染，在进程池中并行渲染，以NDJSON按完成顺序返回每项结果（含 index），最后一行为汇总
+    """
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > BATCH_MAX_BODY_BYTES:
+        raise HTTPException(status_code=413, detail=f"请求体超过上限（{BATCH_MAX_BODY_BYTES // (1024 * 1024)}MB）")
+
+    developer = current_user['username']
+    content_type = request.headers.get("content-type", "")
+    reader = _BatchBodyReader(request, split_lines="ndjson" in content_type or "jsonl" in content_type)
+
+    async def stream():
+        reading = asyncio.create_task(reader.run())
+        try:
+            items = _parse_batch_items(reader, current_user['id'])
+            async for result in get_batch_renderer().render_stream(items, developer):
+                if reader.disconnected:
+                    # 客户端已断开，不再读取和渲染剩余的请求
+                    print("批量生成：客户端已断开，停止处理")
+                    break
+                yield json.dumps(result, ensure_ascii=False) + "\n"
+        finally:
+            reading.cancel()
+
+    return _DuplexStreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@router.websocket("/ws/preview")
+async def live_preview(websocket: WebSocket, token: str = ""):
+    """
+    实时预览：客户端逐字段发送修改，服务端只重新渲染受影响的接口部分，防抖后推送补丁
+
+    浏览器无法为WebSocket设置Authorization头，令牌通过 token 查询参数传递。
+    消息格式见 PreviewSession
+    """
+    current_user = get_user_by_token(token)
+    if current_user is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    session = PreviewSession(current_user['id'], current_user['username'])
+    await websocket.send_json({"type": "ready", **session.limits()})
+
+    async def push_patches():
+        while True:
+            patch = await session.next_patch()
+            if patch is not None:
+                await websocket.send_json(patch)
+
+    pusher = asyncio.create_task(push_patches())
+    try:
+        while True:
+            text = await websocket.receive_text()
+            try:
+                message = json.loads(text)
+            except ValueError:
+                await websocket.send_json({"type": "error", "message": "消息不是合法的JSON"})
+                continue
+            try:
+                await session.apply(message)
+            except PreviewError as e:
+                await websocket.send_json({"type": "error", "message": str(e)})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        pusher.cancel()
+
+
+@router.get("/cache-stats")
+async def get_cache_stats(current_user: dict = Depends(get_current_user)):
+    """接口渲染结果缓存的命中率和占用统计"""
+    return get_section_cache().get_stats()
+
+
+@router.get("/render-stats")
+async def get_render_stats(current_user: dict = Depends(get_current_user)):
+    """Prompt渲染的卸载次数、线程池排队等待和执行耗时统计"""
+    return get_render_offloader().get_stats()
+
+
+@router.post("/ddl-catalog")
+async def register_ddl(
+    request: DdlCatalogRegister,
+    current_user: dict = Depends(get_current_user)
+):
+    """登记DDL到目录（可包含多张表，同名表内容变化时版本号加一）"""
+    try:
+        tables = get_ddl_catalog().register(current_user['id'], request.ddl)
+    except DdlCatalogError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"tables": tables}
+
+
+@router.get("/ddl-catalog")
+async def list_ddl_catalog(current_user: dict = Depends(get_current_user)):
+    """列出目录中登记的表"""
+    return {"tables": get_ddl_catalog().list_tables(current_user['id'])}
+
+
+@router.get("/ddl-catalog/{table_name}")
+async def get_ddl_catalog_table(table_name: str, current_user: dict = Depends(get_current_user)):
+    """获取登记的表（含DDL原文）"""
+    entry = get_ddl_catalog().get_table(current_user['id'], table_name)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="DDL目录中不存在该表")
+    return entry
+
+
+@router.delete("/ddl-catalog/{table_name}")
+async def delete_ddl_catalog_table(table_name: str, current_user: dict = Depends(get_current_user)):
+    """从目录中删除登记的表"""
+    if not get_ddl_catalog().delete_table(current_user['id'], table_name):
+        raise HTTPException(status_code=404, detail="DDL目录中不存在该表")
+    return {"message": "DDL目录表删除成功"}
@@ -0,0 +1,135 @@
+"""
+AI调用客户端模块
+封装Chat Completions接口的HTTP调用，统一处理请求头、超时和响应解析
+"""
+
+import asyncio
+import time
+from typing import Dict, Any, Optional
+
+import httpx
+
+# 每个事件循环共享一个连接池，避免每次调用都重新建立TLS连接
+_clients: Dict[int, httpx.AsyncClient] = {}
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """获取当前事件循环共享的HTTP客户端"""
+    loop_id = id(asyncio.get_running_loop())
+    client = _clients.get(loop_id)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(timeout=60.0)
+        _clients[loop_id] = client
+    return client
+
+
+async def close_http_clients():
+    """关闭所有共享的HTTP客户端（应用关闭时调用）"""
+    for client in list(_clients.values()):
+        await client.aclose()
+    _clients.clear()
+
+
+class AIClient:
+    """AI服务调用客户端"""
+
+    REQUIRED_FIELDS = ["api_type", "api_url", "api_key", "model_name"]
+
+    @classmethod
+    def is_config_complete(cls, config: Optional[Dict[str, Any]]) -> bool:
+        """检查AI配置是否完整"""
+        return bool(config) and all(field in config and config[field] for field in cls.REQUIRED_FIELDS)
+
+    @staticmethod
+    async def chat_completion(
+        config: Dict[str, Any],
+        content: str,
+        max_tokens: int = 4000,
+        temperature: float = 0.3,
+        timeout: float = 60.0,
+        client: Optional[httpx.AsyncClient] = None
+    ) -> Dict[str, Any]:
+        """
+        调用Chat Completions接口
+
+        Args:
+            config: AI配置（api_url、api_key、model_name）
+            content: 用户消息内容
+            max_tokens: 最大生成token数
+            temperature: 采样温度
+            timeout: 超时时间（秒）
+            client: 指定的HTTP客户端，默认使用共享连接池
+
+        Returns:
+            调用结果字典，包含 success、content、status_code、error、latency、
+            ttfb（首字节时间）、prompt_tokens、completion_tokens
+        """
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {config['api_key']}"
+        }
+
+        data = {
+            "model": config["model_name"],
+            "messages": [{"role": "user", "content": content}],
+            "max_tokens": max_tokens,
+            "temperature": temperature
+        }
+
+        start_time = time.perf_counter()
+        result = {
+            "success": False,
+            "content": "",
+            "status_code": None,
+            "error": None,
+            "latency": 0.0,
+            "ttfb": None,
+            "prompt_tokens": 0,
+            "completion_tokens": 0
+        }
+
+        try:
+            client = client or get_http_client()
+            request = client.build_request(
+                "POST", config["api_url"], headers=headers, json=data, timeout=timeout
+            )
+            # 以流式方式发送，响应头到达时即可得到首字节时间
+            response = await client.send(request, stream=True)
+            try:
+                result["ttfb"] = time.perf_counter() - start_time
+                await response.aread()
+            finally:
+                await response.aclose()
+            result["latency"] = time.perf_counter() - start_time
+            result["status_code"] = response.status_code
+
+            if response.status_code != 200:
+                error_detail = response.text
+                try:
+                    error_detail = response.json().get("error", {}).get("message", error_detail)
+                except Exception:
+                    pass
+                result["error"] = f"API请求失败 (状态码: {response.status_code}): {error_detail}"
+                return result
+
+            body = response.json()
+
+            # 记录token用量，部分兼容服务可能不返回usage
+            usage = body.get("usage") or {}
+            result["prompt_tokens"] = usage.get("prompt_tokens") or 0
+            result["completion_tokens"] = usage.get("completion_tokens") or 0
+
+            if "choices" in body and len(body["choices"]) > 0:
+                result["content"] = body["choices"][0].get("message", {}).get("content", "") or ""
+                if result["content"]:
+                    result["success"] = True
+                else:
+                    result["error"] = "AI响应内容为空"
+            else:
+                result["error"] = "AI响应格式不正确"
+
+        except Exception as e:
+            result["latency"] = time.perf_counter() - start_time
+            result["error"] = f"AI服务连接失败: {str(e)}"
+
+        return result
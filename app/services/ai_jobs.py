@@ -0,0 +1,368 @@
+"""
+AI增强生成任务模块
+/generate-ai 的异步模式：提交后立即返回任务ID，流水线在后台执行，客户端轮询或订阅结果。
+任务、幂等键和结果保存在本地SQLite中，多个服务进程（uvicorn --workers）共享：
+任务在提交它的进程中执行，任意进程都能查询状态和结果；相同的 Idempotency-Key 返回已有任务，不重复调用上游。
+结果保存 AI_JOB_TTL_SECONDS 秒，总任务数和每个用户进行中的任务数都有上限
+"""
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.models import PromptRequest, PromptResponse
+from app.services.ai_pipeline import AIPipelineService
+from app.services.ddl_catalog import get_ddl_catalog, DdlCatalogError
+
+# 任务配置
+AI_JOBS_DB_PATH = os.getenv("AI_JOBS_DB_PATH", "data/ai_jobs.db")
+# 已结束任务的结果保存时间（秒）
+AI_JOB_TTL_SECONDS = int(os.getenv("AI_JOB_TTL_SECONDS", "3600"))
+# 同时保存的最大任务数（超出时淘汰最早结束的任务）
+AI_JOB_MAX_ENTRIES = int(os.getenv("AI_JOB_MAX_ENTRIES", "1000"))
+# 每个用户同时进行中的最大任务数
+AI_JOB_MAX_ACTIVE_PER_USER = int(os.getenv("AI_JOB_MAX_ACTIVE_PER_USER", "10"))
+# 执行任务的进程更新心跳的间隔（秒）；心跳超过 AI_JOB_STALE_SECONDS 未更新的任务视为进程已退出
+AI_JOB_HEARTBEAT_SECONDS = 10
+AI_JOB_STALE_SECONDS = int(os.getenv("AI_JOB_STALE_SECONDS", "60"))
+# 任务不在当前进程执行时，订阅者检查状态变化的间隔（秒）
+AI_JOB_POLL_SECONDS = 1.0
+# 清理过期结果和心跳超时任务的最短间隔（秒）
+AI_JOB_PURGE_INTERVAL_SECONDS = 10
+# Idempotency-Key 的最大长度
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+# 任务状态
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_FINISHED_STATUSES = (JOB_SUCCEEDED, JOB_FAILED)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ai_jobs (
+    id TEXT PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    idempotency_key TEXT,
+    request_hash TEXT NOT NULL,
+    status TEXT NOT NULL,
+    result TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    heartbeat_at REAL NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_ai_jobs_key ON ai_jobs (user_id, idempotency_key);
+CREATE INDEX IF NOT EXISTS idx_ai_jobs_user_active ON ai_jobs (user_id, finished_at);
+CREATE INDEX IF NOT EXISTS idx_ai_jobs_finished ON ai_jobs (finished_at);
+"""
+
+_JOB_COLUMNS = "id, user_id, idempotency_key, request_hash, status, result, created_at, started_at, finished_at"
+
+
+class AIJobError(Exception):
+    """任务提交错误"""
+
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def hash_request(prompt_data: PromptRequest) -> str:
+    """请求内容哈希，用于判断同一 Idempotency-Key 是否对应相同的请求"""
+    return hashlib.blake2b(prompt_data.model_dump_json().encode("utf-8"), digest_size=16).hexdigest()
+
+
+class AIJob:
+    """单个AI增强生成任务（读取时的快照）"""
+
+    __slots__ = ("id", "user_id", "idempotency_key", "request_hash", "status", "result",
+                 "created_at", "started_at", "finished_at")
+
+    def __init__(self, row: sqlite3.Row):
+        self.id = row["id"]
+        self.user_id = row["user_id"]
+        self.idempotency_key = row["idempotency_key"]
+        self.request_hash = row["request_hash"]
+        self.status = row["status"]
+        self.result: Optional[PromptResponse] = \
+            PromptResponse.model_validate_json(row["result"]) if row["result"] else None
+        self.created_at = row["created_at"]
+        self.started_at = row["started_at"]
+        self.finished_at = row["finished_at"]
+
+    @property
+    def finished(self) -> bool:
+        return self.status in JOB_FINISHED_STATUSES
+
+    def to_dict(self) -> Dict[str, Any]:
+        expires_at = self.finished_at + AI_JOB_TTL_SECONDS if self.finished_at else None
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "expires_at": expires_at,
+            "result": self.result.model_dump() if self.result else None
+        }
+
+
+class AIJobStore:
+    """
+    SQLite中的任务存储：按TTL过期、按数量上限淘汰最早结束的任务
+
+    数据库操作在线程中执行，不阻塞事件循环；本进程执行的任务在状态变化时直接唤醒订阅者，
+    其他进程执行的任务由订阅者定时查询
+    """
+
+    def __init__(self, db_path: str = AI_JOBS_DB_PATH, ttl_seconds: int = AI_JOB_TTL_SECONDS,
+                 max_entries: int = AI_JOB_MAX_ENTRIES, max_active_per_user: int = AI_JOB_MAX_ACTIVE_PER_USER):
+        self.db_path = Path(db_path)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_active_per_user = max_active_per_user
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        # 本进程执行中的任务：任务ID -> asyncio任务，以及状态变化通知
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._changes: Dict[str, asyncio.Event] = {}
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._purged_at = 0.0
+        self._stats = {"submitted": 0, "deduplicated": 0, "expired": 0, "evicted": 0, "abandoned": 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(str(self.db_path), check_same_thread=False, timeout=30)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(_SCHEMA)
+            self._connection = connection
+        return self._connection
+
+    # ============ 数据库操作（在线程中执行） ============
+
+    def _purge(self, connection: sqlite3.Connection, now: float):
+        """删除过期的结果，并把心跳超时（执行它的进程已退出）的任务标记为失败（每 AI_JOB_PURGE_INTERVAL_SECONDS 最多一次）"""
+        if now - self._purged_at < AI_JOB_PURGE_INTERVAL_SECONDS:
+            return
+        self._purged_at = now
+        expired = connection.execute(
+            "DELETE FROM ai_jobs WHERE finished_at IS NOT NULL AND finished_at < ?", (now - self.ttl_seconds,)
+        ).rowcount
+        self._stats["expired"] += expired
+        abandoned = connection.execute(
+            "UPDATE ai_jobs SET status = ?, result = ?, finished_at = ? WHERE finished_at IS NULL AND heartbeat_at < ?",
+            (JOB_FAILED, PromptResponse(success=False, error="执行任务的服务进程已退出，请重新提交").model_dump_json(),
+             now, now - AI_JOB_STALE_SECONDS)
+        ).rowcount
+        self._stats["abandoned"] += abandoned
+
+    def _make_room(self, connection: sqlite3.Connection):
+        """超出上限时淘汰最早结束的任务；全部在执行中时拒绝新任务"""
+        total = connection.execute("SELECT COUNT(*) FROM ai_jobs").fetchone()[0]
+        if total < self.max_entries:
+            return
+        evicted = connection.execute(
+            "DELETE FROM ai_jobs WHERE id IN (SELECT id FROM ai_jobs WHERE finished_at IS NOT NULL "
+            "ORDER BY finished_at LIMIT ?)", (total - self.max_entries + 1,)
+        ).rowcount
+        self._stats["evicted"] += evicted
+        if total - evicted >= self.max_entries:
+            raise AIJobError(f"进行中的任务已达上限（{self.max_entries}个），请稍后再试", 429)
+
+    def _insert(self, user_id: int, idempotency_key: Optional[str], request_hash: str) -> Tuple[AIJob, bool]:
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                # 立即获取写锁，多个进程同时提交时上限检查和插入不会交错
+                connection.execute("BEGIN IMMEDIATE")
+                self._purge(connection, now)
+                if idempotency_key is not None:
+                    row = connection.execute(
+                        f"SELECT {_JOB_COLUMNS} FROM ai_jobs WHERE user_id = ? AND idempotency_key = ?",
+                        (user_id, idempotency_key)
+                    ).fetchone()
+                    if row is not None:
+                        if row["request_hash"] != request_hash:
+                            raise AIJobError("该 Idempotency-Key 已用于内容不同的请求", 409)
+                        self._stats["deduplicated"] += 1
+                        return AIJob(row), False
+
+                active = connection.execute(
+                    "SELECT COUNT(*) FROM ai_jobs WHERE user_id = ? AND finished_at IS NULL", (user_id,)
+                ).fetchone()[0]
+                if active >= self.max_active_per_user:
+                    raise AIJobError(f"您进行中的任务已达上限（{self.max_active_per_user}个），请等待完成后再提交", 429)
+                self._make_room(connection)
+
+                job_id = uuid.uuid4().hex
+                connection.execute(
+                    "INSERT INTO ai_jobs (id, user_id, idempotency_key, request_hash, status, created_at, heartbeat_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, user_id, idempotency_key, request_hash, JOB_QUEUED, now, now)
+                )
+                row = connection.execute(f"SELECT {_JOB_COLUMNS} FROM ai_jobs WHERE id = ?", (job_id,)).fetchone()
+            self._stats["submitted"] += 1
+            return AIJob(row), True
+
+    def _update_status(self, job_id: str, status: str, result: Optional[PromptResponse] = None):
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                if status == JOB_RUNNING:
+                    connection.execute(
+                        "UPDATE ai_jobs SET status = ?, started_at = ?, heartbeat_at = ? WHERE id = ?",
+                        (status, now, now, job_id)
+                    )
+                else:
+                    connection.execute(
+                        "UPDATE ai_jobs SET status = ?, result = ?, finished_at = ?, heartbeat_at = ? WHERE id = ?",
+                        (status, result.model_dump_json() if result else None, now, now, job_id)
+                    )
+
+    def _touch(self, job_ids: List[str]):
+        """更新本进程执行中任务的心跳"""
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.executemany(
+                    "UPDATE ai_jobs SET heartbeat_at = ? WHERE id = ? AND finished_at IS NULL",
+                    [(time.time(), job_id) for job_id in job_ids]
+                )
+
+    def _select(self, user_id: int, job_id: str) -> Optional[AIJob]:
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                self._purge(connection, time.time())
+            row = connection.execute(
+                f"SELECT {_JOB_COLUMNS} FROM ai_jobs WHERE id = ? AND user_id = ?", (job_id, user_id)
+            ).fetchone()
+        return AIJob(row) if row is not None else None
+
+    # ============ 对外接口 ============
+
+    async def submit(self, prompt_data: PromptRequest, current_user: dict,
+                     idempotency_key: Optional[str] = None) -> Tuple[AIJob, bool]:
+        """
+        提交任务并在当前进程后台执行
+
+        Args:
+            prompt_data: Prompt请求数据（引用的DDL目录表在执行时展开）
+            current_user: 当前用户
+            idempotency_key: 客户端提供的幂等键（按用户隔离）
+
+        Returns:
+            (任务, 是否为新建任务)；相同幂等键的任务尚未过期时返回已有任务（可能由其他进程执行）
+
+        Raises:
+            AIJobError: 幂等键对应的请求内容不同，或任务数已达上限
+        """
+        if idempotency_key is not None and len(idempotency_key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            raise AIJobError(f"Idempotency-Key 不能超过{IDEMPOTENCY_KEY_MAX_LENGTH}个字符", 400)
+        job, created = await asyncio.to_thread(
+            self._insert, current_user['id'], idempotency_key, hash_request(prompt_data)
+        )
+        if created:
+            self._changes[job.id] = asyncio.Event()
+            self._tasks[job.id] = asyncio.create_task(self._run(job.id, prompt_data, current_user))
+            if self._heartbeat_task is None or self._heartbeat_task.done():
+                self._heartbeat_task = asyncio.create_task(self._heartbeat())
+        return job, created
+
+    def _notify(self, job_id: str):
+        """唤醒等待该任务状态变化的订阅者"""
+        event = self._changes.get(job_id)
+        if event is not None:
+            event.set()
+            self._changes[job_id] = asyncio.Event()
+
+    async def _run(self, job_id: str, prompt_data: PromptRequest, current_user: dict):
+        try:
+            await asyncio.to_thread(self._update_status, job_id, JOB_RUNNING)
+            self._notify(job_id)
+            try:
+                # 展开引用的DDL目录表
+                prompt_data = get_ddl_catalog().expand_request(current_user['id'], prompt_data)
+                result = await AIPipelineService.generate_ai_prompt_or_base(prompt_data, current_user)
+            except DdlCatalogError as e:
+                result = PromptResponse(success=False, error=str(e))
+            except Exception as e:
+                result = PromptResponse(success=False, error=f"生成prompt时出错: {str(e)}")
+            await asyncio.to_thread(self._update_status, job_id, JOB_SUCCEEDED if result.success else JOB_FAILED, result)
+        except asyncio.CancelledError:
+            # 服务关闭：直接写入，保证退出前记录任务已取消
+            self._update_status(job_id, JOB_FAILED, PromptResponse(success=False, error="服务关闭，任务已取消"))
+            raise
+        except sqlite3.Error as e:
+            print(f"更新AI增强生成任务状态失败: {str(e)}")
+        finally:
+            self._tasks.pop(job_id, None)
+            self._notify(job_id)
+            self._changes.pop(job_id, None)
+
+    async def _heartbeat(self):
+        """本进程有执行中的任务时定期更新心跳，其他进程据此判断任务是否仍在执行"""
+        while self._tasks:
+            try:
+                await asyncio.to_thread(self._touch, list(self._tasks))
+            except sqlite3.Error as e:
+                print(f"更新AI增强生成任务心跳失败: {str(e)}")
+            await asyncio.sleep(AI_JOB_HEARTBEAT_SECONDS)
+
+    async def get(self, user_id: int, job_id: str) -> Optional[AIJob]:
+        """获取用户的任务，不存在、已过期或不属于该用户时返回None"""
+        return await asyncio.to_thread(self._select, user_id, job_id)
+
+    async def wait_for_change(self, job_id: str, timeout: float):
+        """
+        等待任务状态可能发生变化：本进程执行的任务等待状态变化通知，
+        其他进程执行的任务等待 AI_JOB_POLL_SECONDS 后由调用方重新查询
+
+        Args:
+            job_id: 任务ID
+            timeout: 最长等待时间（秒）
+        """
+        event = self._changes.get(job_id)
+        if event is None:
+            await asyncio.sleep(min(timeout, AI_JOB_POLL_SECONDS))
+            return
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def get_stats(self) -> Dict[str, int]:
+        """本进程执行中的任务数和提交/去重/过期/淘汰次数"""
+        return dict(self._stats, running=len(self._tasks), max_entries=self.max_entries,
+                    max_active_per_user=self.max_active_per_user)
+
+    async def shutdown(self):
+        """取消本进程执行中的任务（应用关闭时调用），任务记录为已取消"""
+        tasks = list(self._tasks.values())
+        if self._heartbeat_task is not None:
+            tasks.append(self._heartbeat_task)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# 延迟初始化的全局任务存储实例
+_store_instance = None
+
+def get_ai_job_store() -> AIJobStore:
+    """获取AI增强生成任务存储实例（单例模式）"""
+    global _store_instance
+    if _store_instance is None:
+        _store_instance = AIJobStore()
+    return _store_instance
@@ -0,0 +1,377 @@
+"""
+AI增强Prompt生成流水线模块
+串联基础Prompt生成、响应参数表AI填充和业务逻辑AI分析两个阶段
+"""
+
+import asyncio
+import os
+import sqlite3
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.models import PromptRequest, PromptResponse
+from app.services.ddl_parser import ColumnIndex
+from app.services.mapping_memory import SCOPE_SHARED, get_mapping_memory, scope_for_user, table_signature
+from app.services.prompt_compactor import CompactionReport
+from app.services.prompt_document import PromptDocument
+from app.services.prompt_service import PromptService
+from app.services.render_offload import get_render_offloader
+from app.services.response_table import FieldKey, ParsedResponseTable, ResponseTableRow, parse_response_table
+from app.services.ai_router import get_ai_router
+from app.services.usage_service import get_usage_tracker
+
+# 流水线阶段名称
+STAGE_RESPONSE_TABLE = "response_table"
+STAGE_BUSINESS_LOGIC = "business_logic"
+# 流水线整体出错（不属于单个阶段）时用于用量统计的阶段名称
+STAGE_PIPELINE = "pipeline"
+
+# 响应参数表分块配置
+# 每个AI请求最多包含的未匹配字段数（单次调用的max_tokens约可返回100多行）
+AI_CHUNK_MAX_FIELDS = int(os.getenv("AI_CHUNK_MAX_FIELDS", "100"))
+# 同一次生成中并行的分块请求数
+AI_CHUNK_PARALLELISM = int(os.getenv("AI_CHUNK_PARALLELISM", "4"))
+# AI返回的表格缺少字段或格式不正确时，只针对这些字段补充请求的最大轮数
+AI_TABLE_RETRY_ROUNDS = int(os.getenv("AI_TABLE_RETRY_ROUNDS", "1"))
+
+
+class AIPipelineService:
+    """AI增强Prompt生成流水线"""
+
+    @staticmethod
+    def report_compaction(report: CompactionReport) -> Dict[str, Any]:
+        """输出并返回一次AI请求压缩前后的token估算"""
+        print(f"AI请求token估算（{report.stage}）：{report.before_tokens} -> {report.after_tokens}"
+              f"（预算 {report.budget}，步骤 {', '.join(report.steps)}）")
+        return report.to_dict()
+
+    @staticmethod
+    def apply_response_table(document: PromptDocument, prompt_data: PromptRequest,
+                             ai_rows: Dict[FieldKey, ResponseTableRow]):
+        """
+        将AI返回的响应参数表合并进文档
+
+        AI只负责本地未匹配的字段：按 (接口下标, 字段名) 把行合并进对应接口的表格，
+        主数据库源不是该接口关联表中字段的行不采用；本地预匹配的行保持不变，没有有效行的字段保留"待填写"
+
+        Args:
+            document: Prompt文档
+            prompt_data: Prompt请求数据
+            ai_rows: 解析出的行（字段键 -> 行）
+        """
+        rows_by_api: Dict[int, Dict[str, ResponseTableRow]] = {}
+        for (index, name), row in ai_rows.items():
+            rows_by_api.setdefault(index, {})[name] = row
+        for i, api in enumerate(prompt_data.apis):
+            rendered = PromptService.render_api(api)
+            if rendered.unresolved_fields:
+                merged = PromptService.merge_response_table(
+                    rendered, rows_by_api.get(i, {}), ColumnIndex.from_ddl_list(api.database_tables)
+                )
+                document.set_response_table(merged, api_index=i)
+
+    @staticmethod
+    def reject_unknown_sources(prompt_data: PromptRequest, parsed: ParsedResponseTable) -> int:
+        """
+        去掉主数据库源不是所属接口关联表中字段的行，记为格式不正确（参与补充请求）
+
+        Returns:
+            去掉的行数
+        """
+        indexes: Dict[int, ColumnIndex] = {}
+        rejected = 0
+        for key, row in list(parsed.rows.items()):
+            index = key[0]
+            if index not in indexes:
+                indexes[index] = ColumnIndex.from_ddl_list(prompt_data.apis[index].database_tables)
+            if indexes[index].find_source(row.source) is None:
+                del parsed.rows[key]
+                parsed.malformed.add(key)
+                rejected += 1
+        return rejected
+
+    @staticmethod
+    def recall_mappings(prompt_data: PromptRequest, user_id) -> Dict[FieldKey, ResponseTableRow]:
+        """
+        从字段映射记忆中查找未匹配字段的已知映射
+
+        每个接口按自己的关联表单独查找，记忆中的数据库字段在该接口的DDL中仍存在才使用
+
+        Returns:
+            字段键 -> 记忆中的行
+        """
+        scope = scope_for_user(user_id)
+        scopes = [scope] if scope == SCOPE_SHARED else [scope, SCOPE_SHARED]
+        memory = get_mapping_memory()
+        rows: Dict[FieldKey, ResponseTableRow] = {}
+        try:
+            for i, api in enumerate(prompt_data.apis):
+                if not api.response_example:
+                    continue
+                unresolved = [field.name for field in PromptService.render_api(api).unresolved_fields]
+                column_index = ColumnIndex.from_ddl_list(api.database_tables)
+                if not unresolved or not column_index.tables:
+                    continue
+                for name, row in memory.lookup(scopes, table_signature(column_index.tables), unresolved).items():
+                    if column_index.find_source(row.source) is not None:
+                        rows[(i, name)] = row
+        except sqlite3.Error as e:
+            print(f"查询字段映射记忆失败: {str(e)}")
+        return rows
+
+    @staticmethod
+    def remember_mappings(prompt_data: PromptRequest, user_id, ai_rows: Dict[FieldKey, ResponseTableRow]) -> int:
+        """
+        记录AI返回且校验通过的映射（只记录主数据库源是当前DDL中真实字段的行）
+
+        Returns:
+            写入的条数
+        """
+        scope = scope_for_user(user_id)
+        memory = get_mapping_memory()
+        recorded = 0
+        try:
+            for i, api in enumerate(prompt_data.apis):
+                column_index = ColumnIndex.from_ddl_list(api.database_tables)
+                if not column_index.tables:
+                    continue
+                rows = [
+                    ai_rows[(i, field.name)] for field in PromptService.render_api(api).unresolved_fields
+                    if (i, field.name) in ai_rows
+                    and column_index.find_source(ai_rows[(i, field.name)].source) is not None
+                ]
+                recorded += memory.record(scope, table_signature(column_index.tables), rows)
+        except sqlite3.Error as e:
+            print(f"写入字段映射记忆失败: {str(e)}")
+        return recorded
+
+    @staticmethod
+    async def request_chunks(router, user_id: int, profiles: List[Dict[str, Any]],
+                             requests: List[Tuple[str, CompactionReport, int]]) -> List[str]:
+        """
+        并行发送响应参数表的AI请求（并行数受 AI_CHUNK_PARALLELISM 限制），并记录每次交互
+
+        Returns:
+            成功请求的返回内容（按请求顺序，失败的请求不包含在内）
+        """
+        semaphore = asyncio.Semaphore(max(1, AI_CHUNK_PARALLELISM))
+
+        async def request(ai_request_content: str) -> Optional[str]:
+            async with semaphore:
+                result = await router.chat_completion(
+                    user_id, ai_request_content, STAGE_RESPONSE_TABLE, profiles=profiles
+                )
+            # 记录AI聊天交互（包括失败的调用）
+            PromptService.log_chat_interaction(
+                ai_request_content,
+                result["content"] if result["success"] else f"错误: {result['error']}",
+                user_id,
+                stage=STAGE_RESPONSE_TABLE,
+                call_result=result
+            )
+            return result["content"] if result["success"] else None
+
+        responses = await asyncio.gather(*(request(content) for content, _, _ in requests))
+        return [response for response in responses if response is not None]
+
+    @staticmethod
+    async def generate_ai_prompt(prompt_data: PromptRequest, current_user: dict) -> PromptResponse:
+        """
+        使用AI生成增强版Prompt模板
+
+        Args:
+            prompt_data: Prompt请求数据
+            current_user: 当前用户
+
+        Returns:
+            Prompt生成响应；AI调用失败时返回基础版本
+        """
+        user_id = current_user.get('id')
+
+        # 首先构建基础prompt文档，后续阶段直接修改文档的对应部分
+        developer = current_user['username']
+        # 报文较大时在线程池中渲染，避免阻塞事件循环
+        offloader = get_render_offloader()
+        offload = offloader.should_offload(prompt_data)
+        document = await offloader.run(offload, PromptService.build_prompt_document, prompt_data, developer)
+
+        # 检查用户是否配置了AI服务
+        router = get_ai_router()
+        profiles = router.get_user_profiles(user_id)
+        if not profiles:
+            return PromptResponse(
+                success=False,
+                error="请先在个人中心配置AI服务"
+            )
+
+        # 根据DDL在本地预匹配的字段已写入文档，只把剩余字段交给AI
+        resolved_fields, total_fields = PromptService.count_premapped_fields(prompt_data)
+        # 每次AI调用前后的token估算
+        token_estimates = []
+
+        # 响应参数表分块与补充请求情况
+        chunking = {"chunks": 0, "chunk_fields": AI_CHUNK_MAX_FIELDS, "parallelism": AI_CHUNK_PARALLELISM,
+                    "fields_per_api": [], "fields_per_chunk": [], "failed_chunks": 0,
+                    "malformed_rows": 0, "retry_rounds": 0, "retried_fields": 0, "unfilled_fields": 0}
+        error = None
+
+        # 字段映射记忆中已知的行预先填写，只把剩余字段交给AI（记忆读写SQLite，在线程中执行）
+        remembered: Dict[FieldKey, ResponseTableRow] = {}
+        if resolved_fields < total_fields:
+            remembered = await asyncio.to_thread(AIPipelineService.recall_mappings, prompt_data, user_id)
+        pending = [key for key in PromptService.unresolved_field_keys(prompt_data) if key not in remembered]
+        if remembered:
+            print(f"字段映射记忆命中{len(remembered)}个字段")
+            AIPipelineService.apply_response_table(document, prompt_data, remembered)
+
+        # 各接口交给AI的字段数（不同接口的同名字段分别计数）
+        chunking["fields_per_api"] = [0] * len(prompt_data.apis)
+        for index, _ in pending:
+            chunking["fields_per_api"][index] += 1
+
+        if pending:
+            # 未匹配字段按分块生成AI请求（字段不多时只有一个请求），每个请求压缩到token预算以内
+            requests = await offloader.run(
+                offload, PromptService.build_ai_requests, prompt_data, AI_CHUNK_MAX_FIELDS,
+                only_fields=pending if remembered else None
+            )
+            for _, report, field_count in requests:
+                token_estimates.append(AIPipelineService.report_compaction(report))
+                chunking["fields_per_chunk"].append(field_count)
+            chunking["chunks"] = len(requests)
+
+            # 第一次AI调用：响应参数表填充（多个分块并行）
+            ai_responses = await AIPipelineService.request_chunks(router, user_id, profiles, requests)
+            chunking["failed_chunks"] = len(requests) - len(ai_responses)
+            if len(requests) > 1:
+                print(f"响应参数表分块填充：{len(requests)}个分块，失败{chunking['failed_chunks']}个")
+
+            if not ai_responses:
+                # AI调用失败，返回基础prompt（已包含本地预匹配结果）
+                get_usage_tracker().record_fallback(user_id, STAGE_RESPONSE_TABLE)
+                return PromptResponse(
+                    success=True,
+                    prompt=document.to_markdown(),
+                    error="AI增强失败，返回基础版本",
+                    resolved_fields=resolved_fields,
+                    total_fields=total_fields,
+                    remembered_fields=len(remembered),
+                    token_estimates=token_estimates,
+                    chunking=chunking
+                )
+
+            # 解析AI返回的表格并对照本地字段校验（AI请求中的字段名称 -> 字段键）
+            labels = PromptService.ai_field_labels(prompt_data)
+            parsed = parse_response_table("\n".join(ai_responses), {labels[key]: key for key in pending})
+            AIPipelineService.reject_unknown_sources(prompt_data, parsed)
+            chunking["malformed_rows"] = len(parsed.malformed)
+
+            # 缺失或格式不正确的行（以及失败分块的字段）只针对这些字段补充请求
+            for retry_round in range(1, AI_TABLE_RETRY_ROUNDS + 1):
+                missing = parsed.missing(pending)
+                if not missing:
+                    break
+                chunking["retry_rounds"] = retry_round
+                chunking["retried_fields"] += len(missing)
+                print(f"响应参数表缺少{len(missing)}个字段的有效行，第{retry_round}次补充请求")
+
+                retry_requests = await offloader.run(
+                    offload, PromptService.build_ai_requests, prompt_data, AI_CHUNK_MAX_FIELDS,
+                    only_fields=missing, stage=f"{STAGE_RESPONSE_TABLE}_retry{retry_round}"
+                )
+                for _, report, _ in retry_requests:
+                    token_estimates.append(AIPipelineService.report_compaction(report))
+                for retry_response in await AIPipelineService.request_chunks(router, user_id, profiles, retry_requests):
+                    retry_parsed = parse_response_table(retry_response, {labels[key]: key for key in missing})
+                    AIPipelineService.reject_unknown_sources(prompt_data, retry_parsed)
+                    for key, row in retry_parsed.rows.items():
+                        parsed.rows.setdefault(key, row)
+
+            chunking["unfilled_fields"] = len(parsed.missing(pending))
+            if chunking["unfilled_fields"]:
+                error = f"{chunking['unfilled_fields']}个响应字段AI未能有效填写，已保留待填写"
+
+            # 记住校验通过的映射，供之后的请求直接使用
+            await asyncio.to_thread(AIPipelineService.remember_mappings, prompt_data, user_id, parsed.rows)
+
+            # 把记忆中的行和校验通过的行按原字段顺序合并进各接口的响应参数表
+            ai_rows = dict(remembered)
+            ai_rows.update(parsed.rows)
+            AIPipelineService.apply_response_table(document, prompt_data, ai_rows)
+        elif remembered:
+            print("未匹配的响应字段已全部由字段映射记忆填写，跳过响应参数表AI调用")
+        else:
+            print(f"响应字段已全部根据DDL本地匹配（{resolved_fields}个），跳过响应参数表AI调用")
+
+        # 第二次AI调用：业务逻辑分析
+        try:
+            # 提取业务逻辑分析所需信息并填充模板，压缩到token预算以内
+            business_ai_request_content, business_report = await offloader.run(
+                offload, PromptService.build_business_logic_request, document
+            )
+            token_estimates.append(AIPipelineService.report_compaction(business_report))
+
+            business_result = await router.chat_completion(
+                user_id, business_ai_request_content, STAGE_BUSINESS_LOGIC, profiles=profiles
+            )
+
+            # 记录第二次AI聊天交互
+            PromptService.log_chat_interaction(
+                business_ai_request_content,
+                business_result["content"] if business_result["success"] else f"错误: {business_result['error']}",
+                user_id,
+                stage=STAGE_BUSINESS_LOGIC,
+                call_result=business_result
+            )
+
+            if business_result["success"]:
+                # 将业务逻辑写入文档的业务逻辑部分
+                document.set_business_logic(business_result["content"])
+
+        except Exception as business_e:
+            print(f"业务逻辑AI调用失败: {str(business_e)}")
+            # 第二次AI调用失败，但第一次成功，返回第一次的结果
+
+        # 第二次失败时只包含第一次AI增强的结果
+        return PromptResponse(
+            success=True,
+            prompt=document.to_markdown(),
+            error=error,
+            resolved_fields=resolved_fields,
+            total_fields=total_fields,
+            remembered_fields=len(remembered),
+            token_estimates=token_estimates,
+            chunking=chunking
+        )
+
+    @staticmethod
+    async def generate_ai_prompt_or_base(prompt_data: PromptRequest, current_user: dict) -> PromptResponse:
+        """
+        使用AI生成增强版Prompt模板，流水线出错时返回基础版本
+
+        Args:
+            prompt_data: Prompt请求数据（引用的DDL目录表已展开）
+            current_user: 当前用户
+
+        Returns:
+            Prompt生成响应
+        """
+        try:
+            return await AIPipelineService.generate_ai_prompt(prompt_data, current_user)
+
+        except Exception as e:
+            print(f"生成AI prompt时出错: {str(e)}")
+            # 失败时返回基础prompt
+            get_usage_tracker().record_fallback(current_user.get('id'), STAGE_PIPELINE)
+            try:
+                developer = current_user['username']
+                base_prompt = PromptService.generate_prompt_template(prompt_data, developer)
+                return PromptResponse(
+                    success=True,
+                    prompt=base_prompt,
+                    error=f"AI生成失败，返回基础版本: {str(e)}"
+                )
+            except Exception:
+                return PromptResponse(
+                    success=False,
+                    error=f"生成prompt时出错: {str(e)}"
+                )
@@ -0,0 +1,291 @@
+"""
+AI服务路由模块
+在用户配置的多个AI服务档案之间按观测到的延迟和错误率（EWMA）路由请求，
+服务降级时自动故障转移，并可将小型请求优先发送给低成本快速模型
+"""
+
+import os
+import time
+from typing import List, Dict, Any, Optional, Tuple
+
+from app.services.ai_client import AIClient
+from app.services.usage_service import get_usage_tracker, OUTCOME_UPSTREAM, OUTCOME_FAILOVER, OUTCOME_DEGRADED
+from app.storage import get_storage
+
+# 路由配置
+EWMA_ALPHA = float(os.getenv("AI_ROUTER_EWMA_ALPHA", "0.3"))
+ERROR_PENALTY = float(os.getenv("AI_ROUTER_ERROR_PENALTY", "4.0"))
+DEGRADED_ERROR_RATE = float(os.getenv("AI_ROUTER_DEGRADED_ERROR_RATE", "0.5"))
+DEGRADED_CONSECUTIVE_FAILURES = int(os.getenv("AI_ROUTER_DEGRADED_FAILURES", "3"))
+DEGRADED_COOLDOWN_SECONDS = float(os.getenv("AI_ROUTER_COOLDOWN_SECONDS", "30"))
+SMALL_PROMPT_CHARS = int(os.getenv("AI_ROUTER_SMALL_PROMPT_CHARS", "2000"))
+
+# 单一AI配置（个人中心"AI设置"表单）对应的档案标识
+DEFAULT_PROFILE_KEY = "default"
+
+
+class ProviderStats:
+    """单个AI服务档案的运行统计"""
+
+    __slots__ = ("ewma_latency", "ewma_error", "calls", "errors",
+                 "consecutive_failures", "degraded_until", "last_error", "last_used")
+
+    def __init__(self):
+        self.ewma_latency: Optional[float] = None
+        self.ewma_error = 0.0
+        self.calls = 0
+        self.errors = 0
+        self.consecutive_failures = 0
+        self.degraded_until = 0.0
+        self.last_error: Optional[str] = None
+        self.last_used: Optional[float] = None
+
+    def record(self, latency: float, success: bool, error: Optional[str] = None):
+        """记录一次调用结果并更新EWMA"""
+        now = time.time()
+        self.calls += 1
+        self.last_used = now
+
+        if success:
+            self.consecutive_failures = 0
+            # 失败调用的耗时（如连接超时）不代表服务的正常延迟，只在成功时更新
+            if self.ewma_latency is None:
+                self.ewma_latency = latency
+            else:
+                self.ewma_latency = EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * self.ewma_latency
+        else:
+            self.errors += 1
+            self.consecutive_failures += 1
+            self.last_error = error
+
+        self.ewma_error = EWMA_ALPHA * (0.0 if success else 1.0) + (1 - EWMA_ALPHA) * self.ewma_error
+
+        if not success and (self.consecutive_failures >= DEGRADED_CONSECUTIVE_FAILURES
+                            or (self.calls >= 5 and self.ewma_error >= DEGRADED_ERROR_RATE)):
+            self.degraded_until = now + DEGRADED_COOLDOWN_SECONDS
+
+    def is_degraded(self, now: Optional[float] = None) -> bool:
+        """是否处于降级冷却期"""
+        return (now or time.time()) < self.degraded_until
+
+    def score(self) -> float:
+        """路由得分，越小越优先；从未调用过的档案得分为0以便尽快探测"""
+        if self.ewma_latency is None:
+            # 只有失败记录、没有成功延迟样本的档案排在最后
+            return 0.0 if self.calls == 0 else float("inf")
+        return self.ewma_latency * (1 + ERROR_PENALTY * self.ewma_error)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "ewma_latency": round(self.ewma_latency, 3) if self.ewma_latency is not None else None,
+            "ewma_error_rate": round(self.ewma_error, 3),
+            "calls": self.calls,
+            "errors": self.errors,
+            "consecutive_failures": self.consecutive_failures,
+            "degraded": self.is_degraded(),
+            "last_error": self.last_error,
+            "last_used": self.last_used
+        }
+
+
+class AIRouter:
+    """基于EWMA的AI服务档案路由器（统计数据保存在当前进程内存中）"""
+
+    def __init__(self):
+        self._stats: Dict[Tuple[int, str], ProviderStats] = {}
+
+    @staticmethod
+    def profile_key(profile: Dict[str, Any]) -> str:
+        """档案的唯一标识"""
+        return profile.get("key") or f"profile:{profile['id']}"
+
+    @staticmethod
+    def get_user_profiles(user_id: int) -> List[Dict[str, Any]]:
+        """
+        获取用户可参与路由的全部AI服务档案
+
+        单一AI配置作为名为"默认配置"的档案参与路由，与多档案配置兼容
+
+        Args:
+            user_id: 用户ID
+
+        Returns:
+            完整且启用的档案列表（包含密钥）
+        """
+        storage = get_storage()
+        profiles = []
+
+        ai_config = storage.get_user_ai_config_with_key(user_id)
+        if AIClient.is_config_complete(ai_config):
+            default_profile = dict(ai_config)
+            default_profile.update({"key": DEFAULT_PROFILE_KEY, "name": "默认配置"})
+            profiles.append(default_profile)
+
+        for profile in storage.get_user_ai_profiles_with_key(user_id) or []:
+            if profile.get("enabled", True) and AIClient.is_config_complete(profile):
+                profiles.append(profile)
+
+        return profiles
+
+    def get_stats(self, user_id: int, key: str) -> ProviderStats:
+        """获取（必要时创建）档案统计"""
+        stats = self._stats.get((user_id, key))
+        if stats is None:
+            stats = self._stats[(user_id, key)] = ProviderStats()
+        return stats
+
+    def rank_profiles(self, user_id: int, profiles: List[Dict[str, Any]], prompt_chars: int) -> List[Dict[str, Any]]:
+        """
+        按路由优先级排序档案
+
+        排序规则：健康档案优先于降级档案；小型请求优先使用低成本模型，
+        大型请求把低成本模型放在最后作为兜底；同一层级内按EWMA得分排序
+
+        Args:
+            user_id: 用户ID
+            profiles: 候选档案
+            prompt_chars: 请求内容长度
+
+        Returns:
+            排序后的档案列表
+        """
+        now = time.time()
+        small_request = prompt_chars <= SMALL_PROMPT_CHARS
+
+        def sort_key(profile):
+            stats = self.get_stats(user_id, self.profile_key(profile))
+            degraded = stats.is_degraded(now)
+            is_small = bool(profile.get("is_small_model"))
+            model_tier = 0 if is_small == small_request else 1
+            # 降级档案按冷却结束时间排序，最早恢复的最先重试
+            return (degraded, model_tier, stats.degraded_until if degraded else stats.score())
+
+        return sorted(profiles, key=sort_key)
+
+    async def chat_completion(
+        self,
+        user_id: int,
+        content: str,
+        stage: str,
+        profiles: Optional[List[Dict[str, Any]]] = None,
+        max_tokens: int = 4000,
+        temperature: float = 0.3,
+        timeout: float = 60.0
+    ) -> Dict[str, Any]:
+        """
+        按路由策略调用AI服务，失败时依次故障转移到下一个档案
+
+        Args:
+            user_id: 用户ID
+            content: 请求内容
+            stage: 流水线阶段名称（用于日志和统计）
+            profiles: 候选档案，为空时从存储中读取
+            max_tokens: 最大生成token数
+            temperature: 采样温度
+            timeout: 单次调用超时（秒）
+
+        Returns:
+            AIClient.chat_completion 的结果，额外包含 profile、model、attempts 字段
+        """
+        if profiles is None:
+            profiles = self.get_user_profiles(user_id)
+
+        result = {"success": False, "content": "", "status_code": None,
+                  "error": "未配置AI服务", "latency": 0.0}
+        attempts = []
+        used_profile = None
+
+        for profile in self.rank_profiles(user_id, profiles, len(content)):
+            key = self.profile_key(profile)
+            stats = self.get_stats(user_id, key)
+            # 调用前的档案状态决定这次调用的结果来源
+            if stats.is_degraded():
+                outcome = OUTCOME_DEGRADED
+            elif attempts:
+                outcome = OUTCOME_FAILOVER
+            else:
+                outcome = OUTCOME_UPSTREAM
+            used_profile = profile
+            result = await AIClient.chat_completion(
+                profile, content, max_tokens=max_tokens, temperature=temperature, timeout=timeout
+            )
+            stats.record(result["latency"], result["success"], result["error"])
+            get_usage_tracker().record(
+                user_id, profile.get("model_name"), stage, result["success"],
+                prompt_tokens=result["prompt_tokens"],
+                completion_tokens=result["completion_tokens"],
+                latency=result["latency"],
+                ttfb=result["ttfb"],
+                status_code=result["status_code"],
+                outcome=outcome
+            )
+            attempts.append({
+                "profile": profile.get("name", key),
+                "success": result["success"],
+                "latency": round(result["latency"], 3),
+                "error": result["error"]
+            })
+
+            if result["success"]:
+                break
+            print(f"AI服务档案[{profile.get('name', key)}]在{stage}阶段调用失败，尝试故障转移: {result['error']}")
+
+        result["profile"] = used_profile.get("name") if used_profile else None
+        result["model"] = used_profile.get("model_name") if used_profile else None
+        result["stage"] = stage
+        result["attempts"] = attempts
+        return result
+
+    def get_user_profile_stats(self, user_id: int) -> List[Dict[str, Any]]:
+        """
+        获取用户全部档案的路由统计（不包含密钥）
+
+        Args:
+            user_id: 用户ID
+
+        Returns:
+            档案及其统计信息列表
+        """
+        storage = get_storage()
+        entries = []
+
+        ai_config = storage.get_user_ai_config_with_key(user_id)
+        if AIClient.is_config_complete(ai_config):
+            entries.append({
+                "id": None,
+                "key": DEFAULT_PROFILE_KEY,
+                "name": "默认配置",
+                "api_type": ai_config.get("api_type"),
+                "api_url": ai_config.get("api_url"),
+                "model_name": ai_config.get("model_name"),
+                "is_small_model": False,
+                "enabled": True
+            })
+
+        for profile in storage.get_user_ai_profiles_with_key(user_id) or []:
+            entries.append({
+                "id": profile["id"],
+                "key": self.profile_key(profile),
+                "name": profile.get("name"),
+                "api_type": profile.get("api_type"),
+                "api_url": profile.get("api_url"),
+                "model_name": profile.get("model_name"),
+                "is_small_model": profile.get("is_small_model", False),
+                "enabled": profile.get("enabled", True)
+            })
+
+        for entry in entries:
+            entry["stats"] = self.get_stats(user_id, entry["key"]).to_dict()
+
+        return entries
+
+
+# 延迟初始化的全局路由实例
+_router_instance = None
+
+def get_ai_router() -> AIRouter:
+    """获取AI路由实例（单例模式）"""
+    global _router_instance
+    if _router_instance is None:
+        _router_instance = AIRouter()
+    return _router_instance
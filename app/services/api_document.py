@@ -0,0 +1,107 @@
+"""
+接口文档解析模块
+把批量转译上传的接口文档（或命令行批量生成读取的接口定义）拆分为单个接口，每个接口对应批量任务中的一项
+支持的格式：
+- JSON：与 /generate 相同的请求（{"apis": [...]}）、接口信息列表，或单个接口信息
+- JSON Lines（.jsonl / .ndjson）：每行一个接口信息或 {"apis": [...]}
+"""
+
+import json
+from pathlib import Path
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from app.models import ApiInfo
+
+JSON_LINES_SUFFIXES = {".jsonl", ".ndjson"}
+
+# 文档中的一项：(接口信息的JSON, 名称, 路由, 错误信息)；解析失败时接口信息为None
+DocumentEntry = Tuple[Optional[str], str, str, Optional[str]]
+
+
+def _expand(value: Any) -> Iterator[Any]:
+    """展开 {"apis": [...]} 和列表，得到各个接口信息"""
+    if isinstance(value, dict) and isinstance(value.get("apis"), list):
+        yield from value["apis"]
+    elif isinstance(value, list):
+        for element in value:
+            yield from _expand(element)
+    else:
+        yield value
+
+
+def _validate(value: Any) -> DocumentEntry:
+    name = str(value.get("name", "")) if isinstance(value, dict) else ""
+    route = str(value.get("route", "")) if isinstance(value, dict) else ""
+    try:
+        api = ApiInfo.model_validate(value)
+    except ValidationError as e:
+        details = "; ".join(
+            f"{'.'.join(str(part) for part in error['loc']) or '接口信息'}: {error['msg']}" for error in e.errors()
+        )
+        return None, name, route, f"接口信息格式不正确: {details}"
+    return api.model_dump_json(), api.name, api.route, None
+
+
+def iter_json_lines(lines: Iterable[str]) -> Iterator[DocumentEntry]:
+    """
+    逐行解析JSON Lines（每行一个接口信息或 {"apis": [...]}），不在内存中保存整个文档
+
+    Args:
+        lines: 文本行（文件对象或标准输入）
+
+    Yields:
+        各个接口；无法解析的行以错误信息返回
+    """
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            value = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield None, "", "", f"第{line_number}行不是有效的JSON: {e.msg}"
+            continue
+        for api in _expand(value):
+            yield _validate(api)
+
+
+def iter_api_document(path: Path) -> Iterator[DocumentEntry]:
+    """
+    逐个解析接口文档中的接口（JSON Lines按行读取，JSON整体读取）
+
+    Args:
+        path: 文档路径
+
+    Yields:
+        文档中的各个接口；无法解析的接口（或整个文件）以错误信息返回，不影响其他接口
+    """
+    try:
+        if path.suffix.lower() in JSON_LINES_SUFFIXES:
+            with open(path, "r", encoding="utf-8-sig") as f:
+                yield from iter_json_lines(f)
+        else:
+            with open(path, "r", encoding="utf-8-sig") as f:
+                value = json.load(f)
+            for api in _expand(value):
+                yield _validate(api)
+    except json.JSONDecodeError as e:
+        yield None, "", "", f"文件不是有效的JSON（第{e.lineno}行）: {e.msg}"
+    except UnicodeDecodeError:
+        yield None, "", "", "文件不是UTF-8编码的文本"
+
+
+def parse_api_document(path: Path) -> List[DocumentEntry]:
+    """
+    解析上传的接口文档
+
+    Args:
+        path: 文档路径
+
+    Returns:
+        文档中的各个接口；无法解析的接口（或整个文件）以错误信息返回，不影响其他接口
+    """
+    entries = list(iter_api_document(path))
+    if not entries:
+        return [(None, "", "", "文件中没有接口信息")]
+    return entries
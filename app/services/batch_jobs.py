@@ -0,0 +1,674 @@
+"""
+批量转译任务模块
+上传的接口文档拆分为单个接口后写入本地SQLite任务队列，由固定数量的后台worker逐个执行
+Prompt生成（基础版本或AI增强）流水线；每个接口的结果在完成时立即写入数据库，
+服务重启后未完成的接口自动继续执行。任务的每次状态变化递增修订号，供进度推送增量读取。
+多个服务进程（uvicorn --workers）共享同一个数据库：接口在事务中原子地认领并记录执行进程，
+执行中定期更新心跳，只有心跳超时（执行它的进程已退出）的接口才重新排队
+"""
+
+import asyncio
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from app.models import ApiInfo, PromptRequest
+from app.services.ai_pipeline import AIPipelineService
+from app.services.api_document import parse_api_document
+from app.services.auth_service import AuthService
+from app.services.ddl_catalog import get_ddl_catalog, DdlCatalogError
+from app.services.batch_render import render_prompt_item
+from app.services.render_offload import get_render_offloader
+
+# 批量任务配置
+BATCH_JOBS_DB_PATH = os.getenv("BATCH_JOBS_DB_PATH", "data/batch_jobs.db")
+# 上传文档的保存目录（每个任务一个子目录）
+BATCH_UPLOAD_DIR = os.getenv("BATCH_UPLOAD_DIR", "data/batch_uploads")
+# 后台worker数（同时处理的接口数）
+BATCH_JOB_WORKERS = int(os.getenv("BATCH_JOB_WORKERS", "2"))
+# 单个接口执行异常时的最多尝试次数
+BATCH_JOB_MAX_ATTEMPTS = int(os.getenv("BATCH_JOB_MAX_ATTEMPTS", "2"))
+# 单个上传文件的最大字节数
+BATCH_UPLOAD_MAX_BYTES = int(os.getenv("BATCH_UPLOAD_MAX_BYTES", str(50 * 1024 * 1024)))
+# 单个任务最多包含的接口数
+BATCH_JOB_MAX_ITEMS = int(os.getenv("BATCH_JOB_MAX_ITEMS", "5000"))
+# 队列为空时worker检查新任务的间隔（秒）
+BATCH_JOB_POLL_SECONDS = 5
+# 执行接口的进程更新心跳的间隔（秒）；心跳超过 BATCH_JOB_STALE_SECONDS 未更新的接口视为进程已退出，重新排队
+BATCH_JOB_HEARTBEAT_SECONDS = 10
+BATCH_JOB_STALE_SECONDS = int(os.getenv("BATCH_JOB_STALE_SECONDS", "60"))
+
+# 生成方式
+MODE_BASIC = "basic"
+MODE_AI = "ai"
+JOB_MODES = (MODE_BASIC, MODE_AI)
+
+# 任务状态
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_CANCELLED = "cancelled"
+JOB_ACTIVE_STATUSES = (JOB_QUEUED, JOB_RUNNING)
+
+# 接口状态
+ITEM_PENDING = "pending"
+ITEM_RUNNING = "running"
+ITEM_SUCCEEDED = "succeeded"
+ITEM_FAILED = "failed"
+ITEM_CANCELLED = "cancelled"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    status TEXT NOT NULL,
+    files TEXT NOT NULL,
+    total INTEGER NOT NULL DEFAULT 0,
+    succeeded INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    rev INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_user ON jobs (user_id, created_at);
+CREATE TABLE IF NOT EXISTS job_items (
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    file TEXT NOT NULL,
+    name TEXT NOT NULL,
+    route TEXT NOT NULL,
+    payload TEXT,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    prompt TEXT,
+    error TEXT,
+    resolved_fields INTEGER,
+    total_fields INTEGER,
+    rev INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL,
+    owner TEXT,
+    heartbeat_at REAL,
+    PRIMARY KEY (job_id, seq)
+);
+CREATE INDEX IF NOT EXISTS idx_job_items_status ON job_items (status);
+CREATE INDEX IF NOT EXISTS idx_job_items_rev ON job_items (job_id, rev);
+"""
+
+_JOB_COLUMNS = "id, name, mode, status, files, total, succeeded, failed, rev, created_at, updated_at, finished_at"
+_ITEM_COLUMNS = "seq, file, name, route, status, attempts, error, resolved_fields, total_fields, rev, updated_at"
+# 早期版本创建的数据库中缺少的列
+_ITEM_ADDED_COLUMNS = (("owner", "TEXT"), ("heartbeat_at", "REAL"))
+
+
+class BatchJobStore:
+    """批量任务的SQLite存储，每个接口的状态变化立即提交（即检查点）"""
+
+    def __init__(self, db_path: str = BATCH_JOBS_DB_PATH, stale_seconds: int = BATCH_JOB_STALE_SECONDS):
+        self.db_path = Path(db_path)
+        self.stale_seconds = stale_seconds
+        # 当前进程的标识，记录在认领的接口上
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._requeued_at = 0.0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(str(self.db_path), check_same_thread=False, timeout=30)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(_SCHEMA)
+            with connection:
+                # 补充早期版本数据库中缺少的列（多个进程同时启动时只有一个执行）
+                connection.execute("BEGIN IMMEDIATE")
+                existing = {row["name"] for row in connection.execute("PRAGMA table_info(job_items)")}
+                for column, column_type in _ITEM_ADDED_COLUMNS:
+                    if column not in existing:
+                        connection.execute(f"ALTER TABLE job_items ADD COLUMN {column} {column_type}")
+            self._connection = connection
+        return self._connection
+
+    @staticmethod
+    def _job_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["files"] = job["files"].split("\n") if job["files"] else []
+        return job
+
+    @staticmethod
+    def _bump(connection: sqlite3.Connection, job_id: str, now: float) -> int:
+        """递增任务的修订号，返回新的修订号（任务已删除时返回0）"""
+        connection.execute("UPDATE jobs SET rev = rev + 1, updated_at = ? WHERE id = ?", (now, job_id))
+        row = connection.execute("SELECT rev FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row[0] if row else 0
+
+    @staticmethod
+    def _refresh_counts(connection: sqlite3.Connection, job_id: str, now: float):
+        """重新统计任务的完成情况，没有待处理的接口时标记任务完成（已取消的任务保持取消）"""
+        counts = dict(connection.execute(
+            "SELECT status, COUNT(*) FROM job_items WHERE job_id = ? GROUP BY status", (job_id,)
+        ).fetchall())
+        connection.execute(
+            "UPDATE jobs SET succeeded = ?, failed = ? WHERE id = ?",
+            (counts.get(ITEM_SUCCEEDED, 0), counts.get(ITEM_FAILED, 0), job_id)
+        )
+        if not counts.get(ITEM_PENDING) and not counts.get(ITEM_RUNNING):
+            connection.execute(
+                "UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status IN (?, ?)",
+                (JOB_COMPLETED, now, job_id, *JOB_ACTIVE_STATUSES)
+            )
+
+    # ============ 任务 ============
+
+    def create_job(self, user_id: int, name: str, mode: str, files: List[str],
+                   entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        创建任务
+
+        Args:
+            user_id: 用户ID
+            name: 任务名称
+            mode: 生成方式
+            files: 上传的文件名
+            entries: 各接口 {"file", "payload", "name", "route", "error"}，payload为None的接口直接记为失败
+
+        Returns:
+            任务信息
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                "INSERT INTO jobs (id, user_id, name, mode, status, files, total, rev, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, 1, ?, ?)",
+                (job_id, user_id, name, mode, JOB_QUEUED, "\n".join(files), len(entries), now, now)
+            )
+            connection.executemany(
+                "INSERT INTO job_items (job_id, seq, file, name, route, payload, status, error, rev, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, 1, ?)",
+                [
+                    (job_id, seq, entry["file"], entry["name"], entry["route"], entry["payload"],
+                     ITEM_PENDING if entry["payload"] is not None else ITEM_FAILED, entry["error"], now)
+                    for seq, entry in enumerate(entries)
+                ]
+            )
+            self._refresh_counts(connection, job_id, now)
+            connection.commit()
+            row = connection.execute(f"SELECT {_JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._job_dict(row)
+
+    def list_jobs(self, user_id: int, limit: int = 50) -> List[Dict[str, Any]]:
+        """用户的任务（最新的在前）"""
+        with self._lock:
+            rows = self._connect().execute(
+                f"SELECT {_JOB_COLUMNS} FROM jobs WHERE user_id = ? ORDER BY created_at DESC LIMIT ?",
+                (user_id, limit)
+            ).fetchall()
+        return [self._job_dict(row) for row in rows]
+
+    def get_job(self, user_id: int, job_id: str) -> Optional[Dict[str, Any]]:
+        """获取用户的任务，不存在或不属于该用户时返回None"""
+        with self._lock:
+            row = self._connect().execute(
+                f"SELECT {_JOB_COLUMNS} FROM jobs WHERE id = ? AND user_id = ?", (job_id, user_id)
+            ).fetchone()
+        return self._job_dict(row) if row else None
+
+    def cancel_job(self, job_id: str) -> bool:
+        """取消任务：尚未开始的接口不再执行，正在执行的接口完成后照常记录"""
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            updated = connection.execute(
+                "UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status IN (?, ?)",
+                (JOB_CANCELLED, now, job_id, *JOB_ACTIVE_STATUSES)
+            ).rowcount
+            if updated:
+                rev = self._bump(connection, job_id, now)
+                connection.execute(
+                    "UPDATE job_items SET status = ?, rev = ?, updated_at = ? WHERE job_id = ? AND status = ?",
+                    (ITEM_CANCELLED, rev, now, job_id, ITEM_PENDING)
+                )
+            connection.commit()
+        return bool(updated)
+
+    def retry_job(self, job_id: str) -> int:
+        """把失败和已取消的接口重新加入队列，返回重新排队的接口数"""
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            rev = self._bump(connection, job_id, now)
+            retried = connection.execute(
+                "UPDATE job_items SET status = ?, attempts = 0, error = NULL, rev = ?, updated_at = ? "
+                "WHERE job_id = ? AND status IN (?, ?) AND payload IS NOT NULL",
+                (ITEM_PENDING, rev, now, job_id, ITEM_FAILED, ITEM_CANCELLED)
+            ).rowcount
+            if retried:
+                connection.execute(
+                    "UPDATE jobs SET status = ?, finished_at = NULL WHERE id = ?", (JOB_QUEUED, job_id)
+                )
+                self._refresh_counts(connection, job_id, now)
+            connection.commit()
+        return retried
+
+    def delete_job(self, job_id: str):
+        """删除任务及其全部结果"""
+        with self._lock:
+            connection = self._connect()
+            connection.execute("DELETE FROM job_items WHERE job_id = ?", (job_id,))
+            connection.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+            connection.commit()
+
+    # ============ 接口 ============
+
+    def list_items(self, job_id: str, since_rev: int = 0) -> List[Dict[str, Any]]:
+        """任务中修订号大于since_rev的接口（不含生成的Prompt），按序号排列"""
+        with self._lock:
+            rows = self._connect().execute(
+                f"SELECT {_ITEM_COLUMNS} FROM job_items WHERE job_id = ? AND rev > ? ORDER BY seq",
+                (job_id, since_rev)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def get_item(self, job_id: str, seq: int) -> Optional[Dict[str, Any]]:
+        """获取单个接口（含生成的Prompt）"""
+        with self._lock:
+            row = self._connect().execute(
+                f"SELECT {_ITEM_COLUMNS}, prompt FROM job_items WHERE job_id = ? AND seq = ?", (job_id, seq)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def iter_prompts(self, job_id: str, batch_size: int = 100, from_seq: int = 0) -> Iterator[Dict[str, Any]]:
+        """按序号分批读取生成成功的接口（含Prompt），避免一次性载入整个任务的结果；from_seq 为起始序号"""
+        last_seq = from_seq - 1
+        while True:
+            with self._lock:
+                rows = self._connect().execute(
+                    "SELECT seq, file, name, route, prompt, updated_at FROM job_items "
+                    "WHERE job_id = ? AND seq > ? AND status = ? ORDER BY seq LIMIT ?",
+                    (job_id, last_seq, ITEM_SUCCEEDED, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield dict(row)
+            last_seq = rows[-1]["seq"]
+
+    def _requeue_stale(self, connection: sqlite3.Connection, now: float) -> int:
+        """
+        把心跳超时（执行它的进程已退出）的接口重新排队，已达最多尝试次数的记为失败
+
+        Returns:
+            重新排队或记为失败的接口数
+        """
+        rows = connection.execute(
+            "SELECT job_id, seq, attempts FROM job_items WHERE status = ? AND "
+            "(heartbeat_at IS NULL OR heartbeat_at < ?)",
+            (ITEM_RUNNING, now - self.stale_seconds)
+        ).fetchall()
+        for job_id in {row["job_id"] for row in rows}:
+            rev = self._bump(connection, job_id, now)
+            for row in rows:
+                if row["job_id"] != job_id:
+                    continue
+                if row["attempts"] < BATCH_JOB_MAX_ATTEMPTS:
+                    status, error = ITEM_PENDING, None
+                else:
+                    status, error = ITEM_FAILED, "执行接口的服务进程已退出"
+                connection.execute(
+                    "UPDATE job_items SET status = ?, error = ?, owner = NULL, rev = ?, updated_at = ? "
+                    "WHERE job_id = ? AND seq = ?",
+                    (status, error, rev, now, job_id, row["seq"])
+                )
+            self._refresh_counts(connection, job_id, now)
+        return len(rows)
+
+    def requeue_stale(self) -> int:
+        """把执行进程已退出的接口重新排队（服务启动时调用），返回接口数"""
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute("BEGIN IMMEDIATE")
+                self._requeued_at = now
+                return self._requeue_stale(connection, now)
+
+    def claim_next(self) -> Optional[Dict[str, Any]]:
+        """
+        取出队列中最早的待处理接口，标记为由当前进程执行
+
+        查询和标记在同一个写事务（BEGIN IMMEDIATE）中完成，多个进程不会认领同一个接口；
+        每隔 BATCH_JOB_HEARTBEAT_SECONDS 顺带把心跳超时的接口重新排队
+        """
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute("BEGIN IMMEDIATE")
+                if now - self._requeued_at >= BATCH_JOB_HEARTBEAT_SECONDS:
+                    self._requeued_at = now
+                    requeued = self._requeue_stale(connection, now)
+                    if requeued:
+                        print(f"批量转译：{requeued}个接口的执行进程已退出，重新排队")
+                row = connection.execute(
+                    "SELECT i.job_id, i.seq, i.payload, i.attempts, j.user_id, j.mode FROM job_items i "
+                    "JOIN jobs j ON j.id = i.job_id "
+                    "WHERE i.status = ? AND j.status IN (?, ?) ORDER BY j.created_at, i.seq LIMIT 1",
+                    (ITEM_PENDING, *JOB_ACTIVE_STATUSES)
+                ).fetchone()
+                if row is None:
+                    return None
+                rev = self._bump(connection, row["job_id"], now)
+                connection.execute(
+                    "UPDATE job_items SET status = ?, attempts = attempts + 1, owner = ?, heartbeat_at = ?, "
+                    "rev = ?, updated_at = ? WHERE job_id = ? AND seq = ? AND status = ?",
+                    (ITEM_RUNNING, self.owner, now, rev, now, row["job_id"], row["seq"], ITEM_PENDING)
+                )
+                connection.execute(
+                    "UPDATE jobs SET status = ? WHERE id = ? AND status = ?", (JOB_RUNNING, row["job_id"], JOB_QUEUED)
+                )
+        return dict(row, attempts=row["attempts"] + 1)
+
+    def touch(self, items: List[Tuple[str, int]]):
+        """更新当前进程执行中接口的心跳"""
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.executemany(
+                    "UPDATE job_items SET heartbeat_at = ? WHERE job_id = ? AND seq = ? AND status = ? AND owner = ?",
+                    [(now, job_id, seq, ITEM_RUNNING, self.owner) for job_id, seq in items]
+                )
+
+    def finish_item(self, job_id: str, seq: int, status: str, prompt: Optional[str] = None,
+                    error: Optional[str] = None, resolved_fields: Optional[int] = None,
+                    total_fields: Optional[int] = None) -> bool:
+        """
+        记录接口的执行结果（status为pending时重新排队）
+
+        Returns:
+            是否已记录；接口已不由当前进程执行（心跳超时后被重新排队）时不记录
+        """
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute("BEGIN IMMEDIATE")
+                owned = connection.execute(
+                    "SELECT 1 FROM job_items WHERE job_id = ? AND seq = ? AND status = ? AND owner = ?",
+                    (job_id, seq, ITEM_RUNNING, self.owner)
+                ).fetchone()
+                if owned is None:
+                    return False
+                rev = self._bump(connection, job_id, now)
+                connection.execute(
+                    "UPDATE job_items SET status = ?, prompt = ?, error = ?, resolved_fields = ?, total_fields = ?, "
+                    "owner = NULL, rev = ?, updated_at = ? WHERE job_id = ? AND seq = ?",
+                    (status, prompt, error, resolved_fields, total_fields, rev, now, job_id, seq)
+                )
+                self._refresh_counts(connection, job_id, now)
+        return True
+
+    def release_owned(self) -> int:
+        """把当前进程执行中的接口重新排队（服务关闭时调用），返回接口数"""
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute("BEGIN IMMEDIATE")
+                job_ids = [row[0] for row in connection.execute(
+                    "SELECT DISTINCT job_id FROM job_items WHERE status = ? AND owner = ?", (ITEM_RUNNING, self.owner)
+                ).fetchall()]
+                released = 0
+                for job_id in job_ids:
+                    rev = self._bump(connection, job_id, now)
+                    released += connection.execute(
+                        "UPDATE job_items SET status = ?, attempts = MAX(attempts - 1, 0), owner = NULL, rev = ?, "
+                        "updated_at = ? WHERE job_id = ? AND status = ? AND owner = ?",
+                        (ITEM_PENDING, rev, now, job_id, ITEM_RUNNING, self.owner)
+                    ).rowcount
+                    self._refresh_counts(connection, job_id, now)
+        return released
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+class BatchJobQueue:
+    """
+    批量任务队列：后台worker从存储中逐个取出接口执行
+
+    存储和上传目录的读写都是阻塞调用，通过 asyncio.to_thread 在线程中执行，不占用事件循环
+    """
+
+    def __init__(self, store: Optional[BatchJobStore] = None, workers: int = BATCH_JOB_WORKERS,
+                 upload_dir: str = BATCH_UPLOAD_DIR):
+        self.store = store or BatchJobStore()
+        self.workers = max(1, workers)
+        self.upload_dir = Path(upload_dir)
+        self._tasks: List[asyncio.Task] = []
+        # 本进程执行中的接口：(任务ID, 序号)，由心跳任务定期更新心跳
+        self._running: Set[Tuple[str, int]] = set()
+        self._wakeup = asyncio.Event()
+        # 任务状态变化时触发后替换为新的Event，等待进度的连接据此唤醒
+        self._changed = asyncio.Event()
+
+    # ============ 生命周期 ============
+
+    async def start(self):
+        """
+        恢复中断的接口并启动后台worker和心跳任务（应用启动时调用）
+
+        只恢复心跳超时的接口，其他服务进程正在执行的接口不受影响
+        """
+        if self._tasks:
+            return
+        resumed = await asyncio.to_thread(self.store.requeue_stale)
+        if resumed:
+            print(f"批量转译：恢复{resumed}个中断的接口")
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._heartbeat()))
+
+    async def stop(self):
+        """停止后台worker（应用关闭时调用）；本进程执行中的接口立即重新排队，由其他进程或下次启动时执行"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        try:
+            released = await asyncio.to_thread(self.store.release_owned)
+            if released:
+                print(f"批量转译：{released}个执行中的接口已重新排队")
+        except sqlite3.Error as e:
+            print(f"批量转译：重新排队执行中的接口失败: {str(e)}")
+        await asyncio.to_thread(self.store.close)
+
+    async def _heartbeat(self):
+        """定期更新本进程执行中接口的心跳，其他进程据此判断接口是否仍在执行"""
+        while True:
+            await asyncio.sleep(BATCH_JOB_HEARTBEAT_SECONDS)
+            if self._running:
+                try:
+                    await asyncio.to_thread(self.store.touch, list(self._running))
+                except sqlite3.Error as e:
+                    print(f"更新批量转译接口心跳失败: {str(e)}")
+
+    # ============ 通知 ============
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def changes(self) -> asyncio.Event:
+        """当前的状态变化通知：任意任务的状态变化后触发（先取通知再读取状态，避免错过变化）"""
+        return self._changed
+
+    # ============ 任务操作 ============
+
+    def job_dir(self, job_id: str) -> Path:
+        """任务的上传文件目录"""
+        return self.upload_dir / job_id
+
+    @staticmethod
+    def upload_path(directory: Path, index: int, file_name: str) -> Path:
+        """上传文件的保存路径（加序号前缀，避免同名文件互相覆盖）"""
+        return directory / f"{index:04d}_{Path(file_name).name or 'document.json'}"
+
+    @staticmethod
+    def original_name(path: Path) -> str:
+        """保存路径对应的原文件名"""
+        return path.name.split("_", 1)[-1]
+
+    def staging_dir(self) -> Path:
+        """新建上传文件的临时目录（任务创建后移动到任务目录）"""
+        path = self.upload_dir / f"upload-{uuid.uuid4().hex}"
+        path.mkdir(parents=True, exist_ok=True)
+        return path
+
+    async def submit(self, user_id: int, name: str, mode: str, staging: Path, files: List[Path]) -> Dict[str, Any]:
+        """
+        解析已保存的上传文档并创建任务
+
+        Args:
+            user_id: 用户ID
+            name: 任务名称
+            mode: 生成方式
+            staging: 上传文件的临时目录
+            files: 已保存的文件（按上传顺序）
+
+        Returns:
+            任务信息
+
+        Raises:
+            ValueError: 接口数超出上限
+        """
+        def parse() -> List[Dict[str, Any]]:
+            entries = []
+            for path in files:
+                file_name = self.original_name(path)
+                for payload, api_name, route, error in parse_api_document(path):
+                    entries.append({"file": file_name, "payload": payload, "name": api_name,
+                                    "route": route, "error": error})
+            return entries
+
+        try:
+            entries = await asyncio.to_thread(parse)
+            if len(entries) > BATCH_JOB_MAX_ITEMS:
+                raise ValueError(f"单个任务最多包含{BATCH_JOB_MAX_ITEMS}个接口，上传的文档中有{len(entries)}个")
+            job = await asyncio.to_thread(
+                self.store.create_job, user_id, name, mode, [self.original_name(path) for path in files], entries
+            )
+        except Exception:
+            await asyncio.to_thread(shutil.rmtree, staging, ignore_errors=True)
+            raise
+
+        await asyncio.to_thread(staging.rename, self.job_dir(job["id"]))
+        self._wakeup.set()
+        self._notify()
+        return job
+
+    async def cancel(self, job_id: str) -> bool:
+        """取消任务"""
+        cancelled = await asyncio.to_thread(self.store.cancel_job, job_id)
+        self._notify()
+        return cancelled
+
+    async def retry(self, job_id: str) -> int:
+        """重新执行失败和已取消的接口"""
+        retried = await asyncio.to_thread(self.store.retry_job, job_id)
+        if retried:
+            self._wakeup.set()
+        self._notify()
+        return retried
+
+    async def delete(self, job_id: str):
+        """删除任务、结果和上传的文档"""
+        await asyncio.to_thread(self.store.delete_job, job_id)
+        await asyncio.to_thread(shutil.rmtree, self.job_dir(job_id), ignore_errors=True)
+        self._notify()
+
+    # ============ 执行 ============
+
+    async def _worker(self):
+        while True:
+            self._wakeup.clear()
+            item = await asyncio.to_thread(self.store.claim_next)
+            if item is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), BATCH_JOB_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            self._notify()
+            self._running.add((item["job_id"], item["seq"]))
+            try:
+                await self._process(item)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"批量转译接口执行出错（任务{item['job_id']} 第{item['seq'] + 1}个）: {str(e)}")
+                if item["attempts"] < BATCH_JOB_MAX_ATTEMPTS:
+                    await self._finish(item["job_id"], item["seq"], ITEM_PENDING, error=str(e))
+                else:
+                    await self._finish(item["job_id"], item["seq"], ITEM_FAILED, error=f"生成prompt时出错: {str(e)}")
+            finally:
+                self._running.discard((item["job_id"], item["seq"]))
+            self._notify()
+
+    async def _finish(self, job_id: str, seq: int, status: str, **result: Any):
+        """在线程中记录接口的执行结果（接口已被重新排队给其他进程时丢弃）"""
+        if not await asyncio.to_thread(self.store.finish_item, job_id, seq, status, **result):
+            print(f"批量转译：任务{job_id} 第{seq + 1}个接口已由其他进程重新执行，丢弃本次结果")
+
+    async def _process(self, item: Dict[str, Any]):
+        """执行单个接口的Prompt生成流水线并记录结果"""
+        job_id, seq = item["job_id"], item["seq"]
+        user = await asyncio.to_thread(AuthService.get_user_by_id, item["user_id"])
+        if user is None:
+            await self._finish(job_id, seq, ITEM_FAILED, error="任务所属用户不存在")
+            return
+
+        prompt_data = PromptRequest(apis=[ApiInfo.model_validate_json(item["payload"])])
+        try:
+            prompt_data = await asyncio.to_thread(get_ddl_catalog().expand_request, user["id"], prompt_data)
+        except DdlCatalogError as e:
+            await self._finish(job_id, seq, ITEM_FAILED, error=str(e))
+            return
+
+        if item["mode"] == MODE_AI:
+            response = await AIPipelineService.generate_ai_prompt(prompt_data, user)
+            if not response.success:
+                await self._finish(job_id, seq, ITEM_FAILED, error=response.error)
+                return
+            await self._finish(job_id, seq, ITEM_SUCCEEDED, prompt=response.prompt, error=response.error,
+                               resolved_fields=response.resolved_fields, total_fields=response.total_fields)
+        else:
+            offloader = get_render_offloader()
+            rendered = await offloader.run(
+                offloader.should_offload(prompt_data), render_prompt_item, prompt_data, user["username"]
+            )
+            await self._finish(job_id, seq, ITEM_SUCCEEDED, **rendered)
+
+
+# 延迟初始化的全局批量任务队列实例
+_queue_instance = None
+
+def get_batch_job_queue() -> BatchJobQueue:
+    """获取批量任务队列实例（单例模式）"""
+    global _queue_instance
+    if _queue_instance is None:
+        _queue_instance = BatchJobQueue()
+    return _queue_instance
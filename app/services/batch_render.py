@@ -0,0 +1,135 @@
+"""
+批量Prompt生成模块
+在进程池中并行渲染大量Prompt请求，按完成顺序逐条返回结果（单条失败不影响其他请求）
+"""
+
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, AsyncIterator, Dict, Optional, Tuple, Union
+
+from app.models import PromptRequest
+from app.services.prompt_service import PromptService
+
+# 批量生成配置
+# 进程池大小，默认等于CPU核数
+BATCH_RENDER_WORKERS = int(os.getenv("BATCH_RENDER_WORKERS", str(os.cpu_count() or 1)))
+# 单次批量请求最多包含的Prompt请求数
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "10000"))
+# 单次批量请求体的最大字节数
+BATCH_MAX_BODY_BYTES = int(os.getenv("BATCH_MAX_BODY_BYTES", str(64 * 1024 * 1024)))
+# 每个工作进程同时排队的请求数（限制读取输入的速度，避免一次性占用大量内存）
+BATCH_QUEUE_PER_WORKER = 4
+
+
+def render_prompt_item(prompt_data: PromptRequest, developer: str) -> Dict[str, Any]:
+    """
+    在工作进程中渲染单个Prompt请求（模块级函数，便于进程池序列化）
+
+    Args:
+        prompt_data: Prompt请求数据（引用的DDL目录表已展开）
+        developer: 开发者名称
+
+    Returns:
+        prompt、resolved_fields、total_fields
+    """
+    prompt = PromptService.generate_prompt_template(prompt_data, developer)
+    resolved_fields, total_fields = PromptService.count_premapped_fields(prompt_data)
+    return {"prompt": prompt, "resolved_fields": resolved_fields, "total_fields": total_fields}
+
+
+# 批量输入的一项：(序号, 请求数据或该项的错误)
+BatchItem = Tuple[int, Union[PromptRequest, Exception]]
+
+
+class BatchRenderer:
+    """基于进程池的批量渲染器"""
+
+    def __init__(self, workers: int = BATCH_RENDER_WORKERS):
+        self.workers = max(1, workers)
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    @staticmethod
+    def _error(index: int, error: Union[str, Exception]) -> Dict[str, Any]:
+        return {"index": index, "success": False, "error": str(error)}
+
+    async def render_stream(self, items: AsyncIterator[BatchItem], developer: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        并行渲染输入中的每个请求，按完成顺序产出结果；最后产出一条汇总
+
+        Args:
+            items: 批量输入（可以边读取边渲染）
+            developer: 开发者名称
+
+        Yields:
+            每项的结果 {"index", "success", "prompt"/"error", ...}，最后是 {"done": true, ...} 汇总
+        """
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        started = time.perf_counter()
+        pending: Dict[asyncio.Future, int] = {}
+        limit = self.workers * BATCH_QUEUE_PER_WORKER
+        counts = {"total": 0, "succeeded": 0, "failed": 0}
+
+        def collect(future: asyncio.Future) -> Dict[str, Any]:
+            index = pending.pop(future)
+            try:
+                result = dict(future.result(), index=index, success=True)
+                counts["succeeded"] += 1
+            except Exception as e:
+                result = self._error(index, f"生成prompt时出错: {str(e)}")
+                counts["failed"] += 1
+            return result
+
+        async for index, item in items:
+            counts["total"] += 1
+            if isinstance(item, Exception):
+                counts["failed"] += 1
+                yield self._error(index, item)
+                continue
+
+            pending[loop.run_in_executor(pool, render_prompt_item, item, developer)] = index
+
+            # 先返回已完成的结果，排队已满时等待至少一项完成
+            for future in [future for future in pending if future.done()]:
+                yield collect(future)
+            if len(pending) >= limit:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    yield collect(future)
+
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                yield collect(future)
+
+        yield dict(counts, done=True, workers=self.workers, elapsed=round(time.perf_counter() - started, 3))
+
+    def shutdown(self):
+        """关闭进程池"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+# 延迟初始化的全局批量渲染器实例
+_renderer_instance = None
+
+def get_batch_renderer() -> BatchRenderer:
+    """获取批量渲染器实例（单例模式）"""
+    global _renderer_instance
+    if _renderer_instance is None:
+        _renderer_instance = BatchRenderer()
+    return _renderer_instance
+
+
+def shutdown_batch_renderer():
+    """关闭批量渲染器的进程池（应用关闭时调用）"""
+    if _renderer_instance is not None:
+        _renderer_instance.shutdown()
@@ -0,0 +1,217 @@
+"""
+AI聊天日志异步写入模块
+调用方只需将日志记录放入有界队列，由后台任务批量写盘，
+按大小/时间切分日志文件并压缩归档，应用关闭时写完剩余记录
+"""
+
+import asyncio
+import gzip
+import os
+import shutil
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+from app.services.chat_record_store import ChatRecordStore, get_chat_record_store, hash_request
+
+# 日志写入配置
+CHAT_LOG_MAX_BYTES = int(os.getenv("CHAT_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+CHAT_LOG_ROTATE_SECONDS = float(os.getenv("CHAT_LOG_ROTATE_SECONDS", "86400"))
+CHAT_LOG_BACKUP_COUNT = int(os.getenv("CHAT_LOG_BACKUP_COUNT", "30"))
+CHAT_LOG_QUEUE_SIZE = int(os.getenv("CHAT_LOG_QUEUE_SIZE", "1000"))
+CHAT_LOG_BATCH_SIZE = 100
+
+
+class ChatLogWriter:
+    """带轮转的异步聊天日志写入器，同时写入文本日志和结构化记录存储"""
+
+    def __init__(self, log_dir: str = "logs", filename: str = "chat.log",
+                 record_store: Optional[ChatRecordStore] = None):
+        self.log_dir = Path(log_dir)
+        self.log_file = self.log_dir / filename
+        self.record_store = record_store
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._segment_started = time.time()
+        self.stats = {"written": 0, "dropped": 0, "batches": 0, "rotations": 0, "errors": 0}
+
+    @staticmethod
+    def format_entry(record: Dict[str, Any]) -> str:
+        """将日志记录格式化为chat.log的文本格式"""
+        timestamp = datetime.fromtimestamp(record["timestamp"]).strftime("%Y-%m-%d %H:%M:%S")
+        user_id = record.get("user_id")
+        return f"""
+==================== AI Chat Log ====================
+时间: {timestamp}
+用户ID: {user_id if user_id else 'Unknown'}
+
+--- AI 请求内容 ---
+{record['request']}
+
+--- AI 响应内容 ---
+{record['response']}
+
+================================================
+
+"""
+
+    @staticmethod
+    def to_structured(record: Dict[str, Any]) -> Dict[str, Any]:
+        """将日志记录转换为结构化存储格式"""
+        return {
+            "ts": record["timestamp"],
+            "user_id": record.get("user_id"),
+            "stage": record.get("stage"),
+            "request_hash": hash_request(record["request"]),
+            "latency": record.get("latency"),
+            "ttfb": record.get("ttfb"),
+            "prompt_tokens": record.get("prompt_tokens"),
+            "completion_tokens": record.get("completion_tokens"),
+            "status": record.get("status"),
+            "model": record.get("model"),
+            "profile": record.get("profile"),
+            "request": record["request"],
+            "response": record["response"]
+        }
+
+    def enqueue(self, record: Dict[str, Any]) -> bool:
+        """
+        非阻塞地提交一条日志记录
+
+        Args:
+            record: 日志记录（timestamp、user_id、request、response，
+                以及可选的 stage、latency、ttfb、prompt_tokens、completion_tokens、status、model、profile）
+
+        Returns:
+            是否成功入队；队列已满时丢弃并计数
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # 没有事件循环（如命令行脚本）时直接同步写入
+            self._write_batch([record])
+            return True
+
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self.start()
+
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+            return False
+
+    def start(self):
+        """启动后台写入任务"""
+        loop = asyncio.get_running_loop()
+        if self._task is not None and not self._task.done() and self._loop is loop:
+            return
+
+        # 事件循环变化时（如测试客户端），旧队列中未写入的记录转移到新队列
+        leftover = []
+        while self._queue is not None and not self._queue.empty():
+            record = self._queue.get_nowait()
+            if record is not None:
+                leftover.append(record)
+
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=CHAT_LOG_QUEUE_SIZE)
+        for record in leftover:
+            self._queue.put_nowait(record)
+        self._task = loop.create_task(self._run())
+
+    async def stop(self):
+        """停止后台写入任务，写完队列中剩余的记录"""
+        if self._task is None or self._task.done() or self._loop is not asyncio.get_running_loop():
+            self._task = None
+            return
+        # 放入结束标记，写入任务处理完之前的全部记录后退出
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+
+    async def _run(self):
+        while True:
+            batch: List[Dict[str, Any]] = []
+            record = await self._queue.get()
+            stopping = record is None
+            if not stopping:
+                batch.append(record)
+            while not stopping and len(batch) < CHAT_LOG_BATCH_SIZE and not self._queue.empty():
+                record = self._queue.get_nowait()
+                if record is None:
+                    stopping = True
+                else:
+                    batch.append(record)
+            if batch:
+                await asyncio.to_thread(self._write_batch, batch)
+            if stopping:
+                return
+
+    def _write_batch(self, batch: List[Dict[str, Any]]):
+        """将一批记录写入日志文件（在工作线程中执行）"""
+        try:
+            self.log_dir.mkdir(parents=True, exist_ok=True)
+            if self._should_rotate():
+                self._rotate()
+
+            with open(self.log_file, "a", encoding="utf-8") as f:
+                f.write("".join(self.format_entry(record) for record in batch))
+
+            self.stats["written"] += len(batch)
+            self.stats["batches"] += 1
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"记录chat.log时出错: {str(e)}")
+
+        if self.record_store is not None:
+            try:
+                self.record_store.append_batch([self.to_structured(record) for record in batch])
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"写入结构化聊天记录时出错: {str(e)}")
+
+    def _should_rotate(self) -> bool:
+        try:
+            size = self.log_file.stat().st_size
+        except FileNotFoundError:
+            return False
+        if size == 0:
+            return False
+        return size >= CHAT_LOG_MAX_BYTES or time.time() - self._segment_started >= CHAT_LOG_ROTATE_SECONDS
+
+    def _rotate(self):
+        """切分当前日志文件，压缩归档并清理过旧的归档"""
+        suffix = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        rotated = self.log_dir / f"{self.log_file.stem}_{suffix}{self.log_file.suffix}"
+        os.replace(self.log_file, rotated)
+        self._segment_started = time.time()
+        self.stats["rotations"] += 1
+
+        with open(rotated, "rb") as src, gzip.open(f"{rotated}.gz", "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        rotated.unlink()
+
+        archives = sorted(self.log_dir.glob(f"{self.log_file.stem}_*{self.log_file.suffix}.gz"))
+        for archive in archives[:-CHAT_LOG_BACKUP_COUNT] if CHAT_LOG_BACKUP_COUNT > 0 else []:
+            archive.unlink()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """写入器运行统计"""
+        stats = dict(self.stats)
+        stats["queued"] = self._queue.qsize() if self._queue is not None else 0
+        return stats
+
+
+# 延迟初始化的全局写入器实例
+_writer_instance = None
+
+def get_chat_log_writer() -> ChatLogWriter:
+    """获取聊天日志写入器实例（单例模式）"""
+    global _writer_instance
+    if _writer_instance is None:
+        _writer_instance = ChatLogWriter(record_store=get_chat_record_store())
+    return _writer_instance
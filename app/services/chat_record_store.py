@@ -0,0 +1,258 @@
+"""
+结构化AI聊天记录存储模块
+以分段追加的JSONL文件保存每次AI调用的完整记录（用户、时间、阶段、请求哈希、延迟、token、
+请求与响应），并维护按时间和用户的轻量索引，用于分析和回放。
+多个服务进程共用同一存储目录时，追加和索引更新通过文件锁串行执行
+"""
+
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Iterator
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# 存储配置
+CHAT_RECORD_SEGMENT_BYTES = int(os.getenv("CHAT_RECORD_SEGMENT_BYTES", str(16 * 1024 * 1024)))
+# 每隔多少条记录保存一个稀疏时间索引点
+INDEX_MARK_INTERVAL = 64
+
+
+def hash_request(content: str) -> str:
+    """计算请求内容的哈希（用于识别重复请求）"""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+
+
+@contextmanager
+def _file_lock(path: Path):
+    """跨进程的排他文件锁"""
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class ChatRecordStore:
+    """分段追加的聊天记录存储"""
+
+    def __init__(self, storage_dir: str = "logs/chat_records"):
+        self.storage_dir = Path(storage_dir)
+        self.index_file = self.storage_dir / "index.json"
+        self.lock_file = self.storage_dir / "index.lock"
+        self._lock = threading.Lock()
+        self._index: Optional[Dict[str, Any]] = None
+
+    # ============ 索引维护 ============
+
+    @contextmanager
+    def _locked_index(self):
+        """
+        持有线程锁和文件锁，并重新读取索引（其他进程可能已追加记录）
+
+        Yields:
+            最新的索引
+        """
+        with self._lock:
+            self.storage_dir.mkdir(parents=True, exist_ok=True)
+            with _file_lock(self.lock_file):
+                self._index = None
+                yield self._load_index()
+
+    def _load_index(self) -> Dict[str, Any]:
+        if self._index is not None:
+            return self._index
+        try:
+            with open(self.index_file, "r", encoding="utf-8") as f:
+                self._index = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self._index = {"version": 1, "segments": []}
+        self._recover_tail()
+        return self._index
+
+    def _save_index(self):
+        tmp_file = self.index_file.with_suffix(".tmp")
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(self._index, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_file, self.index_file)
+
+    @staticmethod
+    def _new_segment(number: int) -> Dict[str, Any]:
+        return {
+            "file": f"segment_{number:06d}.jsonl",
+            "start_ts": None,
+            "end_ts": None,
+            "count": 0,
+            "bytes": 0,
+            "users": {},
+            "marks": []
+        }
+
+    def _index_record(self, segment: Dict[str, Any], record: Dict[str, Any], offset: int, size: int):
+        """把一条已写入的记录登记到段索引"""
+        ts = record["ts"]
+        if segment["count"] % INDEX_MARK_INTERVAL == 0:
+            segment["marks"].append([ts, offset])
+        segment["start_ts"] = ts if segment["start_ts"] is None else min(segment["start_ts"], ts)
+        segment["end_ts"] = ts if segment["end_ts"] is None else max(segment["end_ts"], ts)
+        user_key = str(record.get("user_id"))
+        segment["users"][user_key] = segment["users"].get(user_key, 0) + 1
+        segment["count"] += 1
+        segment["bytes"] = offset + size
+
+    def _recover_tail(self):
+        """
+        索引落后于数据文件时（如进程异常退出），补扫最后一个段的尾部
+
+        写入中断留下的不完整行会被截掉，之后追加的记录从完整的行之后开始（调用方须持有文件锁）
+        """
+        segments = self._index["segments"]
+        if not segments:
+            return
+        segment = segments[-1]
+        path = self.storage_dir / segment["file"]
+        try:
+            actual = path.stat().st_size
+        except FileNotFoundError:
+            return
+        if actual <= segment["bytes"]:
+            return
+
+        with open(path, "r+b") as f:
+            f.seek(segment["bytes"])
+            offset = segment["bytes"]
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                self._index_record(segment, record, offset, len(line))
+                offset += len(line)
+            if offset < actual:
+                print(f"聊天记录段 {segment['file']} 末尾有{actual - offset}字节不完整的记录，已截掉")
+                f.truncate(offset)
+
+    # ============ 写入 ============
+
+    def append_batch(self, records: List[Dict[str, Any]]):
+        """
+        追加一批记录（在写入线程中调用）
+
+        Args:
+            records: 结构化聊天记录列表
+        """
+        if not records:
+            return
+
+        with self._locked_index() as index:
+            segments = index["segments"]
+            if not segments or segments[-1]["bytes"] >= CHAT_RECORD_SEGMENT_BYTES:
+                segments.append(self._new_segment(len(segments) + 1))
+            segment = segments[-1]
+
+            lines = [(record, (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8"))
+                     for record in records]
+            with open(self.storage_dir / segment["file"], "ab") as f:
+                f.write(b"".join(line for _, line in lines))
+
+            offset = segment["bytes"]
+            for record, line in lines:
+                self._index_record(segment, record, offset, len(line))
+                offset += len(line)
+
+            self._save_index()
+
+    # ============ 查询 ============
+
+    def iter_records(
+        self,
+        start_ts: Optional[float] = None,
+        end_ts: Optional[float] = None,
+        user_id: Optional[int] = None,
+        stage: Optional[str] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        按时间窗口、用户、阶段读取记录
+
+        先用段索引跳过时间范围或用户不匹配的段，再用稀疏时间索引定位段内起始位置
+
+        Args:
+            start_ts: 起始时间戳（含）
+            end_ts: 结束时间戳（含）
+            user_id: 用户ID
+            stage: 流水线阶段
+
+        Yields:
+            结构化聊天记录
+        """
+        with self._locked_index() as index:
+            segments = [dict(s) for s in index["segments"]]
+
+        for segment in segments:
+            if not segment["count"]:
+                continue
+            if start_ts is not None and segment["end_ts"] < start_ts:
+                continue
+            if end_ts is not None and segment["start_ts"] > end_ts:
+                continue
+            if user_id is not None and str(user_id) not in segment["users"]:
+                continue
+
+            offset = 0
+            if start_ts is not None:
+                for mark_ts, mark_offset in segment["marks"]:
+                    if mark_ts > start_ts:
+                        break
+                    offset = mark_offset
+
+            with open(self.storage_dir / segment["file"], "rb") as f:
+                f.seek(offset)
+                while f.tell() < segment["bytes"]:
+                    line = f.readline()
+                    if not line:
+                        break
+                    record = json.loads(line)
+                    ts = record["ts"]
+                    if start_ts is not None and ts < start_ts:
+                        continue
+                    if end_ts is not None and ts > end_ts:
+                        continue
+                    if user_id is not None and record.get("user_id") != user_id:
+                        continue
+                    if stage is not None and record.get("stage") != stage:
+                        continue
+                    yield record
+
+    def get_index_summary(self) -> List[Dict[str, Any]]:
+        """各段的索引摘要（不含稀疏索引点）"""
+        with self._locked_index() as index:
+            return [{k: v for k, v in s.items() if k != "marks"} for s in index["segments"]]
+
+
+# 延迟初始化的全局存储实例
+_store_instance = None
+
+def get_chat_record_store() -> ChatRecordStore:
+    """获取结构化聊天记录存储实例（单例模式）"""
+    global _store_instance
+    if _store_instance is None:
+        _store_instance = ChatRecordStore()
+    return _store_instance
@@ -0,0 +1,208 @@
+"""
+DDL目录模块
+用户一次性登记建表语句，按表拆分、解析并以内容哈希标识版本；
+Prompt请求可以只引用表名，生成时再从目录中取出DDL（解析结果已预先缓存）
+"""
+
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.models import ApiInfo, PromptRequest
+from app.services.ddl_parser import parse_ddl_cached, split_create_statements
+
+# 目录配置
+DDL_CATALOG_FILE = os.getenv("DDL_CATALOG_FILE", "data/ddl_catalog.json")
+# 每个用户最多登记的表数
+DDL_CATALOG_MAX_TABLES = int(os.getenv("DDL_CATALOG_MAX_TABLES", "5000"))
+
+
+def hash_ddl(ddl: str) -> str:
+    """DDL内容哈希（忽略空白差异）"""
+    normalized = " ".join(ddl.split())
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class DdlCatalogError(ValueError):
+    """DDL目录操作错误（登记内容无效、引用的表不存在等）"""
+
+
+class DdlCatalog:
+    """按用户隔离的DDL目录，保存在JSON文件中"""
+
+    def __init__(self, catalog_file: str = DDL_CATALOG_FILE):
+        self.catalog_file = Path(catalog_file)
+        self._lock = threading.Lock()
+        self._data: Optional[Dict[str, Dict[str, Dict[str, Any]]]] = None
+
+    # ============ 持久化 ============
+
+    def _load(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        if self._data is None:
+            try:
+                with open(self.catalog_file, "r", encoding="utf-8") as f:
+                    self._data = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                self._data = {}
+            # 预先解析全部DDL，之后的请求直接命中解析缓存
+            for tables in self._data.values():
+                for entry in tables.values():
+                    parse_ddl_cached(entry["ddl"])
+        return self._data
+
+    def _save(self):
+        self.catalog_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.catalog_file.with_suffix(".tmp")
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(self._data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_file, self.catalog_file)
+
+    @staticmethod
+    def _summary(entry: Dict[str, Any]) -> Dict[str, Any]:
+        """不含DDL原文的表信息"""
+        return {key: value for key, value in entry.items() if key != "ddl"}
+
+    # ============ 目录操作 ============
+
+    def register(self, user_id: int, ddl: str) -> List[Dict[str, Any]]:
+        """
+        登记DDL（可包含多张表），同名表内容有变化时版本号加一
+
+        Args:
+            user_id: 用户ID
+            ddl: 建表语句
+
+        Returns:
+            登记的各表信息（含 changed 标记）
+
+        Raises:
+            DdlCatalogError: 没有可识别的建表语句或超出表数限制
+        """
+        statements = split_create_statements(ddl)
+        if not statements:
+            raise DdlCatalogError("未识别到CREATE TABLE语句")
+
+        now = datetime.now().isoformat()
+        results = []
+        with self._lock:
+            tables = self._load().setdefault(str(user_id), {})
+            new_names = {name.lower() for name, _ in statements} - set(tables)
+            if len(tables) + len(new_names) > DDL_CATALOG_MAX_TABLES:
+                raise DdlCatalogError(f"DDL目录最多登记{DDL_CATALOG_MAX_TABLES}张表")
+
+            for name, statement in statements:
+                schema = parse_ddl_cached(statement)[0]
+                content_hash = hash_ddl(statement)
+                key = name.lower()
+                entry = tables.get(key)
+                changed = entry is None or entry["hash"] != content_hash
+                if changed:
+                    entry = {
+                        "name": name,
+                        "comment": schema.comment,
+                        "columns": len(schema.columns),
+                        "hash": content_hash,
+                        "version": entry["version"] + 1 if entry else 1,
+                        "created_at": entry["created_at"] if entry else now,
+                        "updated_at": now,
+                        "ddl": statement
+                    }
+                    tables[key] = entry
+                results.append(dict(self._summary(entry), changed=changed))
+            self._save()
+        return results
+
+    def list_tables(self, user_id: int) -> List[Dict[str, Any]]:
+        """列出用户登记的全部表（不含DDL原文）"""
+        with self._lock:
+            tables = self._load().get(str(user_id), {})
+            return [self._summary(entry) for entry in sorted(tables.values(), key=lambda e: e["name"].lower())]
+
+    def get_table(self, user_id: int, name: str) -> Optional[Dict[str, Any]]:
+        """按表名查找（忽略大小写）"""
+        with self._lock:
+            entry = self._load().get(str(user_id), {}).get(name.lower())
+            return dict(entry) if entry else None
+
+    def delete_table(self, user_id: int, name: str) -> bool:
+        """删除登记的表"""
+        with self._lock:
+            tables = self._load().get(str(user_id), {})
+            if tables.pop(name.lower(), None) is None:
+                return False
+            self._save()
+            return True
+
+    def resolve(self, user_id: int, table_refs: List[str]) -> List[Tuple[str, str]]:
+        """
+        把表名引用解析为DDL
+
+        Args:
+            user_id: 用户ID
+            table_refs: 表名列表，可用 表名@哈希前缀 固定版本
+
+        Returns:
+            [(表名, DDL)]
+
+        Raises:
+            DdlCatalogError: 表不存在或版本不匹配
+        """
+        with self._lock:
+            tables = self._load().get(str(user_id), {})
+            resolved = []
+            missing = []
+            for ref in table_refs:
+                name, _, pinned = ref.strip().partition("@")
+                entry = tables.get(name.strip().lower())
+                if entry is None:
+                    missing.append(name.strip())
+                elif pinned and not entry["hash"].startswith(pinned.strip()):
+                    raise DdlCatalogError(f"表 {entry['name']} 的当前版本（{entry['hash'][:12]}）与引用的版本 {pinned} 不一致")
+                else:
+                    resolved.append((entry["name"], entry["ddl"]))
+        if missing:
+            raise DdlCatalogError(f"DDL目录中不存在以下表: {', '.join(missing)}")
+        return resolved
+
+    def expand_request(self, user_id: int, prompt_data: PromptRequest) -> PromptRequest:
+        """
+        把请求中各接口引用的表展开到 database_tables（已直接提供的相同DDL不重复添加）
+
+        Args:
+            user_id: 用户ID
+            prompt_data: Prompt请求数据
+
+        Returns:
+            展开后的请求；没有引用时原样返回
+        """
+        if not any(api.table_refs for api in prompt_data.apis):
+            return prompt_data
+
+        apis: List[ApiInfo] = []
+        for api in prompt_data.apis:
+            if not api.table_refs:
+                apis.append(api)
+                continue
+            database_tables = list(api.database_tables)
+            existing = {hash_ddl(ddl) for ddl in database_tables}
+            for _, ddl in self.resolve(user_id, api.table_refs):
+                if hash_ddl(ddl) not in existing:
+                    database_tables.append(ddl)
+                    existing.add(hash_ddl(ddl))
+            apis.append(api.model_copy(update={"database_tables": database_tables, "table_refs": []}))
+        return prompt_data.model_copy(update={"apis": apis})
+
+
+# 延迟初始化的全局目录实例
+_catalog_instance = None
+
+def get_ddl_catalog() -> DdlCatalog:
+    """获取DDL目录实例（单例模式）"""
+    global _catalog_instance
+    if _catalog_instance is None:
+        _catalog_instance = DdlCatalog()
+    return _catalog_instance
@@ -0,0 +1,430 @@
+"""
+DDL解析模块
+把接口关联的建表语句解析为 表/字段/注释 结构，并建立规范化字段名索引，
+用于在本地确定性地完成 user_id -> userId 这类下划线/驼峰字段的映射
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+# 建表语句开头：CREATE [TEMPORARY] TABLE [IF NOT EXISTS] 表名 (
+_CREATE_TABLE = re.compile(
+    r"CREATE\s+(?:TEMPORARY\s+)?TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?"
+    r"((?:`[^`]+`|\"[^\"]+\"|\[[^\]]+\]|[\w$]+)(?:\s*\.\s*(?:`[^`]+`|\"[^\"]+\"|\[[^\]]+\]|[\w$]+))*)\s*\(",
+    re.IGNORECASE
+)
+# 字段注释：COMMENT '...'（支持 '' 和反斜杠转义）
+_COLUMN_COMMENT = re.compile(r"\bCOMMENT\s+'((?:[^'\\]|\\.|'')*)'", re.IGNORECASE)
+# 表注释：COMMENT='...' 或 COMMENT '...'
+_TABLE_COMMENT = re.compile(r"\bCOMMENT\s*=?\s*'((?:[^'\\]|\\.|'')*)'", re.IGNORECASE)
+# PostgreSQL/Oracle 风格：COMMENT ON COLUMN 表.字段 IS '...' / COMMENT ON TABLE 表 IS '...'
+_COMMENT_ON = re.compile(
+    r"COMMENT\s+ON\s+(COLUMN|TABLE)\s+([\w$.`\"\[\]]+)\s+IS\s+'((?:[^'\\]|\\.|'')*)'",
+    re.IGNORECASE
+)
+# 表定义中不是字段的条目
+_CONSTRAINT_PREFIXES = (
+    "PRIMARY", "KEY", "INDEX", "UNIQUE", "CONSTRAINT", "FOREIGN", "FULLTEXT", "SPATIAL", "CHECK", "PERIOD"
+)
+_NAME_SEPARATORS = re.compile(r"[_\-\s]")
+_CAMEL_BOUNDARY = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+
+
+class ColumnInfo:
+    """字段信息"""
+
+    __slots__ = ("table", "name", "data_type", "comment")
+
+    def __init__(self, table: str, name: str, data_type: str, comment: str = ""):
+        self.table = table
+        self.name = name
+        self.data_type = data_type
+        self.comment = comment
+
+    @property
+    def source(self) -> str:
+        """主数据库源格式：表名.字段名"""
+        return f"{self.table}.{self.name}"
+
+
+class TableSchema:
+    """表结构"""
+
+    __slots__ = ("name", "comment", "columns")
+
+    def __init__(self, name: str, comment: str = "", columns: Optional[List[ColumnInfo]] = None):
+        self.name = name
+        self.comment = comment
+        self.columns = columns or []
+
+    def get_column(self, name: str) -> Optional[ColumnInfo]:
+        for column in self.columns:
+            if column.name.lower() == name.lower():
+                return column
+        return None
+
+
+def _unquote(identifier: str) -> str:
+    """去掉标识符的引号，带库名时取最后一段"""
+    parts = [part.strip().strip("`\"[]") for part in identifier.split(".")]
+    return parts[-1]
+
+
+def _unescape(text: str) -> str:
+    return text.replace("''", "'").replace("\\'", "'").replace('\\"', '"')
+
+
+def _find_closing(text: str, start: int) -> int:
+    """从左括号之后开始，返回匹配的右括号位置（跳过引号内的内容），未找到返回文本长度"""
+    depth = 1
+    i = start
+    length = len(text)
+    while i < length:
+        char = text[i]
+        if char in "'\"`":
+            end = text.find(char, i + 1)
+            while end != -1 and text[end - 1] == "\\":
+                end = text.find(char, end + 1)
+            if end == -1:
+                return length
+            i = end + 1
+            continue
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+            if depth == 0:
+                return i
+        i += 1
+    return length
+
+
+def _split_definitions(body: str) -> List[str]:
+    """按顶层逗号切分表定义（括号和引号内的逗号不切分）"""
+    items = []
+    depth = 0
+    current = 0
+    i = 0
+    length = len(body)
+    while i < length:
+        char = body[i]
+        if char in "'\"`":
+            end = body.find(char, i + 1)
+            while end != -1 and body[end - 1] == "\\":
+                end = body.find(char, end + 1)
+            i = length if end == -1 else end + 1
+            continue
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "," and depth == 0:
+            items.append(body[current:i])
+            current = i + 1
+        i += 1
+    items.append(body[current:])
+    return [item.strip() for item in items if item.strip()]
+
+
+def _parse_column(table: str, definition: str) -> Optional[ColumnInfo]:
+    """解析一条字段定义，约束/索引定义返回None"""
+    if definition.split(None, 1)[0].upper().strip("(") in _CONSTRAINT_PREFIXES:
+        return None
+
+    match = re.match(r"(`[^`]+`|\"[^\"]+\"|\[[^\]]+\]|[\w$]+)\s*(.*)", definition, re.DOTALL)
+    if not match:
+        return None
+    name = _unquote(match.group(1))
+    rest = match.group(2)
+    type_match = re.match(r"[\w ]+?(?:\([^)]*\))?(?=\s|$)", rest)
+    data_type = type_match.group(0).strip() if type_match else rest.split(None, 1)[0] if rest else ""
+    comment_match = _COLUMN_COMMENT.search(rest)
+    comment = _unescape(comment_match.group(1)) if comment_match else ""
+    return ColumnInfo(table, name, data_type, comment)
+
+
+def parse_ddl(ddl: str) -> List[TableSchema]:
+    """
+    解析DDL文本中的全部建表语句
+
+    支持MySQL风格的字段/表注释以及 COMMENT ON 语句，无法识别的内容会被忽略
+
+    Args:
+        ddl: 一条或多条建表语句
+
+    Returns:
+        表结构列表
+    """
+    tables: List[TableSchema] = []
+    position = 0
+    while True:
+        match = _CREATE_TABLE.search(ddl, position)
+        if not match:
+            break
+        table_name = _unquote(match.group(1))
+        body_end = _find_closing(ddl, match.end())
+        table = TableSchema(table_name)
+        for definition in _split_definitions(ddl[match.end():body_end]):
+            column = _parse_column(table_name, definition)
+            if column is not None:
+                table.columns.append(column)
+
+        # 表选项直到语句结束的分号
+        statement_end = ddl.find(";", body_end)
+        options = ddl[body_end + 1:statement_end if statement_end != -1 else len(ddl)]
+        comment_match = _TABLE_COMMENT.search(options)
+        if comment_match:
+            table.comment = _unescape(comment_match.group(1))
+
+        tables.append(table)
+        position = body_end + 1
+
+    # COMMENT ON 语句补充注释
+    by_name = {table.name.lower(): table for table in tables}
+    for kind, target, comment in _COMMENT_ON.findall(ddl):
+        parts = [_unquote(part) for part in target.split(".")]
+        if kind.upper() == "TABLE":
+            table = by_name.get(parts[-1].lower())
+            if table is not None:
+                table.comment = _unescape(comment)
+        elif len(parts) >= 2:
+            table = by_name.get(parts[-2].lower())
+            column = table.get_column(parts[-1]) if table is not None else None
+            if column is not None:
+                column.comment = _unescape(comment)
+
+    return tables
+
+
+@lru_cache(maxsize=1024)
+def _parse_ddl_cached(ddl: str) -> Tuple[TableSchema, ...]:
+    return tuple(parse_ddl(ddl))
+
+
+def parse_ddl_cached(ddl: str) -> List[TableSchema]:
+    """带缓存的 parse_ddl（相同DDL文本只解析一次；返回的表结构被缓存共享，调用方不应修改）"""
+    return list(_parse_ddl_cached(ddl))
+
+
+def split_create_statements(ddl: str) -> List[Tuple[str, str]]:
+    """
+    把DDL文本按表拆分为独立的语句（保留原文），表的 COMMENT ON 语句附在对应的建表语句之后
+
+    Args:
+        ddl: 一条或多条建表语句
+
+    Returns:
+        [(表名, 语句原文)]，按出现顺序
+    """
+    statements: List[Tuple[str, str]] = []
+    position = 0
+    while True:
+        match = _CREATE_TABLE.search(ddl, position)
+        if not match:
+            break
+        body_end = _find_closing(ddl, match.end())
+        statement_end = ddl.find(";", body_end)
+        end = statement_end + 1 if statement_end != -1 else len(ddl)
+        statements.append((_unquote(match.group(1)), ddl[match.start():end].strip()))
+        position = end
+
+    by_name = {name.lower(): i for i, (name, _) in enumerate(statements)}
+    for comment in _COMMENT_ON.finditer(ddl):
+        parts = [_unquote(part) for part in comment.group(2).split(".")]
+        table = parts[-1] if comment.group(1).upper() == "TABLE" else parts[-2] if len(parts) >= 2 else ""
+        index = by_name.get(table.lower())
+        if index is not None:
+            name, text = statements[index]
+            end = ddl.find(";", comment.end())
+            statements[index] = (name, text + "\n" + ddl[comment.start():end + 1 if end != -1 else len(ddl)].strip())
+    return statements
+
+
+# 压缩时去掉的二级索引定义（主键和外键保留，它们描述了表之间的关系）
+_INDEX_PREFIXES = ("KEY", "INDEX", "UNIQUE", "FULLTEXT", "SPATIAL")
+# 压缩时去掉的字段属性
+_COLUMN_NOISE = re.compile(
+    r"\s+(?:CHARACTER\s+SET|CHARSET|COLLATE)\s*=?\s*\w+|\s+USING\s+(?:BTREE|HASH)",
+    re.IGNORECASE
+)
+# 与建表无关的语句
+_NOISE_STATEMENT = re.compile(r"^\s*(?:DROP|SET|USE|LOCK|UNLOCK|ALTER\s+TABLE\s+\S+\s+(?:DISABLE|ENABLE))\b", re.IGNORECASE)
+
+
+def compact_ddl(ddl: str) -> str:
+    """
+    压缩DDL：去掉二级索引、存储引擎/字符集/自增等表选项、注释和无关语句，
+    保留字段定义、主键/外键、字段注释和表注释
+
+    Args:
+        ddl: 一条或多条建表语句
+
+    Returns:
+        压缩后的DDL；没有建表语句时返回去掉注释后的原文
+    """
+    statements = compact_ddl_statements(ddl)
+    if statements is None:
+        return _strip_sql_comments(ddl).strip()
+    return "\n".join(statement for _, statement in statements)
+
+
+def compact_ddl_statements(ddl: str) -> Optional[List[Tuple[str, str]]]:
+    """
+    按语句压缩DDL（规则同 compact_ddl），并标注每条语句所属的表（相同DDL文本的结果被缓存）
+
+    Args:
+        ddl: 一条或多条建表语句
+
+    Returns:
+        [(表名, 压缩后的语句)]，无法确定所属表的语句表名为空字符串；没有建表语句时返回None
+    """
+    statements = _compact_ddl_statements(ddl)
+    return list(statements) if statements is not None else None
+
+
+@lru_cache(maxsize=1024)
+def _compact_ddl_statements(ddl: str) -> Optional[Tuple[Tuple[str, str], ...]]:
+    text = _strip_sql_comments(ddl)
+    if not _CREATE_TABLE.search(text):
+        return None
+
+    statements: List[Tuple[str, str]] = []
+    position = 0
+    while True:
+        match = _CREATE_TABLE.search(text, position)
+        if not match:
+            break
+        # 建表语句之前的其他语句（如 COMMENT ON）原样保留
+        statements.extend(_other_statements(text[position:match.start()]))
+
+        body_end = _find_closing(text, match.end())
+        definitions = []
+        for definition in _split_definitions(text[match.end():body_end]):
+            if definition.split(None, 1)[0].upper().strip("(") in _INDEX_PREFIXES:
+                continue
+            definitions.append(_COLUMN_NOISE.sub("", " ".join(definition.split())))
+
+        statement_end = text.find(";", body_end)
+        options = text[body_end + 1:statement_end if statement_end != -1 else len(text)]
+        comment_match = _TABLE_COMMENT.search(options)
+        table_comment = f" COMMENT='{comment_match.group(1)}'" if comment_match else ""
+
+        header = " ".join(text[match.start():match.end()].split())
+        statements.append((
+            _unquote(match.group(1)),
+            header + "\n  " + ",\n  ".join(definitions) + "\n)" + table_comment + ";"
+        ))
+        position = statement_end + 1 if statement_end != -1 else len(text)
+
+    statements.extend(_other_statements(text[position:]))
+    return tuple(statements)
+
+
+def _strip_sql_comments(ddl: str) -> str:
+    text = re.sub(r"/\*.*?\*/;?", "", ddl, flags=re.DOTALL)
+    return "\n".join(line for line in text.splitlines() if not line.strip().startswith("--"))
+
+
+def _other_statements(text: str) -> List[Tuple[str, str]]:
+    """建表语句之外的语句：去掉空语句和无关语句，COMMENT ON 语句标注所属的表"""
+    result = []
+    for statement in text.split(";"):
+        statement = " ".join(statement.split())
+        if not statement or _NOISE_STATEMENT.match(statement):
+            continue
+        table = ""
+        comment_on = _COMMENT_ON.match(statement)
+        if comment_on:
+            parts = [_unquote(part) for part in comment_on.group(2).split(".")]
+            table = parts[-1] if comment_on.group(1).upper() == "TABLE" else parts[-2] if len(parts) >= 2 else ""
+        result.append((table, statement + ";"))
+    return result
+
+
+def normalize_name(name: str) -> str:
+    """规范化字段名：去掉分隔符并转小写（user_id、userId、USER_ID 均为 userid）"""
+    return _NAME_SEPARATORS.sub("", name).lower()
+
+
+def snake_to_camel(name: str) -> str:
+    """下划线命名转驼峰命名：user_id -> userId"""
+    head, *rest = name.lower().split("_")
+    return head + "".join(part.capitalize() for part in rest)
+
+
+def camel_to_snake(name: str) -> str:
+    """驼峰命名转下划线命名：userId -> user_id"""
+    return _CAMEL_BOUNDARY.sub("_", name).lower()
+
+
+def field_leaf_name(field_name: str) -> str:
+    """取字段路径的最后一段：data.list[0].userId -> userId"""
+    leaf = field_name.rsplit(".", 1)[-1]
+    while leaf.endswith("[0]"):
+        leaf = leaf[:-3]
+    return leaf
+
+
+class ColumnIndex:
+    """规范化字段名索引"""
+
+    def __init__(self, tables: List[TableSchema]):
+        self.tables = tables
+        self._index: Dict[str, List[ColumnInfo]] = {}
+        for table in tables:
+            for column in table.columns:
+                self._index.setdefault(normalize_name(column.name), []).append(column)
+
+    @classmethod
+    def from_ddl_list(cls, ddl_list: List[str]) -> "ColumnIndex":
+        """从多段DDL文本构建索引"""
+        tables = []
+        for ddl in ddl_list:
+            if ddl.strip():
+                tables.extend(parse_ddl_cached(ddl))
+        return cls(tables)
+
+    @property
+    def columns(self) -> List[ColumnInfo]:
+        """全部表的全部字段"""
+        return [column for table in self.tables for column in table.columns]
+
+    def find_source(self, source: str) -> Optional[ColumnInfo]:
+        """按 表名.字段名 查找字段（忽略大小写），不存在时返回None"""
+        table_name, _, column_name = source.strip().rpartition(".")
+        if not table_name or not column_name:
+            return None
+        for table in self.tables:
+            if table.name.lower() == _unquote(table_name).lower():
+                return table.get_column(column_name.strip("`\"[]"))
+        return None
+
+    def lookup(self, name: str) -> List[ColumnInfo]:
+        """按规范化名称查找候选字段"""
+        return self._index.get(normalize_name(name), [])
+
+    def resolve(self, field_name: str) -> Optional[ColumnInfo]:
+        """
+        确定性地匹配响应字段对应的数据库字段
+
+        只接受与字段名完全相同、或下划线/驼峰互转后完全相同的字段，
+        且只在唯一一张表中存在时才算匹配（多表同名交给AI判断）
+
+        Args:
+            field_name: 响应字段路径
+
+        Returns:
+            匹配的数据库字段，无法确定时返回None
+        """
+        leaf = field_leaf_name(field_name)
+        if not leaf:
+            return None
+        matches = [
+            column for column in self.lookup(leaf)
+            if column.name == leaf or snake_to_camel(column.name) == leaf
+            or camel_to_snake(leaf) == column.name.lower() or column.name.lower() == leaf.lower()
+        ]
+        if len(matches) != 1:
+            return None
+        return matches[0]
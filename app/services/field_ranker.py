@@ -0,0 +1,219 @@
+"""
+字段相似度排序模块
+为响应字段路径和DDL字段（字段名、表名、注释）构建字符n-gram的TF-IDF稀疏向量，
+用NumPy按倒排索引分块计算相似度，为每个响应字段给出最相近的若干候选数据库字段
+"""
+
+import os
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from app.services.ddl_parser import ColumnInfo, camel_to_snake, field_leaf_name
+
+# 排序配置
+FIELD_RANK_TOP_K = int(os.getenv("FIELD_RANK_TOP_K", "3"))
+# 低于该相似度的候选字段不返回
+FIELD_RANK_MIN_SCORE = float(os.getenv("FIELD_RANK_MIN_SCORE", "0.2"))
+FIELD_RANK_NGRAM = 3
+# 分块打分时每块的最大元素数（相似度矩阵的元素数和倒排列表展开的乘积数都不超过该值，限制内存占用）
+FIELD_RANK_BLOCK_CELLS = int(os.getenv("FIELD_RANK_BLOCK_CELLS", str(512 * 1024)))
+
+# 各部分文本的权重：字段名为主，所属对象/表名和注释为辅
+_LEAF_WEIGHT = 1.0
+_CONTEXT_WEIGHT = 0.5
+_COMMENT_WEIGHT = 0.5
+
+_WORD_PATTERN = re.compile(r"[a-z0-9]+|[^\x00-\x7f]")
+_INDEX_SUFFIX = re.compile(r"\[\d+\]")
+
+
+def split_words(name: str) -> List[str]:
+    """把标识符切分为小写单词：orderAmount、order_amount 均为 [order, amount]"""
+    return _WORD_PATTERN.findall(camel_to_snake(name))
+
+
+@lru_cache(maxsize=65536)
+def _word_ngrams(word: str) -> Tuple[str, ...]:
+    """单词及其字符n-gram（单词两端补空格，使词首/词尾的片段可区分）"""
+    padded = f" {word} "
+    grams = tuple(padded[i:i + FIELD_RANK_NGRAM] for i in range(len(padded) - FIELD_RANK_NGRAM + 1))
+    return ("w:" + word,) + grams
+
+
+def _add_ngrams(terms: Counter, words: List[str], weight: float):
+    """按权重累加单词的词项"""
+    for word in words:
+        for term in _word_ngrams(word):
+            terms[term] += weight
+
+
+def field_terms(field_name: str) -> Counter:
+    """响应字段的词项：字段名 + 所属对象名"""
+    terms: Counter = Counter()
+    _add_ngrams(terms, split_words(field_leaf_name(field_name)), _LEAF_WEIGHT)
+    parents = _INDEX_SUFFIX.sub("", field_name).split(".")[:-1]
+    if parents:
+        _add_ngrams(terms, split_words(parents[-1]), _CONTEXT_WEIGHT)
+    return terms
+
+
+@lru_cache(maxsize=65536)
+def _column_terms(table: str, name: str, comment: str) -> Counter:
+    terms: Counter = Counter()
+    _add_ngrams(terms, split_words(name), _LEAF_WEIGHT)
+    _add_ngrams(terms, [word for word in split_words(table) if len(word) > 1], _CONTEXT_WEIGHT)
+    for char in comment:
+        if not char.isspace():
+            terms["c:" + char] += _COMMENT_WEIGHT
+    return terms
+
+
+def column_terms(column: ColumnInfo) -> Counter:
+    """数据库字段的词项：字段名 + 表名 + 注释（注释按单字计入）；结果被缓存共享，调用方不应修改"""
+    return _column_terms(column.table, column.name, column.comment)
+
+
+class FieldRanker:
+    """响应字段 -> 数据库字段 的相似度排序器"""
+
+    def __init__(self, columns: List[ColumnInfo]):
+        self.columns = columns
+        self._column_terms = [column_terms(column) for column in columns]
+
+    def rank(
+        self,
+        field_names: List[str],
+        top_k: int = FIELD_RANK_TOP_K,
+        min_score: float = FIELD_RANK_MIN_SCORE
+    ) -> List[List[Tuple[ColumnInfo, float]]]:
+        """
+        为每个响应字段计算最相近的数据库字段
+
+        数据库字段的向量按词项建立倒排索引，只累加与响应字段有共同词项的数据库字段；
+        响应字段分块打分，每块的相似度矩阵和乘积数都不超过 FIELD_RANK_BLOCK_CELLS 个元素，每块只保留前 top_k 个候选
+
+        Args:
+            field_names: 响应字段路径列表
+            top_k: 每个字段返回的候选数
+            min_score: 最低余弦相似度
+
+        Returns:
+            与 field_names 一一对应的候选列表，每项为 (数据库字段, 相似度)，按相似度降序
+        """
+        if not field_names or not self.columns or top_k <= 0:
+            return [[] for _ in field_names]
+
+        field_count = len(field_names)
+        column_count = len(self.columns)
+        documents = [field_terms(name) for name in field_names] + self._column_terms
+
+        # 把全部文档展开为 (文档下标, 词项下标, 词频) 三个平铺数组（按文档下标递增）
+        term_index: Dict[str, int] = {}
+        rows: List[int] = []
+        term_ids: List[int] = []
+        counts: List[float] = []
+        for row, terms in enumerate(documents):
+            rows.extend([row] * len(terms))
+            term_ids.extend([term_index.setdefault(term, len(term_index)) for term in terms])
+            counts.extend(terms.values())
+        rows_array = np.array(rows, dtype=np.int64)
+        term_array = np.array(term_ids, dtype=np.int64)
+        count_array = np.array(counts, dtype=np.float64)
+
+        # TF-IDF权重（词频取对数）与每个文档的L2模长
+        df = np.bincount(term_array, minlength=len(term_index))
+        idf = np.log((1 + len(documents)) / (1 + df)) + 1
+        tf = np.where(count_array >= 1, 1 + np.log(np.maximum(count_array, 1)), count_array)
+        weights = tf * idf[term_array]
+        norms = np.sqrt(np.bincount(rows_array, weights * weights, minlength=len(documents)))
+        weights /= np.where(norms > 0, norms, 1)[rows_array]
+
+        # 响应字段的词项在前，数据库字段的词项在后
+        field_end = int(np.searchsorted(rows_array, field_count))
+        field_rows, field_term_ids, field_weights = \
+            rows_array[:field_end], term_array[:field_end], weights[:field_end]
+
+        # 数据库字段的倒排索引：词项 -> [posting_start, posting_start + posting_count) 范围内的 (数据库字段, 权重)
+        column_term_ids = term_array[field_end:]
+        order = np.argsort(column_term_ids, kind="stable")
+        posting_columns = rows_array[field_end:][order] - field_count
+        posting_weights = weights[field_end:][order]
+        posting_count = np.bincount(column_term_ids, minlength=len(term_index))
+        posting_start = np.cumsum(posting_count) - posting_count
+
+        k = min(top_k, column_count)
+        results: List[List[Tuple[ColumnInfo, float]]] = []
+        field_bounds = np.searchsorted(field_rows, np.arange(field_count + 1))
+        for block_start, block_end in self._blocks(np.bincount(
+            field_rows, posting_count[field_term_ids], minlength=field_count
+        ).tolist(), column_count):
+            block_rows = block_end - block_start
+            begin, end = field_bounds[block_start], field_bounds[block_end]
+            terms = field_term_ids[begin:end]
+
+            # 展开每个 (响应字段, 词项) 对应的倒排列表，累加得到本块的相似度矩阵
+            lengths = posting_count[terms]
+            total = int(lengths.sum())
+            offsets = np.cumsum(lengths) - lengths
+            postings = np.arange(total) - np.repeat(offsets - posting_start[terms], lengths)
+            cells = np.repeat(field_rows[begin:end] - block_start, lengths) * column_count + posting_columns[postings]
+            products = np.repeat(field_weights[begin:end], lengths) * posting_weights[postings]
+            scores = np.bincount(cells, products, minlength=block_rows * column_count).reshape(block_rows, column_count)
+
+            if k < column_count:
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            else:
+                top = np.tile(np.arange(column_count), (block_rows, 1))
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            ranked = np.argsort(-top_scores, axis=1, kind="stable")
+            top = np.take_along_axis(top, ranked, axis=1)
+            top_scores = np.take_along_axis(top_scores, ranked, axis=1)
+
+            for indices, values in zip(top.tolist(), top_scores.tolist()):
+                results.append([
+                    (self.columns[index], round(value, 4))
+                    for index, value in zip(indices, values) if value >= min_score
+                ])
+        return results
+
+    @staticmethod
+    def _blocks(products: List[float], column_count: int) -> List[Tuple[int, int]]:
+        """按每个响应字段的乘积数把字段切分为 [start, end) 块，每块的元素数不超过 FIELD_RANK_BLOCK_CELLS（单个字段除外）"""
+        blocks = []
+        start, cells = 0, 0
+        for index, count in enumerate(products):
+            size = max(int(count), column_count)
+            if index > start and cells + size > FIELD_RANK_BLOCK_CELLS:
+                blocks.append((start, index))
+                start, cells = index, 0
+            cells += size
+        blocks.append((start, len(products)))
+        return blocks
+
+
+def rank_candidate_columns(
+    field_names: List[str],
+    columns: List[ColumnInfo],
+    top_k: int = FIELD_RANK_TOP_K
+) -> Dict[str, List[Tuple[str, float]]]:
+    """
+    计算响应字段的候选数据库字段
+
+    Args:
+        field_names: 响应字段路径列表
+        columns: 关联表的全部字段
+        top_k: 每个字段返回的候选数
+
+    Returns:
+        字段名 -> [(表名.字段名, 相似度)]，没有候选的字段不包含在内
+    """
+    candidates = {}
+    ranked = FieldRanker(columns).rank(field_names, top_k)
+    for name, matches in zip(field_names, ranked):
+        if matches:
+            candidates[name] = [(column.source, score) for column, score in matches]
+    return candidates
@@ -0,0 +1,719 @@
+"""
+流式JSON字段提取模块
+基于事件的增量JSON解析器（显式栈，无递归），从字符串或字节流中逐块读取，
+合并数组全部元素推断联合Schema，支持深度、字段数量和数组采样上限，避免超深嵌套的递归错误和超大报文的内存膨胀
+"""
+
+import codecs
+import io
+import itertools
+import json
+import os
+import re
+from typing import Iterator, Tuple, Union, Optional, Any, List, Dict, BinaryIO, TextIO
+
+# 提取配置
+JSON_FIELDS_MAX_DEPTH = int(os.getenv("JSON_FIELDS_MAX_DEPTH", "256"))
+JSON_FIELDS_MAX_FIELDS = int(os.getenv("JSON_FIELDS_MAX_FIELDS", "10000"))
+# 每个数组最多合并的元素数（0表示不限）
+JSON_FIELDS_ARRAY_SAMPLE = int(os.getenv("JSON_FIELDS_ARRAY_SAMPLE", "1000"))
+JSON_STREAM_CHUNK_SIZE = 64 * 1024
+# 不超过此长度的字符串报文整体解码（更快），更大的报文和文件流走流式解析
+JSON_FIELDS_FAST_PATH_CHARS = int(os.getenv("JSON_FIELDS_FAST_PATH_CHARS", str(1024 * 1024)))
+# 跳过数组元素时，单个元素在此大小以内整体交给C实现的解码器处理
+FAST_SKIP_MAX_CHARS = 1024 * 1024
+
+# 事件类型
+START_MAP = 1
+END_MAP = 2
+START_ARRAY = 3
+END_ARRAY = 4
+KEY = 5
+SCALAR = 6
+
+# 字段类型（与Python类型名保持一致，兼容原有的表格输出）
+TYPE_OBJECT = "object"
+TYPE_ARRAY = "array"
+TYPE_STR = "str"
+TYPE_INT = "int"
+TYPE_FLOAT = "float"
+TYPE_BOOL = "bool"
+TYPE_NULL = "NoneType"
+
+# 解析器状态
+_EXPECT_VALUE = 0
+_EXPECT_VALUE_OR_END_ARRAY = 1
+_EXPECT_KEY = 2
+_EXPECT_KEY_OR_END_MAP = 3
+_EXPECT_COLON = 4
+_EXPECT_COMMA_OR_END = 5
+_EXPECT_DONE = 6
+
+_MAP = 1
+_ARRAY = 2
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+# 字符串内容（不含引号），只接受合法转义，拒绝未转义的控制字符
+_STRING_BODY = re.compile(r'[^"\\\x00-\x1f]*(?:\\(?:["\\/bfnrt]|u[0-9a-fA-F]{4})[^"\\\x00-\x1f]*)*')
+_NUMBER = re.compile(r"-?(?:0|[1-9][0-9]*)(\.[0-9]+)?([eE][-+]?[0-9]+)?")
+_NUMBER_CHARS = re.compile(r"[-+0-9.eE]*")
+_LITERALS = (
+    ("true", TYPE_BOOL), ("false", TYPE_BOOL), ("null", TYPE_NULL),
+    ("NaN", TYPE_FLOAT), ("Infinity", TYPE_FLOAT), ("-Infinity", TYPE_FLOAT),
+)
+
+_raw_decode = json.JSONDecoder().raw_decode
+_NOT_DECODED = object()
+
+# 字段记录的常量取值（所有记录共享同一字符串对象）
+REQUIRED_YES = "是"
+REQUIRED_NO = "否"
+REQUIRED_UNKNOWN = "未知"
+_TYPE_DESCRIPTIONS = {TYPE_OBJECT: "对象类型", TYPE_ARRAY: "数组类型"}
+
+Source = Union[str, bytes, bytearray, BinaryIO, TextIO]
+
+
+class JsonStreamError(ValueError):
+    """JSON格式错误"""
+
+    def __init__(self, message: str, position: int):
+        super().__init__(f"{message}（位置 {position}）")
+        self.position = position
+
+
+def describe_type(field_type: str) -> str:
+    """字段类型的默认说明（按类型缓存）"""
+    description = _TYPE_DESCRIPTIONS.get(field_type)
+    if description is None:
+        description = _TYPE_DESCRIPTIONS[field_type] = f"{field_type}类型字段"
+    return description
+
+
+class FieldRecord:
+    """
+    轻量字段记录
+
+    流水线内部使用的字段表示，字段与 FieldInfo 一致但不做校验，直接用于生成参数表格
+    """
+
+    __slots__ = ("name", "type", "required", "description")
+
+    def __init__(self, name: str, type: str, required: str = REQUIRED_YES, description: Optional[str] = None):
+        self.name = name
+        self.type = type
+        self.required = required
+        self.description = describe_type(type) if description is None else description
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, FieldRecord):
+            return NotImplemented
+        return (self.name, self.type, self.required, self.description) == \
+            (other.name, other.type, other.required, other.description)
+
+    def __repr__(self) -> str:
+        return f"FieldRecord(name={self.name!r}, type={self.type!r}, required={self.required!r})"
+
+
+class JsonEventReader:
+    """
+    增量JSON事件解析器
+
+    每次调用 next_event() 返回一个 (事件类型, 值) 元组：
+    START_MAP / END_MAP / START_ARRAY / END_ARRAY 的值为None，KEY 的值为键名，
+    SCALAR 的值为标量类型名。标量字符串只扫描不保存，内存占用与报文大小无关
+    """
+
+    def __init__(self, source: Source, chunk_size: int = JSON_STREAM_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.pos = 0
+        # 当前缓冲区起点在整个输入中的偏移，用于错误定位
+        self.base = 0
+        self.stack: List[int] = []
+        self.expect = _EXPECT_VALUE
+        self._decoder = None
+        self._reader = None
+
+        if isinstance(source, str):
+            self.buf = source
+            self.eof = True
+        elif isinstance(source, (bytes, bytearray, memoryview)):
+            self.buf = ""
+            self.eof = False
+            self._reader = io.BytesIO(source)
+            self._decoder = codecs.getincrementaldecoder("utf-8")()
+        else:
+            self.buf = ""
+            self.eof = False
+            self._reader = source
+
+    # ============ 缓冲区 ============
+
+    def _fill(self, size: Optional[int] = None) -> bool:
+        """丢弃已消费的内容并读入下一块，返回是否读到了新数据"""
+        if self.eof:
+            return False
+
+        text = ""
+        # 多字节字符被块边界截断时解码结果可能为空，继续读取直到得到内容或到达末尾
+        while not text and not self.eof:
+            data = self._reader.read(size or self.chunk_size)
+            if isinstance(data, (bytes, bytearray)):
+                if self._decoder is None:
+                    self._decoder = codecs.getincrementaldecoder("utf-8")()
+                try:
+                    text = self._decoder.decode(data, final=not data)
+                except UnicodeDecodeError as e:
+                    raise JsonStreamError(f"UTF-8解码失败: {e.reason}", self.base + len(self.buf))
+            else:
+                text = data
+            if not data:
+                self.eof = True
+
+        if self.pos:
+            self.base += self.pos
+            self.buf = self.buf[self.pos:] + text
+            self.pos = 0
+        else:
+            self.buf += text
+        return bool(text)
+
+    def _skip_whitespace(self) -> bool:
+        """跳过空白，返回后面是否还有内容"""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return True
+            if not self._fill() and self.pos >= len(self.buf):
+                return False
+
+    def _error(self, message: str):
+        raise JsonStreamError(message, self.base + self.pos)
+
+    # ============ 词法 ============
+
+    def _read_string(self, keep: bool) -> Optional[str]:
+        """读取当前位置开始的字符串；keep为False时只跳过不保存"""
+        self.pos += 1
+        parts = []
+        while True:
+            end = _STRING_BODY.match(self.buf, self.pos).end()
+            if end < len(self.buf):
+                char = self.buf[end]
+                if char == '"':
+                    if keep:
+                        parts.append(self.buf[self.pos:end])
+                    self.pos = end + 1
+                    break
+                # 非法转义（后面有足够字符却不匹配）或未转义的控制字符
+                if char != "\\" or end + 6 <= len(self.buf):
+                    self.pos = end
+                    self._error("字符串中包含非法字符或转义")
+            # 到达缓冲区末尾（或末尾是不完整的转义）：保存/丢弃已扫描部分后继续读取
+            if keep:
+                parts.append(self.buf[self.pos:end])
+            self.pos = end
+            if not self._fill():
+                self._error("字符串未结束")
+
+        if not keep:
+            return None
+        body = "".join(parts)
+        if "\\" not in body:
+            return body
+        return json.loads(f'"{body}"')
+
+    def _read_number_or_literal(self) -> str:
+        """读取数字或字面量，返回类型名"""
+        while True:
+            # 先取出完整的数字字符序列，避免数字被块边界截断
+            extent = _NUMBER_CHARS.match(self.buf, self.pos).end()
+            if extent < len(self.buf) or self.eof:
+                if extent > self.pos:
+                    match = _NUMBER.fullmatch(self.buf, self.pos, extent)
+                    if match:
+                        self.pos = extent
+                        return TYPE_FLOAT if match.group(1) or match.group(2) else TYPE_INT
+                for literal, type_name in _LITERALS:
+                    if self.buf.startswith(literal, self.pos):
+                        self.pos += len(literal)
+                        return type_name
+
+            remaining = self.buf[self.pos:self.pos + 9]
+            incomplete = extent == len(self.buf) or any(
+                literal.startswith(remaining) for literal, _ in _LITERALS
+            )
+            if not incomplete or self.eof:
+                self._error("无法识别的值")
+            self._fill()
+
+    # ============ 语法 ============
+
+    def _after_value(self):
+        self.expect = _EXPECT_COMMA_OR_END if self.stack else _EXPECT_DONE
+
+    def next_event(self) -> Tuple[int, Any]:
+        """读取下一个事件"""
+        while True:
+            if not self._skip_whitespace():
+                self._error("JSON内容不完整")
+
+            char = self.buf[self.pos]
+            expect = self.expect
+
+            if expect == _EXPECT_COMMA_OR_END:
+                if char == ",":
+                    self.pos += 1
+                    self.expect = _EXPECT_KEY if self.stack[-1] == _MAP else _EXPECT_VALUE
+                    continue
+                if char == "}" and self.stack[-1] == _MAP:
+                    self.pos += 1
+                    self.stack.pop()
+                    self._after_value()
+                    return END_MAP, None
+                if char == "]" and self.stack[-1] == _ARRAY:
+                    self.pos += 1
+                    self.stack.pop()
+                    self._after_value()
+                    return END_ARRAY, None
+                self._error("缺少逗号或结束符")
+
+            if expect == _EXPECT_KEY or expect == _EXPECT_KEY_OR_END_MAP:
+                if char == '"':
+                    key = self._read_string(keep=True)
+                    self.expect = _EXPECT_COLON
+                    return KEY, key
+                if char == "}" and expect == _EXPECT_KEY_OR_END_MAP:
+                    self.pos += 1
+                    self.stack.pop()
+                    self._after_value()
+                    return END_MAP, None
+                self._error("缺少字段名")
+
+            if expect == _EXPECT_COLON:
+                if char == ":":
+                    self.pos += 1
+                    self.expect = _EXPECT_VALUE
+                    continue
+                self._error("缺少冒号")
+
+            if expect == _EXPECT_DONE:
+                self._error("JSON结束后存在多余内容")
+
+            # 期望一个值
+            if char == "{":
+                self.pos += 1
+                self.stack.append(_MAP)
+                self.expect = _EXPECT_KEY_OR_END_MAP
+                return START_MAP, None
+            if char == "[":
+                self.pos += 1
+                self.stack.append(_ARRAY)
+                self.expect = _EXPECT_VALUE_OR_END_ARRAY
+                return START_ARRAY, None
+            if char == "]" and expect == _EXPECT_VALUE_OR_END_ARRAY:
+                self.pos += 1
+                self.stack.pop()
+                self._after_value()
+                return END_ARRAY, None
+            if char == '"':
+                self._read_string(keep=False)
+                self._after_value()
+                return SCALAR, TYPE_STR
+            type_name = self._read_number_or_literal()
+            self._after_value()
+            return SCALAR, type_name
+
+    def skip_container(self):
+        """跳过刚刚开始的对象或数组的剩余内容（在 START_MAP / START_ARRAY 事件之后调用）"""
+        depth = 1
+        while depth:
+            kind, _ = self.next_event()
+            if kind == START_MAP or kind == START_ARRAY:
+                depth += 1
+            elif kind == END_MAP or kind == END_ARRAY:
+                depth -= 1
+
+    def skip_value(self):
+        """跳过下一个完整的值"""
+        kind, _ = self.next_event()
+        if kind == START_MAP or kind == START_ARRAY:
+            self.skip_container()
+        elif kind != SCALAR:
+            self._error("缺少值")
+
+    def skip_next_element(self) -> bool:
+        """
+        在数组中跳过下一个元素
+
+        Returns:
+            跳过了一个元素返回True；数组已到末尾返回False（结束符留给 next_event）
+        """
+        if self.expect != _EXPECT_COMMA_OR_END or self.stack[-1] != _ARRAY:
+            self._error("当前位置不在数组元素之间")
+        if not self._skip_whitespace():
+            self._error("JSON内容不完整")
+        if self.buf[self.pos] != ",":
+            return False
+        self.pos += 1
+        self.expect = _EXPECT_VALUE
+        if not self._skip_whitespace():
+            self._error("JSON内容不完整")
+
+        # 快速路径：由C实现的解码器整体解析元素，失败时（元素跨块、过大或嵌套过深）退回逐事件跳过
+        start = self.pos
+        read_size = self.chunk_size
+        while True:
+            try:
+                _, end = _raw_decode(self.buf, start)
+                # 数字可能被块边界截断（如 "1" + ".5"），需确认其后不是数字字符
+                if self.buf[start] in '{["' or self.eof or (
+                        end < len(self.buf) and _NUMBER_CHARS.match(self.buf, end).end() == end):
+                    self.pos = end
+                    self._after_value()
+                    return True
+            except RecursionError:
+                break
+            except ValueError:
+                if self.eof:
+                    break
+            if len(self.buf) - start > FAST_SKIP_MAX_CHARS:
+                break
+            # 保留元素起点之前已消费的内容之外的数据，加倍读取量以保证摊还线性
+            self.pos = start
+            self._fill(read_size)
+            start = self.pos
+            read_size *= 2
+
+        self.pos = start
+        self.skip_value()
+        return True
+
+    def finish(self):
+        """确认根值之后只剩空白"""
+        if self._skip_whitespace():
+            self._error("JSON结束后存在多余内容")
+
+
+def iter_json_events(source: Source, chunk_size: int = JSON_STREAM_CHUNK_SIZE) -> Iterator[Tuple[int, Any]]:
+    """
+    逐个产出JSON事件
+
+    Args:
+        source: JSON字符串、字节串或可读的文件对象
+        chunk_size: 每次读取的块大小
+
+    Yields:
+        (事件类型, 值) 元组
+    """
+    reader = JsonEventReader(source, chunk_size)
+    kind, value = reader.next_event()
+    yield kind, value
+    while reader.stack:
+        yield reader.next_event()
+    reader.finish()
+
+
+class SchemaField:
+    """合并过程中的字段统计"""
+
+    __slots__ = ("name", "object_path", "types", "present")
+
+    def __init__(self, name: str, object_path: str):
+        self.name = name
+        # 所属对象的路径（用于计算是否必有）
+        self.object_path = object_path
+        # 出现过的类型及次数（保持首次出现顺序）
+        self.types: Dict[str, int] = {}
+        self.present = 0
+
+
+class SchemaBuilder:
+    """
+    单遍合并的联合Schema
+
+    同一路径在不同数组元素中出现的类型合并为联合类型（int与float合并为float，null标记为可为空），
+    字段在所属对象的全部实例中都出现时为必有，否则为可选
+    """
+
+    def __init__(self, max_fields: int = JSON_FIELDS_MAX_FIELDS):
+        self.max_fields = max_fields
+        self.fields: Dict[str, SchemaField] = {}
+        # 各对象路径出现的实例数
+        self.objects: Dict[str, int] = {}
+        # 所属字段 -> 子字段（首次出现顺序），None 表示根
+        self.children: Dict[Optional[str], List[str]] = {}
+        self.truncated = False
+
+    def enter_object(self, path: str):
+        """登记一个对象实例"""
+        self.objects[path] = self.objects.get(path, 0) + 1
+
+    def add(self, name: str, field_type: str, object_path: str, owner: Optional[str]):
+        """登记一次字段出现"""
+        field = self.fields.get(name)
+        if field is None:
+            if len(self.fields) >= self.max_fields:
+                self.truncated = True
+                return
+            field = self.fields[name] = SchemaField(name, object_path)
+            self.children.setdefault(owner, []).append(name)
+        field.present += 1
+        field.types[field_type] = field.types.get(field_type, 0) + 1
+
+    def to_record(self, field: SchemaField) -> FieldRecord:
+        """把合并后的字段统计转换为字段记录"""
+        types = list(field.types)
+        nullable = TYPE_NULL in types and len(types) > 1
+        if nullable:
+            types.remove(TYPE_NULL)
+        if TYPE_INT in types and TYPE_FLOAT in types:
+            types.remove(TYPE_INT)
+        type_name = "|".join(types)
+
+        required = REQUIRED_YES if field.present >= self.objects.get(field.object_path, 0) else REQUIRED_NO
+        description = describe_type(type_name)
+        if nullable:
+            description += "，可为空"
+        return FieldRecord(field.name, type_name, required, description)
+
+    def build(self) -> List[FieldRecord]:
+        """按层级输出字段记录：子字段紧跟在所属字段之后，同级按首次出现顺序"""
+        records = []
+        stack = [iter(self.children.get(None, []))]
+        while stack:
+            for name in stack[-1]:
+                records.append(self.to_record(self.fields[name]))
+                children = self.children.get(name)
+                if children:
+                    stack.append(iter(children))
+                    break
+            else:
+                stack.pop()
+        return records
+
+
+class JsonFieldExtractor:
+    """
+    字段提取器
+
+    对象的每个键产出一个字段，对象和数组继续展开：对象键下数组中的对象元素合并到 字段[0] 路径下，
+    顶层数组的元素（及嵌套的顶层数组）合并到根路径下。每个数组最多采样 array_sample 个元素，
+    超出部分只做格式校验，保证超大数组的处理时间有界
+    """
+
+    # 数组展开方式
+    _ARRAY_UNDER_KEY = 0
+    _ARRAY_TOP_LEVEL = 1
+
+    def __init__(
+        self,
+        max_depth: int = JSON_FIELDS_MAX_DEPTH,
+        max_fields: int = JSON_FIELDS_MAX_FIELDS,
+        array_sample: int = JSON_FIELDS_ARRAY_SAMPLE,
+        chunk_size: int = JSON_STREAM_CHUNK_SIZE
+    ):
+        self.max_depth = max_depth
+        self.max_fields = max_fields
+        # 每个数组最多合并的元素数（0表示不限）
+        self.array_sample = array_sample
+        self.chunk_size = chunk_size
+        # 是否因深度或字段数上限而截断
+        self.truncated = False
+        # 超出采样上限的数组个数
+        self.sampled_arrays = 0
+
+    def extract(self, source: Source) -> List[FieldRecord]:
+        """
+        提取字段并合并为联合Schema
+
+        Args:
+            source: JSON字符串、字节串或可读的文件对象
+
+        Returns:
+            字段记录列表
+
+        Raises:
+            JsonStreamError: JSON格式错误
+        """
+        self.truncated = False
+        self.sampled_arrays = 0
+        schema = SchemaBuilder(self.max_fields)
+
+        data = _NOT_DECODED
+        if isinstance(source, str) and len(source) <= JSON_FIELDS_FAST_PATH_CHARS:
+            # 小报文直接用C实现的解码器整体解析后迭代展开；嵌套过深时退回流式解析
+            try:
+                data = json.loads(source)
+            except RecursionError:
+                data = _NOT_DECODED
+            except json.JSONDecodeError as e:
+                raise JsonStreamError(f"JSON格式不正确: {e.msg}", e.pos)
+
+        if data is _NOT_DECODED:
+            self._merge_stream(source, schema)
+        else:
+            self._merge_decoded(data, schema)
+
+        self.truncated = self.truncated or schema.truncated
+        return schema.build()
+
+    def _sample(self, values: list) -> Iterator[Any]:
+        """数组元素采样迭代器"""
+        if self.array_sample > 0 and len(values) > self.array_sample:
+            self.sampled_arrays += 1
+            return itertools.islice(values, self.array_sample)
+        return iter(values)
+
+    def _merge_decoded(self, data: Any, schema: SchemaBuilder):
+        """合并已解析对象中的字段（显式栈，深度计数与流式解析一致）"""
+        max_depth = self.max_depth
+
+        # 栈帧：(_MAP, 键值迭代器, 路径前缀, 所属字段, 深度) 或 (_ARRAY, 元素迭代器, 元素路径, 展开方式, 所属字段, 深度)
+        if isinstance(data, dict):
+            schema.enter_object("")
+            stack = [(_MAP, iter(data.items()), "", None, 1)]
+        elif isinstance(data, list):
+            stack = [(_ARRAY, self._sample(data), "", self._ARRAY_TOP_LEVEL, None, 1)]
+        else:
+            return
+
+        while stack:
+            frame = stack[-1]
+            if frame[0] == _MAP:
+                _, items, prefix, owner, depth = frame
+                for key, value in items:
+                    name = f"{prefix}.{key}" if prefix else key
+                    if isinstance(value, dict):
+                        schema.add(name, TYPE_OBJECT, prefix, owner)
+                        if depth >= max_depth:
+                            self.truncated = True
+                            continue
+                        schema.enter_object(name)
+                        stack.append((_MAP, iter(value.items()), name, name, depth + 1))
+                        break
+                    if isinstance(value, list):
+                        schema.add(name, TYPE_ARRAY, prefix, owner)
+                        if depth >= max_depth:
+                            self.truncated = True
+                            continue
+                        stack.append((_ARRAY, self._sample(value), f"{name}[0]", self._ARRAY_UNDER_KEY, name, depth + 1))
+                        break
+                    schema.add(name, type(value).__name__, prefix, owner)
+                else:
+                    stack.pop()
+            else:
+                _, elements, path, mode, owner, depth = frame
+                for value in elements:
+                    if isinstance(value, dict):
+                        if depth >= max_depth:
+                            self.truncated = True
+                            continue
+                        schema.enter_object(path)
+                        stack.append((_MAP, iter(value.items()), path, owner, depth + 1))
+                        break
+                    if isinstance(value, list) and mode == self._ARRAY_TOP_LEVEL:
+                        if depth >= max_depth:
+                            self.truncated = True
+                            continue
+                        stack.append((_ARRAY, self._sample(value), path, mode, owner, depth + 1))
+                        break
+                else:
+                    stack.pop()
+
+    def _merge_stream(self, source: Source, schema: SchemaBuilder):
+        """合并事件流中的字段"""
+        reader = JsonEventReader(source, self.chunk_size)
+        max_depth = self.max_depth
+        array_sample = self.array_sample
+
+        # 栈帧：[_MAP, 路径前缀, 当前键, 所属字段] 或 [_ARRAY, 元素路径, 展开方式, 已合并元素数, 所属字段]
+        stack: List[list] = []
+
+        kind, value = reader.next_event()
+        if kind == START_MAP:
+            schema.enter_object("")
+            stack.append([_MAP, "", None, None])
+        elif kind == START_ARRAY:
+            stack.append([_ARRAY, "", self._ARRAY_TOP_LEVEL, 0, None])
+
+        while stack:
+            frame = stack[-1]
+
+            if frame[0] == _ARRAY and 0 < array_sample <= frame[3]:
+                # 超出采样上限的元素只校验格式
+                skipped = False
+                while reader.skip_next_element():
+                    skipped = True
+                if skipped:
+                    self.sampled_arrays += 1
+
+            kind, value = reader.next_event()
+
+            if kind == KEY:
+                frame[2] = value
+                continue
+            if kind == END_MAP or kind == END_ARRAY:
+                stack.pop()
+                continue
+
+            is_container = kind == START_MAP or kind == START_ARRAY
+
+            if frame[0] == _MAP:
+                name = f"{frame[1]}.{frame[2]}" if frame[1] else frame[2]
+                if kind == START_MAP:
+                    field_type = TYPE_OBJECT
+                elif kind == START_ARRAY:
+                    field_type = TYPE_ARRAY
+                else:
+                    field_type = value
+                schema.add(name, field_type, frame[1], frame[3])
+
+                if is_container:
+                    if len(stack) >= max_depth:
+                        self.truncated = True
+                        reader.skip_container()
+                    elif kind == START_MAP:
+                        schema.enter_object(name)
+                        stack.append([_MAP, name, None, name])
+                    else:
+                        stack.append([_ARRAY, f"{name}[0]", self._ARRAY_UNDER_KEY, 0, name])
+                continue
+
+            # 数组元素
+            frame[3] += 1
+            if not is_container:
+                continue
+            if len(stack) >= max_depth:
+                self.truncated = True
+                reader.skip_container()
+            elif kind == START_MAP:
+                schema.enter_object(frame[1])
+                stack.append([_MAP, frame[1], None, frame[4]])
+            elif frame[2] == self._ARRAY_TOP_LEVEL:
+                stack.append([_ARRAY, frame[1], self._ARRAY_TOP_LEVEL, 0, frame[4]])
+            else:
+                reader.skip_container()
+
+        reader.finish()
+
+
+def extract_fields(
+    source: Source,
+    max_depth: int = JSON_FIELDS_MAX_DEPTH,
+    max_fields: int = JSON_FIELDS_MAX_FIELDS,
+    array_sample: int = JSON_FIELDS_ARRAY_SAMPLE
+) -> List[FieldRecord]:
+    """
+    提取JSON中的字段并合并为联合Schema（便捷函数）
+
+    Args:
+        source: JSON字符串、字节串或可读的文件对象
+        max_depth: 最大展开深度
+        max_fields: 最多提取的字段数
+        array_sample: 每个数组最多合并的元素数（0表示不限）
+
+    Returns:
+        字段记录列表
+    """
+    return JsonFieldExtractor(max_depth, max_fields, array_sample).extract(source)
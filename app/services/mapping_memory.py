@@ -0,0 +1,209 @@
+"""
+字段映射记忆模块
+把AI增强生成中校验通过的 响应字段 -> 数据库字段 映射持久化到本地SQLite数据库，
+以 (规范化字段路径, 关联表签名) 为键；之后的请求先查询记忆预先填写已知的行，再把剩余字段交给AI。
+记录按使用时间做LRU淘汰，可按用户隔离或全员共享
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.services.ddl_parser import TableSchema, normalize_name
+from app.services.response_table import ResponseTableRow
+
+# 记忆配置
+MAPPING_MEMORY_PATH = os.getenv("MAPPING_MEMORY_PATH", "data/mapping_memory.db")
+# 最多保存的映射条数，超出时淘汰最久未使用的记录
+MAPPING_MEMORY_MAX_ENTRIES = int(os.getenv("MAPPING_MEMORY_MAX_ENTRIES", "100000"))
+# 记忆范围：user（按用户隔离）或 shared（全员共享）
+MAPPING_MEMORY_SCOPE = os.getenv("MAPPING_MEMORY_SCOPE", "user")
+
+SCOPE_SHARED = "shared"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS mappings (
+    scope TEXT NOT NULL,
+    field_key TEXT NOT NULL,
+    table_signature TEXT NOT NULL,
+    source TEXT NOT NULL,
+    related TEXT NOT NULL,
+    description TEXT NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (scope, field_key, table_signature)
+);
+CREATE INDEX IF NOT EXISTS idx_mappings_last_used ON mappings (last_used);
+"""
+
+
+def field_key(field_name: str) -> str:
+    """规范化字段路径：各段去掉数组下标并规范化（data.list[0].createTime -> data.list.createtime）"""
+    segments = []
+    for segment in field_name.split("."):
+        while segment.endswith("[0]"):
+            segment = segment[:-3]
+        segments.append(normalize_name(segment))
+    return ".".join(segments)
+
+
+def table_signature(tables: List[TableSchema]) -> str:
+    """关联表签名：规范化表名排序后的哈希，表名集合相同的接口共享记忆"""
+    names = sorted({table.name.lower() for table in tables})
+    return hashlib.blake2b("\n".join(names).encode("utf-8"), digest_size=12).hexdigest()
+
+
+def scope_for_user(user_id) -> str:
+    """用户对应的记忆范围"""
+    if MAPPING_MEMORY_SCOPE == SCOPE_SHARED or user_id is None:
+        return SCOPE_SHARED
+    return f"user:{user_id}"
+
+
+class MappingMemory:
+    """字段映射记忆存储"""
+
+    def __init__(self, db_path: str = MAPPING_MEMORY_PATH, max_entries: int = MAPPING_MEMORY_MAX_ENTRIES):
+        self.db_path = Path(db_path)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(_SCHEMA)
+            self._connection = connection
+        return self._connection
+
+    def lookup(self, scopes: List[str], signature: str, field_names: Iterable[str]) -> Dict[str, ResponseTableRow]:
+        """
+        查询字段的已知映射
+
+        Args:
+            scopes: 依次查询的记忆范围（前面的优先）
+            signature: 关联表签名
+            field_names: 响应字段路径
+
+        Returns:
+            字段名 -> 记忆中的行（字段名为本次请求中的原字段路径）
+        """
+        names_by_key: Dict[str, List[str]] = {}
+        for name in field_names:
+            names_by_key.setdefault(field_key(name), []).append(name)
+        if not names_by_key or not scopes:
+            return {}
+
+        found: Dict[str, Tuple[str, str, str, str, str]] = {}
+        keys = list(names_by_key)
+        with self._lock:
+            connection = self._connect()
+            # 分批查询，避免超出SQLite的参数个数限制
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                scope_placeholders = ",".join("?" * len(scopes))
+                rows = connection.execute(
+                    f"SELECT scope, field_key, source, related, description FROM mappings "
+                    f"WHERE table_signature = ? AND scope IN ({scope_placeholders}) AND field_key IN ({placeholders})",
+                    [signature, *scopes, *batch]
+                ).fetchall()
+                for scope, key, source, related, description in rows:
+                    current = found.get(key)
+                    if current is None or scopes.index(scope) < scopes.index(current[0]):
+                        found[key] = (scope, key, source, related, description)
+
+            if found:
+                now = time.time()
+                connection.executemany(
+                    "UPDATE mappings SET hits = hits + 1, last_used = ? "
+                    "WHERE scope = ? AND field_key = ? AND table_signature = ?",
+                    [(now, scope, key, signature) for scope, key, *_ in found.values()]
+                )
+                connection.commit()
+
+        result = {}
+        for key, (_, _, source, related, description) in found.items():
+            for name in names_by_key[key]:
+                result[name] = ResponseTableRow(name, source, related, description)
+        return result
+
+    def record(self, scope: str, signature: str, rows: Iterable[ResponseTableRow]) -> int:
+        """
+        记录校验通过的映射（相同键覆盖为最新结果），超出容量时淘汰最久未使用的记录
+
+        Args:
+            scope: 记忆范围
+            signature: 关联表签名
+            rows: 响应参数表的行
+
+        Returns:
+            写入的条数
+        """
+        now = time.time()
+        values = [
+            (scope, field_key(row.name), signature, row.source, row.related, row.description, now, now)
+            for row in rows
+        ]
+        if not values:
+            return 0
+        with self._lock:
+            connection = self._connect()
+            connection.executemany(
+                "INSERT INTO mappings (scope, field_key, table_signature, source, related, description, "
+                "created_at, last_used) VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (scope, field_key, table_signature) DO UPDATE SET "
+                "source = excluded.source, related = excluded.related, description = excluded.description, "
+                "last_used = excluded.last_used",
+                values
+            )
+            self._evict(connection)
+            connection.commit()
+        return len(values)
+
+    def _evict(self, connection: sqlite3.Connection):
+        count = connection.execute("SELECT COUNT(*) FROM mappings").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            connection.execute(
+                "DELETE FROM mappings WHERE rowid IN "
+                "(SELECT rowid FROM mappings ORDER BY last_used LIMIT ?)",
+                (excess,)
+            )
+
+    def get_stats(self, scope: Optional[str] = None) -> Dict[str, int]:
+        """记忆条数和累计命中次数，scope为None时统计全部范围"""
+        with self._lock:
+            connection = self._connect()
+            if scope is None:
+                entries, hits = connection.execute("SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM mappings").fetchone()
+            else:
+                entries, hits = connection.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM mappings WHERE scope = ?", (scope,)
+                ).fetchone()
+        return {"entries": entries, "hits": hits, "max_entries": self.max_entries}
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+# 延迟初始化的全局映射记忆实例
+_memory_instance = None
+
+def get_mapping_memory() -> MappingMemory:
+    """获取字段映射记忆实例（单例模式）"""
+    global _memory_instance
+    if _memory_instance is None:
+        _memory_instance = MappingMemory()
+    return _memory_instance
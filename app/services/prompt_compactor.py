@@ -0,0 +1,197 @@
+"""
+Prompt压缩模块
+在每次AI调用前本地估算token数，压缩发送给模型的内容（去重并精简DDL、压缩JSON、数组只保留代表性样本），
+仍超出预算时按优先级逐步删减，并记录压缩前后的token估算
+"""
+
+import json
+import os
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 压缩配置
+# 每次AI请求内容的token预算（本地估算值）
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "16000"))
+# JSON报文中每个数组保留的样本元素数
+PROMPT_ARRAY_SAMPLE = int(os.getenv("PROMPT_ARRAY_SAMPLE", "3"))
+
+# 英文、数字和符号约每4个字符一个token，中文等非ASCII字符约每字一个token
+_ASCII_CHARS_PER_TOKEN = 4
+TRUNCATED_MARK = "\n……（超出token预算，以下内容已省略）"
+
+
+def estimate_tokens(text: str) -> int:
+    """本地估算文本的token数"""
+    if not text:
+        return 0
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    return (ascii_chars + _ASCII_CHARS_PER_TOKEN - 1) // _ASCII_CHARS_PER_TOKEN + len(text) - ascii_chars
+
+
+def _shape(value: Any) -> Any:
+    """元素的结构特征：对象取键集合，其他取类型名"""
+    if isinstance(value, dict):
+        return frozenset(value)
+    return type(value).__name__
+
+
+def sample_array(items: List[Any], sample: int) -> List[Any]:
+    """
+    从数组中选取代表性样本：优先保留结构（键集合/类型）不同的元素，其余按原顺序补足
+
+    Args:
+        items: 数组元素
+        sample: 保留的元素数
+
+    Returns:
+        按原顺序排列的样本元素
+    """
+    if len(items) <= sample:
+        return items
+    chosen = []
+    seen = set()
+    for index, item in enumerate(items):
+        shape = _shape(item)
+        if shape not in seen:
+            seen.add(shape)
+            chosen.append(index)
+            if len(chosen) == sample:
+                break
+    if len(chosen) < sample:
+        picked = set(chosen)
+        chosen.extend([index for index in range(len(items)) if index not in picked][:sample - len(chosen)])
+    return [items[index] for index in sorted(chosen)]
+
+
+def _truncate_arrays(value: Any, sample: int) -> Any:
+    """递归截断数组（显式栈，避免深层嵌套触发递归错误）"""
+    root = [value]
+    stack = [(root, 0)]
+    while stack:
+        container, key = stack.pop()
+        current = container[key]
+        if isinstance(current, list):
+            current = container[key] = sample_array(current, sample)
+            stack.extend((current, i) for i in range(len(current)))
+        elif isinstance(current, dict):
+            stack.extend((current, k) for k in current)
+    return root[0]
+
+
+def minify_json(text: str, sample: int = PROMPT_ARRAY_SAMPLE) -> str:
+    """
+    压缩JSON报文：去掉缩进和空白，每个数组只保留代表性样本
+
+    Args:
+        text: JSON文本
+        sample: 每个数组保留的元素数，0表示不截断
+
+    Returns:
+        压缩后的JSON；无法解析时返回去掉首尾空白的原文
+    """
+    text = text.strip()
+    if not text:
+        return text
+    try:
+        data = json.loads(text)
+    except (ValueError, RecursionError):
+        return text
+    if sample > 0:
+        data = _truncate_arrays(data, sample)
+    try:
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    except (ValueError, RecursionError):
+        return text
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """把文本截断到大约 max_tokens 个token，末尾附加省略标记"""
+    tokens = estimate_tokens(text)
+    if tokens <= max_tokens:
+        return text
+    keep = max(0, max_tokens - estimate_tokens(TRUNCATED_MARK))
+    length = int(len(text) * keep / tokens)
+    while length > 0 and estimate_tokens(text[:length]) > keep:
+        length = int(length * 0.9)
+    return text[:length] + TRUNCATED_MARK
+
+
+class CompactionReport:
+    """一次AI请求的压缩记录"""
+
+    __slots__ = ("stage", "budget", "before_tokens", "after_tokens", "steps")
+
+    def __init__(self, stage: str, budget: int, before_tokens: int):
+        self.stage = stage
+        self.budget = budget
+        self.before_tokens = before_tokens
+        self.after_tokens = before_tokens
+        self.steps: List[str] = []
+
+    @property
+    def within_budget(self) -> bool:
+        return self.after_tokens <= self.budget
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "stage": self.stage,
+            "budget": self.budget,
+            "before_tokens": self.before_tokens,
+            "after_tokens": self.after_tokens,
+            "within_budget": self.within_budget,
+            "steps": list(self.steps)
+        }
+
+
+# 压缩步骤：(步骤名称, 修改请求信息的函数)
+Reducer = Tuple[str, Callable[[Dict[str, str]], Dict[str, str]]]
+
+
+def fit_to_budget(
+    stage: str,
+    raw_content: str,
+    info: Dict[str, str],
+    fill: Callable[[Dict[str, str]], str],
+    reducers: List[Reducer],
+    truncate_key: Optional[str] = None,
+    budget: int = PROMPT_TOKEN_BUDGET
+) -> Tuple[str, CompactionReport]:
+    """
+    把AI请求内容压缩到token预算以内
+
+    Args:
+        stage: 流水线阶段名称
+        raw_content: 未压缩的请求内容（用于记录压缩前的token估算）
+        info: 已做基础压缩的模板槽位取值
+        fill: 槽位取值 -> 请求内容
+        reducers: 仍超出预算时依次执行的删减步骤
+        truncate_key: 最后仍超出预算时截断的槽位
+        budget: token预算
+
+    Returns:
+        (请求内容, 压缩记录)
+    """
+    report = CompactionReport(stage, budget, estimate_tokens(raw_content))
+    content = fill(info)
+    tokens = estimate_tokens(content)
+    report.steps.append("compact")
+
+    for name, reducer in reducers:
+        if tokens <= budget:
+            break
+        info = reducer(dict(info))
+        content = fill(info)
+        tokens = estimate_tokens(content)
+        report.steps.append(name)
+
+    if tokens > budget and truncate_key and info.get(truncate_key):
+        info = dict(info)
+        slot_tokens = estimate_tokens(info[truncate_key])
+        info[truncate_key] = truncate_to_tokens(info[truncate_key], max(0, slot_tokens - (tokens - budget)))
+        content = fill(info)
+        tokens = estimate_tokens(content)
+        report.steps.append(f"truncate:{truncate_key}")
+
+    report.after_tokens = tokens
+    if not report.within_budget:
+        print(f"AI请求内容仍超出token预算（{stage}）：{tokens} > {budget}")
+    return content, report
@@ -0,0 +1,128 @@
+"""
+Prompt文档模型模块
+以具名、可索引的结构保存Prompt的各个部分（头部、业务逻辑、各接口的请求/响应/表结构），
+AI流水线直接修改对应部分，只在最后序列化一次为markdown
+"""
+
+from typing import Dict, List, Optional
+
+from app.services.prompt_templates import get_template_registry, TEMPLATE_API_SECTION, TEMPLATE_PROMPT_HEADER
+
+
+def render_api_section(
+    name: str,
+    route: str,
+    request_example: str,
+    request_table: str,
+    response_example: str,
+    response_table: str,
+    database_tables_text: str
+) -> str:
+    """渲染单个接口的markdown部分（模板 prompt_templates/api_section.md）"""
+    return get_template_registry().render(TEMPLATE_API_SECTION, {
+        "name": name,
+        "route": route,
+        "request_example": request_example,
+        "request_table": request_table,
+        "response_example": response_example,
+        "response_table": response_table,
+        "database_tables": database_tables_text
+    })
+
+
+def render_prompt_header(since: str, author: str, api_names: List[str], business_logic: str = "") -> str:
+    """渲染Prompt头部（模板 prompt_templates/prompt_header.md），包含核心任务和业务逻辑"""
+    return get_template_registry().render(TEMPLATE_PROMPT_HEADER, {
+        "since": since,
+        "author": author,
+        "core_task": f"请你按要求完成【{'】、【'.join(api_names)}】。",
+        "business_logic_block": f"{business_logic}\n\n" if business_logic else ""
+    })
+
+
+class ApiSection:
+    """单个接口的文档部分，渲染结果缓存到下次修改为止"""
+
+    __slots__ = ("name", "route", "request_example", "request_table", "response_example",
+                 "response_table", "database_tables_text", "_rendered")
+
+    def __init__(
+        self,
+        name: str,
+        route: str,
+        request_example: str,
+        request_table: str,
+        response_example: str,
+        response_table: str,
+        database_tables_text: str,
+        rendered: Optional[str] = None
+    ):
+        self.name = name
+        self.route = route
+        self.request_example = request_example
+        self.request_table = request_table
+        self.response_example = response_example
+        self.response_table = response_table
+        self.database_tables_text = database_tables_text
+        # 可直接复用已渲染好的内容（如接口渲染缓存）
+        self._rendered = rendered
+
+    def set_response_table(self, response_table: str):
+        """替换响应参数表"""
+        self.response_table = response_table
+        self._rendered = None
+
+    def render(self) -> str:
+        """渲染为markdown"""
+        if self._rendered is None:
+            self._rendered = render_api_section(
+                self.name, self.route, self.request_example, self.request_table,
+                self.response_example, self.response_table, self.database_tables_text
+            )
+        return self._rendered
+
+
+class PromptDocument:
+    """Prompt文档"""
+
+    def __init__(self, since: str, author: str, apis: List[ApiSection]):
+        self.since = since
+        self.author = author
+        self.business_logic = ""
+        self.apis = apis
+        # 接口名称 -> 下标（同名接口取第一个）
+        self._index: Dict[str, int] = {}
+        for i, api in enumerate(apis):
+            self._index.setdefault(api.name, i)
+
+    @property
+    def core_task(self) -> str:
+        """核心任务描述"""
+        return f"请你按要求完成【{'】、【'.join(api.name for api in self.apis)}】。"
+
+    def get_api(self, name: str) -> Optional[ApiSection]:
+        """按接口名称查找接口部分"""
+        index = self._index.get(name)
+        return self.apis[index] if index is not None else None
+
+    def set_business_logic(self, business_logic: str):
+        """设置业务逻辑内容"""
+        self.business_logic = business_logic.strip()
+
+    def set_response_table(self, response_table: str, api_index: Optional[int] = None):
+        """
+        替换响应参数表
+
+        Args:
+            response_table: 新的响应参数表
+            api_index: 接口下标；为None时替换所有接口
+        """
+        table = response_table.strip()
+        targets = self.apis if api_index is None else [self.apis[api_index]]
+        for api in targets:
+            api.set_response_table(table)
+
+    def to_markdown(self) -> str:
+        """序列化为markdown（头部模板 prompt_templates/prompt_header.md）"""
+        header = render_prompt_header(self.since, self.author, [api.name for api in self.apis], self.business_logic)
+        return header + "\n\n".join(api.render() for api in self.apis)
@@ -0,0 +1,238 @@
+"""
+Prompt实时预览模块
+生成器页面通过WebSocket逐字段发送修改，服务端保存会话内的文档状态，
+只重新渲染被修改的接口部分（未修改的内容命中接口渲染缓存），防抖后把变化的部分推送给客户端
+"""
+
+import asyncio
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from pydantic import ValidationError
+
+from app.models import ApiInfo, PromptRequest
+from app.services.prompt_service import PromptService
+from app.services.prompt_document import render_prompt_header
+from app.services.ddl_catalog import get_ddl_catalog, DdlCatalogError
+from app.services.render_offload import get_render_offloader
+
+# 预览配置
+# 最后一次修改后等待多久再渲染推送（毫秒）
+PREVIEW_DEBOUNCE_MS = int(os.getenv("PREVIEW_DEBOUNCE_MS", "300"))
+# 连续修改时两次推送的最长间隔（毫秒），避免一直输入时预览不更新
+PREVIEW_MAX_DELAY_MS = int(os.getenv("PREVIEW_MAX_DELAY_MS", "1500"))
+# 单个预览会话的最大接口数
+PREVIEW_MAX_APIS = int(os.getenv("PREVIEW_MAX_APIS", "200"))
+
+# 可编辑的字段：文本字段和字符串列表字段
+PREVIEW_TEXT_FIELDS = ("name", "route", "request_example", "response_example")
+PREVIEW_LIST_FIELDS = ("database_tables", "table_refs")
+
+
+class PreviewError(ValueError):
+    """客户端消息不合法"""
+
+
+def _check_fields(fields: Any) -> Dict[str, Any]:
+    """校验接口字段的类型，返回只包含可编辑字段的副本"""
+    if not isinstance(fields, dict):
+        raise PreviewError("接口数据必须是对象")
+    result: Dict[str, Any] = {}
+    for field, value in fields.items():
+        if field in PREVIEW_TEXT_FIELDS:
+            if not isinstance(value, str):
+                raise PreviewError(f"字段 {field} 必须是字符串")
+        elif field in PREVIEW_LIST_FIELDS:
+            if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+                raise PreviewError(f"字段 {field} 必须是字符串列表")
+            value = [item for item in value if item.strip()]
+        else:
+            raise PreviewError(f"不支持的字段: {field}")
+        result[field] = value
+    return result
+
+
+def _format_validation_error(e: ValidationError) -> str:
+    return "；".join(f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}" for err in e.errors())
+
+
+class _PreviewEntry:
+    """会话中单个接口的编辑状态和最近一次渲染结果"""
+
+    __slots__ = ("fields", "section", "error", "dirty")
+
+    def __init__(self, fields: Dict[str, Any]):
+        self.fields = fields
+        # 最近一次成功渲染的markdown（校验失败时保留，预览不会因输入到一半而清空）
+        self.section: Optional[str] = None
+        self.error: Optional[str] = None
+        self.dirty = True
+
+    @property
+    def name(self) -> str:
+        return self.fields.get("name", "").strip()
+
+
+class PreviewSession:
+    """
+    单个WebSocket连接的预览会话
+
+    客户端消息：
+        {"type": "init", "apis": [接口, ...]}                        整体替换（打开预览或重置表单）
+        {"type": "edit", "index": i, "field": 字段, "value": 值}      修改单个字段
+        {"type": "insert", "index": i, "api": 接口}                   在下标 i 处插入接口
+        {"type": "remove", "index": i}                                删除接口
+
+    推送的补丁：
+        {"type": "patch", "version": n, "count": 接口数,
+         "ops": [{"op": "reset", "count": n} | {"op": "insert", "index": i} | {"op": "remove", "index": i}],
+         "header": 头部（仅变化时）,
+         "sections": {"i": {"markdown": 接口部分, "error": 错误}}（仅变化的接口，下标为应用ops后的位置）}
+    """
+
+    def __init__(self, user_id: int, developer: str, debounce_ms: int = PREVIEW_DEBOUNCE_MS,
+                 max_delay_ms: int = PREVIEW_MAX_DELAY_MS, max_apis: int = PREVIEW_MAX_APIS):
+        self.user_id = user_id
+        self.developer = developer
+        self.debounce = debounce_ms / 1000
+        self.max_delay = max(max_delay_ms, debounce_ms) / 1000
+        self.max_apis = max_apis
+        self.version = 0
+        self._entries: List[_PreviewEntry] = []
+        self._ops: List[Dict[str, Any]] = []
+        self._header: Optional[str] = None
+        self._changed = asyncio.Event()
+        # 渲染期间不应用新的修改，保证补丁中的下标与ops一致
+        self._lock = asyncio.Lock()
+
+    def limits(self) -> Dict[str, int]:
+        """会话参数（连接建立时发送给客户端）"""
+        return {"debounce_ms": int(self.debounce * 1000), "max_apis": self.max_apis}
+
+    def _get_entry(self, index: Any) -> _PreviewEntry:
+        if not isinstance(index, int) or not 0 <= index < len(self._entries):
+            raise PreviewError(f"接口下标不存在: {index}")
+        return self._entries[index]
+
+    async def apply(self, message: Any):
+        """
+        应用一条客户端消息，只标记受影响的接口，渲染在防抖后进行
+
+        Raises:
+            PreviewError: 消息格式不正确
+        """
+        if not isinstance(message, dict):
+            raise PreviewError("消息必须是JSON对象")
+        kind = message.get("type")
+        async with self._lock:
+            if kind == "init":
+                apis = message.get("apis")
+                if not isinstance(apis, list):
+                    raise PreviewError("apis 必须是列表")
+                if len(apis) > self.max_apis:
+                    raise PreviewError(f"接口数不能超过{self.max_apis}个")
+                self._entries = [_PreviewEntry(_check_fields(api)) for api in apis]
+                self._ops = [{"op": "reset", "count": len(self._entries)}]
+            elif kind == "edit":
+                field = message.get("field")
+                fields = _check_fields({field: message.get("value")})
+                entry = self._get_entry(message.get("index"))
+                if entry.fields.get(field) == fields[field]:
+                    return
+                entry.fields.update(fields)
+                entry.dirty = True
+            elif kind == "insert":
+                index = message.get("index")
+                if not isinstance(index, int) or not 0 <= index <= len(self._entries):
+                    raise PreviewError(f"插入位置不合法: {index}")
+                if len(self._entries) >= self.max_apis:
+                    raise PreviewError(f"接口数不能超过{self.max_apis}个")
+                self._entries.insert(index, _PreviewEntry(_check_fields(message.get("api") or {})))
+                self._ops.append({"op": "insert", "index": index})
+            elif kind == "remove":
+                index = message.get("index")
+                self._get_entry(index)
+                del self._entries[index]
+                self._ops.append({"op": "remove", "index": index})
+            else:
+                raise PreviewError(f"不支持的消息类型: {kind}")
+        self._changed.set()
+
+    async def next_patch(self) -> Optional[Dict[str, Any]]:
+        """
+        等待修改并在防抖后渲染：最后一次修改后 debounce 内没有新修改，
+        或距第一次修改已达 max_delay 时生成补丁
+
+        Returns:
+            补丁；没有可见变化时返回None
+        """
+        await self._changed.wait()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_delay
+        while True:
+            self._changed.clear()
+            timeout = min(self.debounce, deadline - loop.time())
+            if timeout <= 0:
+                break
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                break
+        self._changed.clear()
+        return await self.flush()
+
+    def _render_entries(self, entries: List[_PreviewEntry]) -> List[tuple]:
+        """校验并渲染接口（可能在线程池中执行），返回 (markdown, error) 列表"""
+        catalog = get_ddl_catalog()
+        results = []
+        for entry in entries:
+            try:
+                api = ApiInfo(**entry.fields)
+                if api.table_refs:
+                    # 展开引用的DDL目录表
+                    api = catalog.expand_request(self.user_id, PromptRequest(apis=[api])).apis[0]
+                results.append((PromptService.render_api(api).section, None))
+            except ValidationError as e:
+                results.append((entry.section, _format_validation_error(e)))
+            except DdlCatalogError as e:
+                results.append((entry.section, str(e)))
+            except Exception as e:
+                results.append((entry.section, f"渲染失败: {str(e)}"))
+        return results
+
+    async def flush(self) -> Optional[Dict[str, Any]]:
+        """立即渲染被修改的接口并生成补丁"""
+        async with self._lock:
+            dirty = [(i, entry) for i, entry in enumerate(self._entries) if entry.dirty]
+            sections: Dict[str, Dict[str, Optional[str]]] = {}
+            if dirty:
+                entries = [entry for _, entry in dirty]
+                offloader = get_render_offloader()
+                offload = offloader.should_offload(PromptRequest.model_construct(
+                    apis=[ApiInfo.model_construct(**{"request_example": "", "response_example": "",
+                                                     "database_tables": [], **entry.fields})
+                          for entry in entries]
+                ))
+                results = await offloader.run(offload, self._render_entries, entries)
+                for (i, entry), (section, error) in zip(dirty, results):
+                    entry.dirty = False
+                    if section == entry.section and error == entry.error:
+                        continue
+                    entry.section, entry.error = section, error
+                    sections[str(i)] = {"markdown": section, "error": error}
+
+            header = render_prompt_header(
+                datetime.now().strftime("%Y/%m/%d"), self.developer,
+                [entry.name for entry in self._entries if entry.name]
+            )
+            if not self._ops and not sections and header == self._header:
+                return None
+
+            self.version += 1
+            patch = {"type": "patch", "version": self.version, "count": len(self._entries),
+                     "ops": self._ops, "sections": sections}
+            if header != self._header:
+                patch["header"] = self._header = header
+            self._ops = []
+            return patch
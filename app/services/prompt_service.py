@@ -3,12 +3,28 @@ Prompt生成服务模块
 负责处理JSON解析和Prompt模板生成的业务逻辑
 """
 
-import json
-import os
-from typing import List, Dict
+import time
+from typing import List, Dict, Optional, Tuple
 from datetime import datetime
 
-from app.models import PromptRequest, FieldInfo, ApiInfo
+from app.models import PromptRequest, ApiInfo
+from app.services.chat_log_writer import get_chat_log_writer
+from app.services.section_cache import RenderedApi, get_section_cache
+from app.services.ddl_parser import ColumnIndex, compact_ddl, compact_ddl_statements
+from app.services.field_ranker import rank_candidate_columns
+from app.services.prompt_compactor import (
+    PROMPT_TOKEN_BUDGET, PROMPT_ARRAY_SAMPLE, CompactionReport, fit_to_budget, minify_json, truncate_to_tokens
+)
+from app.services.response_table import FieldKey, ResponseTableRow, field_labels
+from app.services.prompt_document import PromptDocument, ApiSection, render_api_section
+from app.services.prompt_templates import (
+    get_template_registry, TEMPLATE_AI_REQUEST, TEMPLATE_BUSINESS_LOGIC_REQUEST, TEMPLATE_API_SECTION
+)
+from app.services.json_fields import JsonFieldExtractor, JsonStreamError, FieldRecord, REQUIRED_NO, REQUIRED_UNKNOWN
+
+
+# 响应参数表表头
+RESPONSE_TABLE_HEADER = "| 响应报文字段 | 主数据库源 | 关联数据源 | 逻辑描述 |\n| ------------ | ---------- | ---------- | -------- |\n"
 
 
 class PromptService:
@@ -17,71 +33,25 @@ class PromptService:
     @staticmethod
     def get_ai_request_template() -> str:
         """
-        获取AI调用的请求报文模板
+        获取AI调用的请求报文模板（prompt_templates/ai_request.md，槽位留空）
         
         Returns:
             Markdown格式的请求报文模板字符串
         """
-        return """# 核心任务
-
-你是一名Java Web应用开发领域的资深的【需求分析师兼任技术架构师】，请你根据我在下面提供给你的（以一级标题的形式给出）：【接口名称与描述】、【相关表及表模型设计信息】、【接口响应报文格式表】（以markDown格式的表格给出），按要求进行综合分析，得出接口响应报文中的各个字段与数据库表字段的可能关联关系，并将其填入我提供的接口响应报文结构表中，最终将且仅将填充完毕的接口响应报文结构表返回给我（禁止用```markDown的markDown代码块包裹），除表格外，不附带任何多余描述。
-
-# 要求
-
-1. 发挥你在Java Web应用开发领域的丰富经验，综合【包括但不限于】以下两个标准进行综合评估，逐行分析接口响应报文结构表，填充每个响应报文字段的对应关系：
-   1. 能够从数据库表中的"_"连接符字段，简单转译成Java应用中驼峰结构参数名的数据，一定是相关的，例如user_id和userId一定是同一个字段；
-   2. 面对不能通过上一条规则匹配数据源的数据，你需要综合分析接口描述和响应报文字段名和数据库表字段含义进行评估，匹配有可能存在隐形关联的响应报文字段和数据库表字段。
-2. 主数据库源列的数据，应该以 数据库表名.数据库表字段名 的格式填充，例如：database.code;
-3. **只返回markDown格式的接口响应报文结构表。**
-
-# 接口名称与描述
-
-
-
-# 相关表及表模型设计信息
-
-
-
-# 接口响应报文格式表
-
-
-
-"""
+        return get_template_registry().render(TEMPLATE_AI_REQUEST)
     
     @staticmethod
     def get_business_logic_ai_request_template() -> str:
         """
-        获取业务逻辑分析的AI调用请求模板
+        获取业务逻辑分析的AI调用请求模板（prompt_templates/business_logic_request.md，槽位留空）
         
         Returns:
             用于分析业务逻辑的Markdown格式模板字符串
         """
-        return """# 核心任务
-
-你是一名Java Web应用开发领域的资深的【需求分析师兼任技术架构师】，我会提供给你：接口名称、请求报文样例、响应报文样例，你会根据我提供的信息和要求进行综合分析，返回一份接口业务逻辑描述给我。
-
-# 要求
-
-1. 发挥你在Java Web应用开发领域的丰富经验，根据接口名称、请求报文、响应报文进行综合分析，推测同类接口在行业内主流的业务逻辑；
-2. 只返回纯净的业务逻辑描述，不返回任何多余描述。
-
-
-# 接口名称
-
-
-
-# 请求报文样例
-
-
-
-# 响应报文样例
-
-
-
-"""
+        return get_template_registry().render(TEMPLATE_BUSINESS_LOGIC_REQUEST)
     
     @staticmethod
-    def parse_json_fields(json_string: str) -> List[FieldInfo]:
+    def parse_json_fields(json_string: str) -> List[FieldRecord]:
         """
         解析JSON字符串并提取字段信息
         
@@ -89,62 +59,26 @@ class PromptService:
             json_string: JSON格式的字符串
             
         Returns:
-            字段信息列表
+            字段记录列表（数组元素合并为联合Schema）
         """
+        extractor = JsonFieldExtractor()
         try:
-            data = json.loads(json_string)
-            fields = []
-            
-            def extract_fields(obj, prefix=""):
-                if isinstance(obj, dict):
-                    for key, value in obj.items():
-                        field_name = f"{prefix}.{key}" if prefix else key
-                        field_type = type(value).__name__
-                        
-                        if isinstance(value, dict):
-                            fields.append(FieldInfo(
-                                name=field_name,
-                                type="object",
-                                required="是",
-                                description="对象类型"
-                            ))
-                            extract_fields(value, field_name)
-                        elif isinstance(value, list):
-                            fields.append(FieldInfo(
-                                name=field_name,
-                                type="array",
-                                required="是",
-                                description="数组类型"
-                            ))
-                            if value and isinstance(value[0], dict):
-                                extract_fields(value[0], f"{field_name}[0]")
-                        else:
-                            fields.append(FieldInfo(
-                                name=field_name,
-                                type=field_type,
-                                required="是",
-                                description=f"{field_type}类型字段"
-                            ))
-                elif isinstance(obj, list) and obj:
-                    extract_fields(obj[0], prefix)
-            
-            extract_fields(data)
-            return fields
-        except json.JSONDecodeError:
-            return [FieldInfo(
+            return extractor.extract(json_string)
+        except JsonStreamError:
+            return [FieldRecord(
                 name="解析错误",
                 type="unknown",
-                required="未知",
+                required=REQUIRED_UNKNOWN,
                 description="JSON格式不正确"
             )]
     
     @staticmethod
-    def generate_request_table(fields: List[FieldInfo]) -> str:
+    def generate_request_table(fields: List[FieldRecord]) -> str:
         """
         生成请求参数表格
         
         Args:
-            fields: 字段信息列表
+            fields: 字段记录列表
             
         Returns:
             Markdown格式的表格字符串
@@ -154,31 +88,130 @@ class PromptService:
 | ---- | ---- | ---- | ---- |
 | 无参数 | - | - | - |"""
         
-        table = "| 参数 | 类型 | 必填 | 说明 |\n| ---- | ---- | ---- | ---- |\n"
-        for field in fields:
-            table += f"| {field.name} | {field.type} | {field.required} | {field.description} |\n"
-        return table
+        rows = [f"| {field.name} | {field.type} | {field.required} | {field.description} |\n" for field in fields]
+        return "| 参数 | 类型 | 必填 | 说明 |\n| ---- | ---- | ---- | ---- |\n" + "".join(rows)
     
     @staticmethod
-    def generate_response_table(fields: List[FieldInfo]) -> str:
+    def response_table_row(field: FieldRecord, sources: Optional[Dict[str, str]] = None) -> str:
+        """
+        生成响应参数表的一行（已在本地匹配到数据库字段的直接填写主数据库源）
+        
+        Args:
+            field: 字段记录
+            sources: 字段名 -> 主数据库源（表名.字段名）
+            
+        Returns:
+            表格行（含换行符）
+        """
+        description = f"{field.description}{'（非必有）' if field.required == REQUIRED_NO else ''}"
+        source = sources.get(field.name) if sources else None
+        if source:
+            return f"| {field.name} | {source} | - | {description} |\n"
+        return f"| {field.name} | 待填写 | 待填写 | {description} |\n"
+    
+    @classmethod
+    def generate_response_table(cls, fields: List[FieldRecord], sources: Optional[Dict[str, str]] = None) -> str:
         """
         生成响应参数表格
         
         Args:
-            fields: 字段信息列表
+            fields: 字段记录列表
+            sources: 本地预匹配结果（字段名 -> 表名.字段名），匹配到的字段预先填写主数据库源
             
         Returns:
             Markdown格式的表格字符串
         """
         if not fields:
-            return """| 响应报文字段 | 主数据库源 | 关联数据源 | 逻辑描述 |
-| ------------ | ---------- | ---------- | -------- |
-| 无字段 | - | - | - |"""
+            return RESPONSE_TABLE_HEADER + "| 无字段 | - | - | - |"
         
-        table = "| 响应报文字段 | 主数据库源 | 关联数据源 | 逻辑描述 |\n| ------------ | ---------- | ---------- | -------- |\n"
+        return RESPONSE_TABLE_HEADER + "".join([cls.response_table_row(field, sources) for field in fields])
+    
+    @staticmethod
+    def premap_response_fields(fields: List[FieldRecord], column_index: ColumnIndex) -> Dict[str, str]:
+        """
+        用DDL字段索引在本地匹配响应字段（下划线/驼峰完全对应且唯一）
+        
+        Args:
+            fields: 响应字段记录列表
+            column_index: 接口关联表的字段索引
+            
+        Returns:
+            字段名 -> 主数据库源（表名.字段名）
+        """
+        sources = {}
         for field in fields:
-            table += f"| {field.name} | 待填写 | 待填写 | {field.description} |\n"
-        return table
+            column = column_index.resolve(field.name)
+            if column is not None:
+                sources[field.name] = column.source
+        return sources
+    
+    @classmethod
+    def unresolved_field_keys(cls, prompt_data: PromptRequest) -> List[FieldKey]:
+        """全部接口中本地未匹配的响应字段（不同接口的同名字段各占一项，保持原顺序）"""
+        return [
+            (index, field.name)
+            for index, api in enumerate(prompt_data.apis) if api.response_example
+            for field in cls.render_api(api).unresolved_fields
+        ]
+    
+    @classmethod
+    def ai_field_labels(cls, prompt_data: PromptRequest) -> Dict[FieldKey, str]:
+        """AI请求中未匹配字段的名称（同一次生成的首次请求和补充请求使用相同的名称）"""
+        return field_labels(cls.unresolved_field_keys(prompt_data))
+    
+    @classmethod
+    def rank_field_candidates(cls, prompt_data: PromptRequest,
+                              keys: List[FieldKey]) -> Dict[FieldKey, List[Tuple[str, float]]]:
+        """
+        按名称相似度计算未匹配字段的候选数据库字段，供AI优先参考（只在生成AI请求时计算）
+        
+        Args:
+            prompt_data: Prompt请求数据
+            keys: 需要候选字段的字段键，每个接口只在自己的关联表中排序
+            
+        Returns:
+            字段键 -> [(表名.字段名, 相似度)]，没有候选的字段不包含在内
+        """
+        names_by_api: Dict[int, List[str]] = {}
+        for index, name in keys:
+            names_by_api.setdefault(index, []).append(name)
+        candidates = {}
+        for index, names in names_by_api.items():
+            columns = ColumnIndex.from_ddl_list(prompt_data.apis[index].database_tables).columns
+            for name, matches in rank_candidate_columns(names, columns).items():
+                candidates[(index, name)] = matches
+        return candidates
+    
+    @classmethod
+    def merge_response_table(cls, rendered: RenderedApi, ai_rows: Dict[str, ResponseTableRow],
+                             column_index: ColumnIndex) -> str:
+        """
+        合并本地预匹配结果与AI填写的行，按原字段顺序生成完整的响应参数表
+        
+        Args:
+            rendered: 接口渲染结果
+            ai_rows: 该接口的AI有效行（字段名 -> 行）
+            column_index: 该接口关联表的字段索引，主数据库源不是其中字段的行不采用
+            
+        Returns:
+            完整的响应参数表；AI未返回或主数据库源无效的字段保留"待填写"
+        """
+        if not rendered.response_fields:
+            return rendered.response_table
+        rows = []
+        for field in rendered.response_fields:
+            ai_row = ai_rows.get(field.name)
+            if ai_row is not None and column_index.find_source(ai_row.source) is None:
+                ai_row = None
+            if field.name in rendered.column_sources or ai_row is None:
+                rows.append(cls.response_table_row(field, rendered.column_sources))
+            elif not ai_row.description:
+                # AI没有写逻辑描述时沿用本地的字段描述
+                rows.append(ResponseTableRow(ai_row.name, ai_row.source, ai_row.related,
+                                             field.description).to_markdown())
+            else:
+                rows.append(ai_row.to_markdown())
+        return RESPONSE_TABLE_HEADER + "".join(rows)
     
     @staticmethod
     def format_database_tables(database_tables: List[str]) -> str:
@@ -204,60 +237,58 @@ class PromptService:
         return "\n\n---\n\n".join(formatted_tables)
     
     @classmethod
-    def generate_api_section(cls, api: ApiInfo) -> str:
+    def render_api(cls, api: ApiInfo) -> RenderedApi:
         """
-        生成单个接口的模板部分
+        解析并渲染单个接口（按内容哈希缓存，未修改的接口直接复用）
         
         Args:
             api: 单个接口信息
             
         Returns:
-            单个接口的模板字符串
+            接口的字段、表格和模板部分
         """
+        # 接口模板重新加载后，旧版本渲染的缓存项不再命中
+        version = get_template_registry().get(TEMPLATE_API_SECTION).version
+        return get_section_cache().get_or_render(api, cls._render_api, salt=f"v{version}")
+
+    @classmethod
+    def _render_api(cls, api: ApiInfo) -> RenderedApi:
         # 解析请求和响应JSON
         request_fields = cls.parse_json_fields(api.request_example)
         response_fields = cls.parse_json_fields(api.response_example)
         
+        # 用关联表的DDL在本地预匹配响应字段
+        column_index = ColumnIndex.from_ddl_list(api.database_tables)
+        column_sources = cls.premap_response_fields(response_fields, column_index)
+        unresolved_fields = [field for field in response_fields if field.name not in column_sources]
+        
         # 生成表格
         request_table = cls.generate_request_table(request_fields)
-        response_table = cls.generate_response_table(response_fields)
+        response_table = cls.generate_response_table(response_fields, column_sources)
         
         # 格式化数据库表
         database_tables_text = cls.format_database_tables_for_api(api.database_tables)
         
-        api_template = f"""# 接口API
-
-**接口名称：{api.name}**
-
-```http
-{api.route}
-```
-
-**请求体：**
-
-```json
-{api.request_example}
-```
-
-**请求参数：**
-
-{request_table}
-
-**响应结构：**
-
-```json
-{api.response_example}
-```
-
-**响应参数：**
-
-{response_table}
-
-**关联数据库表：**
+        api_template = render_api_section(
+            api.name, api.route, api.request_example, request_table,
+            api.response_example, response_table, database_tables_text
+        )
+        
+        return RenderedApi(request_fields, response_fields, request_table, response_table,
+                           database_tables_text, api_template, column_sources, unresolved_fields)
 
-{database_tables_text}"""
+    @classmethod
+    def generate_api_section(cls, api: ApiInfo) -> str:
+        """
+        生成单个接口的模板部分
         
-        return api_template
+        Args:
+            api: 单个接口信息
+            
+        Returns:
+            单个接口的模板字符串
+        """
+        return cls.render_api(api).section
 
     @staticmethod
     def format_database_tables_for_api(database_tables: List[str]) -> str:
@@ -281,83 +312,95 @@ class PromptService:
         return "\n".join(formatted_tables)
 
     @classmethod
-    def generate_prompt_template(cls, data: PromptRequest, developer: str) -> str:
+    def build_prompt_document(cls, data: PromptRequest, developer: str) -> PromptDocument:
         """
-        生成完整的prompt模板
+        构建结构化的prompt文档
         
         Args:
             data: Prompt请求数据
             developer: 开发者姓名
             
         Returns:
-            生成的prompt模板字符串
+            Prompt文档，可直接修改各部分后序列化为markdown
         """
         current_date = datetime.now().strftime("%Y/%m/%d")
         
-        # 收集所有接口名称
-        api_names = [api.name for api in data.apis]
-        if len(api_names) == 1:
-            core_task = f"请你按要求完成【{api_names[0]}】。"
-        else:
-            api_names_str = "】、【".join(api_names)
-            core_task = f"请你按要求完成【{api_names_str}】。"
-        
-        # 生成模板头部
-        template = f"""- since: {current_date}
-- author: {developer}
-
-# 核心任务
-
-{core_task}
-
-# 业务逻辑
-
-# 开发规范
-- 接口采用简单的Controller-IService-ServiceImpl-Mapper.java-Mapper.xml的层级设计，具体存放位置参照【待填写】接口；
-- 请你在开发时，格外注意**所有使用的方法必须要在项目中有过已使用案例**以确保可用性和规范性；
-- 项目使用JDK8+SpringBoot2.7，请你在开发时注意代码的适配性；
-- 生成SQL时，请不要使用高级的SQL方法或机制，非必要禁用嵌套SQL，使用JOIN进行联表查询替代嵌套SQL，SQL只返回需要使用到的字段；
-- 有可能导致你开发出现错误的不明确的问题或信息，请你先向我询问答案，再进行开发。
-
-
-
-"""
-        
-        # 为每个接口生成对应的部分
+        # 为每个接口生成对应的部分（复用接口渲染缓存）
         api_sections = []
         for api in data.apis:
-            api_section = cls.generate_api_section(api)
-            api_sections.append(api_section)
+            rendered = cls.render_api(api)
+            api_sections.append(ApiSection(
+                api.name, api.route, api.request_example, rendered.request_table,
+                api.response_example, rendered.response_table, rendered.database_tables_text,
+                rendered=rendered.section
+            ))
+        
+        return PromptDocument(current_date, developer, api_sections)
+    
+    @classmethod
+    def generate_prompt_template(cls, data: PromptRequest, developer: str) -> str:
+        """
+        生成完整的prompt模板
         
-        # 合并所有接口部分
-        template += "\n\n".join(api_sections)
+        Args:
+            data: Prompt请求数据
+            developer: 开发者姓名
+            
+        Returns:
+            生成的prompt模板字符串
+        """
+        return cls.build_prompt_document(data, developer).to_markdown()
+    
+    @classmethod
+    def count_premapped_fields(cls, prompt_data: PromptRequest) -> Tuple[int, int]:
+        """
+        统计本地DDL预匹配的响应字段数
         
-        return template
+        Args:
+            prompt_data: Prompt请求数据
+            
+        Returns:
+            (本地匹配的字段数, 响应字段总数)
+        """
+        resolved = total = 0
+        for api in prompt_data.apis:
+            rendered = cls.render_api(api)
+            resolved += len(rendered.column_sources)
+            total += len(rendered.response_fields)
+        return resolved, total
     
     @staticmethod
-    def extract_prompt_info_for_ai(prompt_data: 'PromptRequest') -> Dict[str, str]:
+    def extract_prompt_info_for_ai(prompt_data: 'PromptRequest', compact: bool = False,
+                                   candidates: Optional[Dict[FieldKey, List[Tuple[str, float]]]] = None) -> Dict[str, str]:
         """
         从PromptRequest数据中提取接口信息用于AI调用
         
         Args:
             prompt_data: PromptRequest数据对象
+            compact: 是否压缩DDL（去掉索引和表选项，多个接口间相同的DDL只保留一份）
+            candidates: 已计算的候选数据库字段，为None时按全部未匹配字段计算
             
         Returns:
-            包含接口名称、数据库表和响应参数表的字典
+            包含接口名称、数据库表和响应参数表（只含本地未匹配的字段）的字典
         """
         if not prompt_data.apis or len(prompt_data.apis) == 0:
             return {
                 "interface_name": "",
                 "database_tables": "",
-                "response_table": ""
+                "response_table": "",
+                "candidate_columns_block": ""
             }
         
         # 处理多个接口的情况
         interface_names = []
         all_database_tables = []
         all_response_tables = []
+        all_candidates = {}
+        labels = PromptService.ai_field_labels(prompt_data)
+        if candidates is None:
+            candidates = PromptService.rank_field_candidates(prompt_data, list(labels))
         
-        for api in prompt_data.apis:
+        for index, api in enumerate(prompt_data.apis):
             # 收集接口名称
             if api.name:
                 interface_names.append(api.name)
@@ -365,15 +408,26 @@ class PromptService:
             # 收集数据库表信息
             if api.database_tables:
                 for table_ddl in api.database_tables:
-                    if table_ddl.strip():
+                    if not table_ddl.strip():
+                        continue
+                    if not compact:
                         all_database_tables.append(table_ddl.strip())
+                        continue
+                    table_ddl = compact_ddl(table_ddl)
+                    if table_ddl and table_ddl not in all_database_tables:
+                        all_database_tables.append(table_ddl)
             
-            # 收集响应参数表
+            # 收集响应参数表：本地已匹配的字段不再交给AI
             if api.response_example:
-                response_fields = PromptService.parse_json_fields(api.response_example)
-                response_table = PromptService.generate_response_table(response_fields)
-                if response_table.strip():
+                rendered = PromptService.render_api(api)
+                if rendered.unresolved_fields:
+                    items = [(index, field) for field in rendered.unresolved_fields]
+                    response_table = PromptService.generate_response_table(PromptService.label_fields(items, labels))
                     all_response_tables.append(response_table.strip())
+                    for field in rendered.unresolved_fields:
+                        matches = candidates.get((index, field.name))
+                        if matches:
+                            all_candidates[labels[(index, field.name)]] = matches
         
         # 格式化接口名称
         if len(interface_names) == 1:
@@ -382,13 +436,7 @@ class PromptService:
             interface_name = "、".join(interface_names)
         
         # 格式化数据库表信息
-        if all_database_tables:
-            formatted_tables = []
-            for i, table_ddl in enumerate(all_database_tables, 1):
-                formatted_tables.append(f"表{i}：\n```sql\n{table_ddl}\n```")
-            database_tables = "\n".join(formatted_tables)
-        else:
-            database_tables = "暂无关联数据库表"
+        database_tables = PromptService.format_ai_database_tables(all_database_tables)
         
         # 格式化响应参数表
         if all_response_tables:
@@ -399,244 +447,331 @@ class PromptService:
         return {
             "interface_name": interface_name,
             "database_tables": database_tables,
-            "response_table": response_table
+            "response_table": response_table,
+            "candidate_columns_block": PromptService.format_candidate_columns(all_candidates)
         }
     
     @staticmethod
-    def extract_business_logic_info_for_ai(base_prompt: str) -> Dict[str, str]:
+    def format_ai_database_tables(ddl_list: List[str]) -> str:
         """
-        从基础prompt中提取业务逻辑分析所需的信息
+        格式化AI请求中的数据库表部分
         
         Args:
-            base_prompt: 基础prompt模板字符串
+            ddl_list: DDL列表
             
         Returns:
-            包含接口名称、请求体、响应结构的字典
+            按"表N"编号的sql代码块；没有DDL时为"暂无关联数据库表"
         """
-        lines = base_prompt.split('\n')
+        if not ddl_list:
+            return "暂无关联数据库表"
+        return "\n".join(f"表{i}：\n```sql\n{table_ddl}\n```" for i, table_ddl in enumerate(ddl_list, 1))
+    
+    @staticmethod
+    def label_fields(items: List[Tuple[int, FieldRecord]], labels: Dict[FieldKey, str]) -> List[FieldRecord]:
+        """把字段名替换为AI请求中的名称（见 field_labels），用于生成交给AI的响应参数表"""
+        records = []
+        for index, field in items:
+            label = labels.get((index, field.name), field.name)
+            records.append(field if label == field.name else
+                           FieldRecord(label, field.type, field.required, field.description))
+        return records
+    
+    @classmethod
+    def plan_response_chunks(cls, prompt_data: PromptRequest, chunk_fields: int,
+                             only_fields: Optional[List[FieldKey]] = None) -> List[List[Tuple[int, FieldRecord]]]:
+        """
+        把全部接口中本地未匹配的响应字段按原顺序切分为分块
+        
+        Args:
+            prompt_data: Prompt请求数据
+            chunk_fields: 每个分块的最大字段数
+            only_fields: 只包含这些字段键（用于补充请求），为None时包含全部未匹配字段
+            
+        Returns:
+            分块列表，每项为 [(接口下标, 字段记录)]
+        """
+        selected = set(only_fields) if only_fields is not None else None
+        items = [
+            (index, field)
+            for index, api in enumerate(prompt_data.apis) if api.response_example
+            for field in cls.render_api(api).unresolved_fields
+            if selected is None or (index, field.name) in selected
+        ]
+        size = max(1, chunk_fields)
+        return [items[start:start + size] for start in range(0, len(items), size)]
+    
+    @classmethod
+    def chunk_database_tables(cls, prompt_data: PromptRequest, chunk: List[Tuple[int, FieldRecord]],
+                              candidates: Dict[FieldKey, List[Tuple[str, float]]]) -> List[str]:
+        """
+        选出与分块相关的压缩DDL
         
-        interface_name = ""
-        request_example = ""
-        response_example = ""
+        分块中每个字段都有候选数据库字段时只保留候选字段所在的表，否则保留分块所属接口的全部表
         
-        # 查找接口名称
-        for i, line in enumerate(lines):
-            if line.startswith('**接口名称：'):
-                interface_name = line.replace('**接口名称：', '').replace('**', '').strip()
+        Args:
+            prompt_data: Prompt请求数据
+            chunk: 分块
+            candidates: 字段键 -> 候选数据库字段
+            
+        Returns:
+            去重后的压缩DDL列表
+        """
+        api_indexes = sorted({index for index, _ in chunk})
+        tables = set()
+        for index, field in chunk:
+            matches = candidates.get((index, field.name))
+            if not matches:
+                tables = None
                 break
+            tables.update(source.rsplit(".", 1)[0].lower() for source, _ in matches)
         
-        # 查找请求体部分
-        in_request_section = False
-        request_lines = []
-        for i, line in enumerate(lines):
-            if line.startswith('**请求体：**'):
-                in_request_section = True
-                continue
-            elif in_request_section:
-                if line.startswith('```json'):
+        ddl_list = []
+        for index in api_indexes:
+            for table_ddl in prompt_data.apis[index].database_tables:
+                if not table_ddl.strip():
                     continue
-                elif line.startswith('```') and request_lines:
-                    break
-                elif line.startswith('**'):
-                    break
-                elif in_request_section and not line.startswith('```'):
-                    request_lines.append(line)
-        
-        request_example = '\n'.join(request_lines).strip()
-        
-        # 查找响应结构部分
-        in_response_section = False
-        response_lines = []
-        for i, line in enumerate(lines):
-            if line.startswith('**响应结构：**'):
-                in_response_section = True
-                continue
-            elif in_response_section:
-                if line.startswith('```json'):
-                    continue
-                elif line.startswith('```') and response_lines:
-                    break
-                elif line.startswith('**'):
-                    break
-                elif in_response_section and not line.startswith('```'):
-                    response_lines.append(line)
+                statements = compact_ddl_statements(table_ddl)
+                if statements is None:
+                    # 无法识别建表语句的DDL只在保留全部表时发送
+                    selected = [compact_ddl(table_ddl)] if tables is None else []
+                else:
+                    selected = [
+                        statement for table, statement in statements
+                        if tables is None or table.lower() in tables
+                    ]
+                for statement in selected:
+                    if statement and statement not in ddl_list:
+                        ddl_list.append(statement)
+        return ddl_list
+    
+    @classmethod
+    def build_ai_requests(cls, prompt_data: PromptRequest, chunk_fields: int,
+                          budget: int = PROMPT_TOKEN_BUDGET, only_fields: Optional[List[FieldKey]] = None,
+                          stage: str = "response_table") -> List[Tuple[str, CompactionReport, int]]:
+        """
+        生成响应参数表填充阶段的AI请求；未匹配字段超过 chunk_fields 个时按字段分块，
+        每个分块只包含相关的DDL和候选字段
+        
+        Args:
+            prompt_data: Prompt请求数据
+            chunk_fields: 每个分块的最大字段数
+            budget: 每个请求的token预算
+            only_fields: 只请求这些字段键（补充请求），为None时请求全部未匹配字段
+            stage: 压缩记录中的阶段名称
+            
+        Returns:
+            [(AI请求内容, 压缩记录, 字段数)]
+        """
+        chunks = cls.plan_response_chunks(prompt_data, chunk_fields, only_fields)
+        candidates = cls.rank_field_candidates(prompt_data, [(index, field.name) for chunk in chunks for index, field in chunk])
+        if len(chunks) <= 1 and only_fields is None:
+            content, report = cls.build_ai_request(prompt_data, budget, candidates)
+            return [(content, report, len(chunks[0]) if chunks else 0)]
+        
+        def drop_candidates(info: Dict[str, str]) -> Dict[str, str]:
+            info["candidate_columns_block"] = ""
+            return info
+        
+        labels = cls.ai_field_labels(prompt_data)
+        requests = []
+        for number, chunk in enumerate(chunks, 1):
+            apis = [prompt_data.apis[index] for index in sorted({index for index, _ in chunk})]
+            chunk_candidates = {}
+            for index, field in chunk:
+                matches = candidates.get((index, field.name))
+                if matches:
+                    chunk_candidates[labels[(index, field.name)]] = matches
+            info = {
+                "interface_name": "、".join(api.name for api in apis if api.name),
+                "database_tables": cls.format_ai_database_tables(cls.chunk_database_tables(prompt_data, chunk, candidates)),
+                "response_table": cls.generate_response_table(cls.label_fields(chunk, labels)).strip(),
+                "candidate_columns_block": cls.format_candidate_columns(chunk_candidates)
+            }
+            raw_tables = [table_ddl.strip() for api in apis for table_ddl in api.database_tables if table_ddl.strip()]
+            raw_content = cls.fill_ai_request_template(dict(info, database_tables=cls.format_ai_database_tables(raw_tables)))
+            content, report = fit_to_budget(
+                f"{stage}#{number}", raw_content, info, cls.fill_ai_request_template,
+                [("drop_candidates", drop_candidates)], truncate_key="database_tables", budget=budget
+            )
+            requests.append((content, report, len(chunk)))
+        return requests
+    
+    @staticmethod
+    def format_candidate_columns(candidates: Dict[str, List[Tuple[str, float]]]) -> str:
+        """
+        格式化候选数据库字段，作为AI请求中的附加参考部分
+        
+        Args:
+            candidates: 字段在AI请求中的名称 -> [(表名.字段名, 相似度)]
+            
+        Returns:
+            以换行开头的markdown部分；没有候选字段时为空字符串
+        """
+        if not candidates:
+            return ""
+        rows = [
+            f"| {name} | {'、'.join(f'{source}（{score:.2f}）' for source, score in matches)} |\n"
+            for name, matches in candidates.items()
+        ]
+        return (
+            "\n\n# 候选数据库字段\n\n"
+            "以下是按字段名、表名与字段注释的相似度在本地计算出的候选字段（括号内为相似度，按相似度降序），"
+            "请优先从中判断，但不限于这些字段：\n\n"
+            "| 响应报文字段 | 候选数据库字段 |\n| ------------ | -------------- |\n"
+            + "".join(rows).rstrip("\n")
+        )
+    
+    @staticmethod
+    def extract_business_logic_info(document: PromptDocument, array_sample: Optional[int] = None) -> Dict[str, str]:
+        """
+        从prompt文档中提取业务逻辑分析所需的信息（取第一个接口）
         
-        response_example = '\n'.join(response_lines).strip()
+        Args:
+            document: Prompt文档
+            array_sample: 不为None时压缩请求/响应JSON，每个数组只保留该数量的代表性元素（0表示不截断）
+            
+        Returns:
+            包含接口名称、请求体、响应结构的字典
+        """
+        if not document.apis:
+            return {"interface_name": "", "request_example": "", "response_example": ""}
         
+        api = document.apis[0]
+        if array_sample is None:
+            request_example = api.request_example.strip()
+            response_example = api.response_example.strip()
+        else:
+            request_example = minify_json(api.request_example, array_sample)
+            response_example = minify_json(api.response_example, array_sample)
         return {
-            "interface_name": interface_name,
+            "interface_name": api.name.strip(),
             "request_example": request_example,
             "response_example": response_example
         }
     
-    @staticmethod
-    def fill_ai_request_template(prompt_info: Dict[str, str]) -> str:
+    @classmethod
+    def build_ai_request(cls, prompt_data: PromptRequest, budget: int = PROMPT_TOKEN_BUDGET,
+                         candidates: Optional[Dict[FieldKey, List[Tuple[str, float]]]] = None
+                         ) -> Tuple[str, CompactionReport]:
         """
-        将prompt信息填入AI请求模板
+        生成响应参数表填充阶段的AI请求内容，并压缩到token预算以内
+        
+        超出预算时依次：去掉候选数据库字段部分、截断数据库表部分；响应参数表本身不删减
         
         Args:
-            prompt_info: 包含接口信息的字典
+            prompt_data: Prompt请求数据
+            budget: token预算
+            candidates: 已计算的候选数据库字段，为None时按全部未匹配字段计算
             
         Returns:
-            填充完成的AI请求内容
+            (AI请求内容, 压缩记录)
         """
-        template = PromptService.get_ai_request_template()
-        
-        # 替换模板中的占位符
-        filled_template = template.replace(
-            "# 接口名称与描述\n\n\n",
-            f"# 接口名称与描述\n\n{prompt_info['interface_name']}\n"
-        ).replace(
-            "# 相关表及表模型设计信息\n\n\n",
-            f"# 相关表及表模型设计信息\n\n{prompt_info['database_tables']}\n"
-        ).replace(
-            "# 接口响应报文格式表\n\n\n",
-            f"# 接口响应报文格式表\n\n{prompt_info['response_table']}\n"
-        )
+        if candidates is None:
+            candidates = cls.rank_field_candidates(prompt_data, cls.unresolved_field_keys(prompt_data))
+        raw_content = cls.fill_ai_request_template(cls.extract_prompt_info_for_ai(prompt_data, candidates=candidates))
         
-        return filled_template
+        def drop_candidates(info: Dict[str, str]) -> Dict[str, str]:
+            info["candidate_columns_block"] = ""
+            return info
+        
+        return fit_to_budget(
+            "response_table", raw_content, cls.extract_prompt_info_for_ai(prompt_data, compact=True, candidates=candidates),
+            cls.fill_ai_request_template, [("drop_candidates", drop_candidates)],
+            truncate_key="database_tables", budget=budget
+        )
     
-    @staticmethod
-    def fill_business_logic_ai_request_template(business_info: Dict[str, str]) -> str:
+    @classmethod
+    def build_business_logic_request(cls, document: PromptDocument,
+                                     budget: int = PROMPT_TOKEN_BUDGET) -> Tuple[str, CompactionReport]:
         """
-        将业务逻辑分析信息填入AI请求模板
+        生成业务逻辑分析阶段的AI请求内容，并压缩到token预算以内
+        
+        超出预算时依次：数组只保留一个元素、请求报文截断到预算的四分之一、截断响应报文
         
         Args:
-            business_info: 包含接口名称、请求体、响应结构的字典
+            document: Prompt文档
+            budget: token预算
             
         Returns:
-            填充完成的业务逻辑分析AI请求内容
+            (AI请求内容, 压缩记录)
         """
-        template = PromptService.get_business_logic_ai_request_template()
-        
-        # 替换模板中的占位符
-        filled_template = template.replace(
-            "# 接口名称\n\n\n",
-            f"# 接口名称\n\n{business_info['interface_name']}\n"
-        ).replace(
-            "# 请求报文样例\n\n\n",
-            f"# 请求报文样例\n\n{business_info['request_example']}\n"
-        ).replace(
-            "# 响应报文样例\n\n\n",
-            f"# 响应报文样例\n\n{business_info['response_example']}\n"
-        )
+        raw_content = cls.fill_business_logic_ai_request_template(cls.extract_business_logic_info(document))
         
-        return filled_template
+        def single_sample(info: Dict[str, str]) -> Dict[str, str]:
+            return cls.extract_business_logic_info(document, array_sample=1)
+        
+        def truncate_request(info: Dict[str, str]) -> Dict[str, str]:
+            info["request_example"] = truncate_to_tokens(info["request_example"], budget // 4)
+            return info
+        
+        return fit_to_budget(
+            "business_logic", raw_content, cls.extract_business_logic_info(document, PROMPT_ARRAY_SAMPLE),
+            cls.fill_business_logic_ai_request_template,
+            [("array_sample:1", single_sample), ("truncate:request_example", truncate_request)],
+            truncate_key="response_example", budget=budget
+        )
     
     @staticmethod
-    def inject_business_logic_into_prompt(original_prompt: str, business_logic: str) -> str:
+    def fill_ai_request_template(prompt_info: Dict[str, str]) -> str:
         """
-        将AI返回的业务逻辑注入到原始prompt中的业务逻辑一级标题下
+        将prompt信息填入AI请求模板
         
         Args:
-            original_prompt: 原始prompt内容
-            business_logic: AI返回的业务逻辑描述
+            prompt_info: 包含接口信息的字典（interface_name、database_tables、response_table、candidate_columns_block）
             
         Returns:
-            注入业务逻辑后的prompt内容
+            填充完成的AI请求内容
         """
-        lines = original_prompt.split('\n')
-        result_lines = []
-        i = 0
-        
-        while i < len(lines):
-            line = lines[i]
-            result_lines.append(line)
-            
-            # 在找到"# 业务逻辑"这一行后，添加业务逻辑内容
-            if line.strip() == "# 业务逻辑":
-                result_lines.append("")
-                result_lines.append(business_logic.strip())
-                result_lines.append("")
-                
-                # 跳过原来业务逻辑部分的空行，找到下一个一级标题
-                i += 1
-                while i < len(lines):
-                    next_line = lines[i]
-                    if next_line.startswith("# "):
-                        # 遇到下一个一级标题，停止跳过，不要将这行加入结果
-                        break
-                    elif next_line.strip() != "":
-                        # 遇到非空行且不是一级标题，停止跳过，不要将这行加入结果
-                        break
-                    # 跳过空行
-                    i += 1
-                
-                # 跳出当前处理，继续外层循环处理剩余行
-                continue
-            
-            i += 1
-        
-        return '\n'.join(result_lines)
+        return get_template_registry().render(TEMPLATE_AI_REQUEST, prompt_info)
     
     @staticmethod
-    def replace_response_table_in_prompt(original_prompt: str, new_response_table: str) -> str:
+    def fill_business_logic_ai_request_template(business_info: Dict[str, str]) -> str:
         """
-        将AI返回的响应参数表替换到原始prompt中
+        将业务逻辑分析信息填入AI请求模板
         
         Args:
-            original_prompt: 原始prompt内容
-            new_response_table: AI返回的新响应参数表
+            business_info: 包含接口名称、请求体、响应结构的字典
             
         Returns:
-            替换后的prompt内容
-        """
-        lines = original_prompt.split('\n')
-        result_lines = []
-        in_response_table = False
-        
-        for line in lines:
-            if line.startswith('**响应参数：**'):
-                result_lines.append(line)
-                result_lines.append('')
-                result_lines.append(new_response_table.strip())
-                in_response_table = True
-                continue
-            elif in_response_table and line.startswith('**'):
-                in_response_table = False
-                result_lines.append('')
-                result_lines.append(line)
-            elif not in_response_table:
-                result_lines.append(line)
-        
-        return '\n'.join(result_lines)
+            填充完成的业务逻辑分析AI请求内容
+        """
+        return get_template_registry().render(TEMPLATE_BUSINESS_LOGIC_REQUEST, business_info)
     
     @staticmethod
-    def log_chat_interaction(request_content: str, response_content: str, user_id: int = None):
+    def log_chat_interaction(
+        request_content: str,
+        response_content: str,
+        user_id: int = None,
+        stage: str = None,
+        call_result: Dict = None
+    ):
         """
-        记录AI聊天交互到chat.log文件
+        记录AI聊天交互到chat.log文件及结构化聊天记录存储
+        
+        日志记录放入后台写入队列，不阻塞调用方
         
         Args:
             request_content: AI请求内容
             response_content: AI响应内容
             user_id: 用户ID（可选）
-        """
-        try:
-            # 确保logs目录存在
-            logs_dir = "logs"
-            if not os.path.exists(logs_dir):
-                os.makedirs(logs_dir)
-            
-            log_file = os.path.join(logs_dir, "chat.log")
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            
-            log_entry = f"""
-==================== AI Chat Log ====================
-时间: {timestamp}
-用户ID: {user_id if user_id else 'Unknown'}
-
---- AI 请求内容 ---
-{request_content}
-
---- AI 响应内容 ---
-{response_content}
-
-================================================
-
-"""
-            
-            with open(log_file, "a", encoding="utf-8") as f:
-                f.write(log_entry)
-                
-        except Exception as e:
-            print(f"记录chat.log时出错: {str(e)}")
+            stage: 流水线阶段（可选）
+            call_result: AI调用结果（可选，提供延迟、token用量、状态码等信息）
+        """
+        record = {
+            "timestamp": time.time(),
+            "user_id": user_id,
+            "stage": stage,
+            "request": request_content,
+            "response": response_content
+        }
+        if call_result:
+            record.update({
+                "latency": call_result.get("latency"),
+                "ttfb": call_result.get("ttfb"),
+                "prompt_tokens": call_result.get("prompt_tokens"),
+                "completion_tokens": call_result.get("completion_tokens"),
+                "status": call_result.get("status_code"),
+                "model": call_result.get("model"),
+                "profile": call_result.get("profile")
+            })
+        get_chat_log_writer().enqueue(record)
@@ -0,0 +1,141 @@
+"""
+Prompt模板引擎模块
+从 prompt_templates/ 目录加载模板文件，一次性编译为“文本片段 + 命名槽位”列表，
+渲染时只做一次拼接；模板文件修改后自动重新加载，无需重启服务
+"""
+
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# 模板配置
+PROMPT_TEMPLATE_DIR = os.getenv(
+    "PROMPT_TEMPLATE_DIR",
+    str(Path(__file__).resolve().parent.parent.parent / "prompt_templates")
+)
+# 两次检查模板文件修改时间之间的最小间隔（秒），0表示每次渲染都检查
+PROMPT_TEMPLATE_RELOAD_SECONDS = float(os.getenv("PROMPT_TEMPLATE_RELOAD_SECONDS", "2"))
+
+# 模板名称
+TEMPLATE_AI_REQUEST = "ai_request"
+TEMPLATE_BUSINESS_LOGIC_REQUEST = "business_logic_request"
+TEMPLATE_PROMPT_HEADER = "prompt_header"
+TEMPLATE_API_SECTION = "api_section"
+
+# 槽位语法：{{ name }}
+_SLOT_PATTERN = re.compile(r"\{\{\s*([A-Za-z_][A-Za-z0-9_]*)\s*\}\}")
+
+
+class CompiledTemplate:
+    """编译后的模板"""
+
+    __slots__ = ("name", "source", "version", "_literals", "_slots")
+
+    def __init__(self, name: str, source: str, version: int = 1):
+        self.name = name
+        self.source = source
+        self.version = version
+        parts = _SLOT_PATTERN.split(source)
+        # 片段与槽位交替出现：literals 比 slots 多一个
+        self._literals: List[str] = parts[0::2]
+        self._slots: List[str] = parts[1::2]
+
+    @property
+    def slots(self) -> List[str]:
+        """模板中的槽位名称（按出现顺序）"""
+        return list(self._slots)
+
+    def render(self, values: Dict[str, str]) -> str:
+        """
+        渲染模板
+
+        Args:
+            values: 槽位取值，缺少的槽位渲染为空字符串
+
+        Returns:
+            渲染结果
+        """
+        if not self._slots:
+            return self._literals[0]
+        parts = [""] * (len(self._literals) + len(self._slots))
+        parts[0::2] = self._literals
+        parts[1::2] = [values.get(slot, "") for slot in self._slots]
+        return "".join(parts)
+
+
+class TemplateRegistry:
+    """模板注册表：按名称加载和缓存编译后的模板，并按修改时间热加载"""
+
+    def __init__(self, template_dir: str = PROMPT_TEMPLATE_DIR,
+                 reload_interval: float = PROMPT_TEMPLATE_RELOAD_SECONDS):
+        self.template_dir = Path(template_dir)
+        self.reload_interval = reload_interval
+        self._templates: Dict[str, CompiledTemplate] = {}
+        self._mtimes: Dict[str, float] = {}
+        self._checked: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, name: str) -> Path:
+        return self.template_dir / f"{name}.md"
+
+    @staticmethod
+    def _read(path: Path) -> str:
+        with open(path, "r", encoding="utf-8") as f:
+            source = f.read()
+        # 忽略文件末尾的单个换行符，方便编辑器保存
+        return source[:-1] if source.endswith("\n") else source
+
+    def get(self, name: str) -> CompiledTemplate:
+        """
+        获取编译后的模板，文件有修改时重新编译
+
+        Args:
+            name: 模板名称（不含扩展名）
+
+        Returns:
+            编译后的模板
+        """
+        template = self._templates.get(name)
+        now = time.monotonic()
+        if template is not None and now - self._checked.get(name, 0.0) < self.reload_interval:
+            return template
+
+        with self._lock:
+            template = self._templates.get(name)
+            self._checked[name] = now
+            path = self._path(name)
+            try:
+                mtime = path.stat().st_mtime
+            except FileNotFoundError:
+                if template is None:
+                    raise
+                # 文件被移走时继续使用已加载的版本
+                print(f"Prompt模板文件不存在，继续使用已加载版本: {path}")
+                return template
+
+            if template is None or mtime != self._mtimes.get(name):
+                version = template.version + 1 if template is not None else 1
+                template = CompiledTemplate(name, self._read(path), version)
+                self._templates[name] = template
+                self._mtimes[name] = mtime
+                if version > 1:
+                    print(f"Prompt模板已重新加载: {name}（版本 {version}）")
+            return template
+
+    def render(self, name: str, values: Optional[Dict[str, str]] = None) -> str:
+        """按名称渲染模板"""
+        return self.get(name).render(values or {})
+
+
+# 延迟初始化的全局注册表实例
+_registry_instance = None
+
+def get_template_registry() -> TemplateRegistry:
+    """获取Prompt模板注册表实例（单例模式）"""
+    global _registry_instance
+    if _registry_instance is None:
+        _registry_instance = TemplateRegistry()
+    return _registry_instance
@@ -0,0 +1,150 @@
+"""
+Prompt渲染卸载模块
+路由是 async def，字段解析、参数表构建和JSON压缩都是CPU密集的同步计算；
+报文较大的请求放到有并发上限的线程池中执行，避免阻塞事件循环（包括健康检查），
+较小的请求仍在事件循环中直接执行，省去线程切换的开销。统计卸载次数和排队等待时间
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from app.models import PromptRequest
+
+# 卸载配置
+# 请求中报文和DDL的总字符数达到该值时卸载到线程池
+RENDER_OFFLOAD_MIN_BYTES = int(os.getenv("RENDER_OFFLOAD_MIN_BYTES", str(256 * 1024)))
+# 报文中的字段数（按JSON键估算）达到该值时卸载到线程池
+RENDER_OFFLOAD_MIN_FIELDS = int(os.getenv("RENDER_OFFLOAD_MIN_FIELDS", "2000"))
+# 线程池大小，即同时执行的卸载渲染数上限
+RENDER_OFFLOAD_WORKERS = int(os.getenv("RENDER_OFFLOAD_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+T = TypeVar("T")
+
+
+def estimate_request_size(prompt_data: PromptRequest) -> Dict[str, int]:
+    """
+    估算请求的渲染开销
+
+    Returns:
+        {"bytes": 报文和DDL的总字符数, "fields": 报文中的JSON键数（按 ": 出现次数估算）}
+    """
+    size = fields = 0
+    for api in prompt_data.apis:
+        for example in (api.request_example, api.response_example):
+            size += len(example)
+            fields += example.count('":')
+        size += sum(len(ddl) for ddl in api.database_tables)
+    return {"bytes": size, "fields": fields}
+
+
+class RenderOffloader:
+    """按请求大小决定在事件循环中直接渲染还是卸载到线程池"""
+
+    def __init__(self, workers: int = RENDER_OFFLOAD_WORKERS, min_bytes: int = RENDER_OFFLOAD_MIN_BYTES,
+                 min_fields: int = RENDER_OFFLOAD_MIN_FIELDS):
+        self.workers = max(1, workers)
+        self.min_bytes = min_bytes
+        self.min_fields = min_fields
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._stats = {
+            "inline": 0, "offloaded": 0, "in_flight": 0, "max_in_flight": 0,
+            "inline_ms_total": 0.0, "inline_ms_max": 0.0,
+            "wait_ms_total": 0.0, "wait_ms_max": 0.0, "run_ms_total": 0.0, "run_ms_max": 0.0
+        }
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="prompt-render")
+        return self._executor
+
+    def should_offload(self, prompt_data: PromptRequest) -> bool:
+        """请求是否大到需要卸载到线程池"""
+        size = estimate_request_size(prompt_data)
+        return size["bytes"] >= self.min_bytes or size["fields"] >= self.min_fields
+
+    def _record(self, prefix: str, elapsed_ms: float):
+        self._stats[f"{prefix}_ms_total"] += elapsed_ms
+        self._stats[f"{prefix}_ms_max"] = max(self._stats[f"{prefix}_ms_max"], elapsed_ms)
+
+    async def run(self, offload: bool, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """
+        执行渲染函数：小请求直接执行，大请求在线程池中执行
+
+        Args:
+            offload: 是否卸载到线程池（由 should_offload 判断，同一请求的多次渲染只需判断一次）
+            func: 渲染函数（须线程安全）
+            *args, **kwargs: 渲染函数的参数
+
+        Returns:
+            渲染函数的返回值
+        """
+        if not offload:
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._stats["inline"] += 1
+                    self._record("inline", (time.perf_counter() - started) * 1000)
+
+        submitted = time.perf_counter()
+
+        def call() -> T:
+            started = time.perf_counter()
+            with self._lock:
+                self._record("wait", (started - submitted) * 1000)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._record("run", (time.perf_counter() - started) * 1000)
+
+        with self._lock:
+            self._stats["offloaded"] += 1
+            self._stats["in_flight"] += 1
+            self._stats["max_in_flight"] = max(self._stats["max_in_flight"], self._stats["in_flight"])
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), call)
+        finally:
+            with self._lock:
+                self._stats["in_flight"] -= 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """卸载次数、排队等待和执行耗时（毫秒）"""
+        with self._lock:
+            stats = dict(self._stats)
+        for key, count in (("inline", stats["inline"]), ("wait", stats["offloaded"]), ("run", stats["offloaded"])):
+            stats[f"{key}_ms_avg"] = round(stats[f"{key}_ms_total"] / count, 3) if count else 0.0
+        for key in list(stats):
+            if key.endswith("_ms_total") or key.endswith("_ms_max"):
+                stats[key] = round(stats[key], 3)
+        stats.update(workers=self.workers, min_bytes=self.min_bytes, min_fields=self.min_fields)
+        return stats
+
+    def shutdown(self):
+        """关闭线程池"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# 延迟初始化的全局渲染卸载器实例
+_offloader_instance = None
+
+def get_render_offloader() -> RenderOffloader:
+    """获取渲染卸载器实例（单例模式）"""
+    global _offloader_instance
+    if _offloader_instance is None:
+        _offloader_instance = RenderOffloader()
+    return _offloader_instance
+
+
+def shutdown_render_offloader():
+    """关闭渲染卸载器的线程池（应用关闭时调用）"""
+    if _offloader_instance is not None:
+        _offloader_instance.shutdown()
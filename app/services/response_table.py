@@ -0,0 +1,128 @@
+"""
+响应参数表解析模块
+把AI返回的markdown响应参数表解析为结构化的行，并对照本地提取的字段列表校验，
+找出缺失或格式不正确的字段，供流水线只针对这些字段重新请求
+"""
+
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Set, Tuple
+
+# 响应参数表的列数：响应报文字段 | 主数据库源 | 关联数据源 | 逻辑描述
+RESPONSE_TABLE_COLUMNS = 4
+# 表示未填写的取值
+PLACEHOLDER_VALUES = {"", "待填写", "待补充", "TODO", "todo", "?", "？"}
+
+_CODE_FENCE = re.compile(r"^\s*```[\w-]*\s*$")
+_HEADER_NAMES = {"响应报文字段", "字段", "字段名"}
+
+# 响应字段键：(接口下标, 字段名)，不同接口的同名字段分别填写、分别校验
+FieldKey = Tuple[int, str]
+
+
+class ResponseTableRow:
+    """响应参数表的一行"""
+
+    __slots__ = ("name", "source", "related", "description")
+
+    def __init__(self, name: str, source: str, related: str, description: str):
+        self.name = name
+        self.source = source
+        self.related = related
+        self.description = description
+
+    def to_markdown(self) -> str:
+        """表格行（含换行符）"""
+        return f"| {self.name} | {self.source} | {self.related} | {self.description} |\n"
+
+
+class ParsedResponseTable:
+    """AI返回内容的解析结果"""
+
+    __slots__ = ("rows", "malformed", "unexpected")
+
+    def __init__(self):
+        # 字段键 -> 有效的行
+        self.rows: Dict[FieldKey, ResponseTableRow] = {}
+        # 行存在但列数不对或主数据库源未填写的字段
+        self.malformed: Set[FieldKey] = set()
+        # 不在期望字段列表中的字段名
+        self.unexpected: List[str] = []
+
+    def missing(self, expected: Iterable[FieldKey]) -> List[FieldKey]:
+        """期望字段中没有有效行的字段（保持原顺序）"""
+        return [key for key in expected if key not in self.rows]
+
+
+def field_labels(keys: Iterable[FieldKey]) -> Dict[FieldKey, str]:
+    """
+    AI请求中各字段的名称：字段名只属于一个接口时直接使用，
+    多个接口有同名字段时加上接口序号，AI按名称返回的行才能对应到各自的接口
+
+    Args:
+        keys: 字段键列表
+
+    Returns:
+        字段键 -> 名称
+    """
+    keys = list(keys)
+    counts = Counter(name for _, name in keys)
+    return {
+        (index, name): name if counts[name] == 1 else f"{name}（接口{index + 1}）"
+        for index, name in keys
+    }
+
+
+def _clean_cell(cell: str) -> str:
+    """去掉单元格两端的空白和加粗/代码标记"""
+    cell = cell.strip()
+    for mark in ("**", "`"):
+        if len(cell) > 2 * len(mark) and cell.startswith(mark) and cell.endswith(mark):
+            cell = cell[len(mark):-len(mark)].strip()
+    return cell
+
+
+def _split_row(line: str) -> List[str]:
+    """按未转义的竖线切分表格行"""
+    body = line.strip()
+    if body.startswith("|"):
+        body = body[1:]
+    if body.endswith("|") and not body.endswith("\\|"):
+        body = body[:-1]
+    return [_clean_cell(cell) for cell in re.split(r"(?<!\\)\|", body)]
+
+
+def parse_response_table(text: str, expected: Dict[str, FieldKey]) -> ParsedResponseTable:
+    """
+    解析AI返回的响应参数表
+
+    忽略代码块标记、表头、分隔行和表格外的说明文字；同一字段出现多次时取第一条有效的行
+
+    Args:
+        text: AI返回的内容
+        expected: 期望的字段：AI请求中的字段名称（见 field_labels）-> 字段键
+
+    Returns:
+        解析结果（行中的字段名为原字段名）
+    """
+    parsed = ParsedResponseTable()
+    for line in text.splitlines():
+        if _CODE_FENCE.match(line) or not line.strip().startswith("|"):
+            continue
+        cells = _split_row(line)
+        name = cells[0] if cells else ""
+        if not name or name in _HEADER_NAMES or set(name) <= set("-: "):
+            continue
+        key = expected.get(name)
+        if key is None:
+            parsed.unexpected.append(name)
+            continue
+        if key in parsed.rows:
+            continue
+
+        if len(cells) != RESPONSE_TABLE_COLUMNS or cells[1] in PLACEHOLDER_VALUES:
+            parsed.malformed.add(key)
+            continue
+        parsed.rows[key] = ResponseTableRow(key[1], cells[1], cells[2] or "-", cells[3])
+        parsed.malformed.discard(key)
+    return parsed
@@ -0,0 +1,157 @@
+"""
+接口渲染结果缓存模块
+以接口信息的内容哈希为键，缓存解析出的字段和渲染好的接口部分，
+未修改的接口只需计算一次哈希和一次查找；按总字节数做LRU淘汰，并统计命中率
+"""
+
+import hashlib
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Any, List, Optional
+
+from app.models import ApiInfo
+from app.services.json_fields import FieldRecord
+
+# 缓存配置
+SECTION_CACHE_MAX_BYTES = int(os.getenv("SECTION_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# 每条字段记录除字符串外的对象开销估算
+_FIELD_OVERHEAD_BYTES = 120
+
+
+def hash_api(api: ApiInfo) -> str:
+    """计算接口信息的内容哈希（各部分带长度前缀，避免拼接歧义）"""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (api.name, api.route, api.request_example, api.response_example, *api.database_tables):
+        data = part.encode("utf-8")
+        digest.update(len(data).to_bytes(8, "little"))
+        digest.update(data)
+    digest.update(len(api.database_tables).to_bytes(8, "little"))
+    return digest.hexdigest()
+
+
+class RenderedApi:
+    """单个接口的解析与渲染结果（缓存共享，调用方不应修改）"""
+
+    __slots__ = ("request_fields", "response_fields", "request_table", "response_table",
+                 "database_tables_text", "section", "column_sources", "unresolved_fields", "size")
+
+    def __init__(
+        self,
+        request_fields: List[FieldRecord],
+        response_fields: List[FieldRecord],
+        request_table: str,
+        response_table: str,
+        database_tables_text: str,
+        section: str,
+        column_sources: Optional[Dict[str, str]] = None,
+        unresolved_fields: Optional[List[FieldRecord]] = None
+    ):
+        self.request_fields = request_fields
+        self.response_fields = response_fields
+        self.request_table = request_table
+        self.response_table = response_table
+        self.database_tables_text = database_tables_text
+        self.section = section
+        # 本地DDL预匹配结果：字段名 -> 表名.字段名
+        self.column_sources = column_sources or {}
+        self.unresolved_fields = response_fields if unresolved_fields is None else unresolved_fields
+        self.size = self._estimate_size()
+
+    def _estimate_size(self) -> int:
+        """估算占用的内存字节数"""
+        size = sys.getsizeof(self.request_table) + sys.getsizeof(self.response_table) + \
+            sys.getsizeof(self.database_tables_text) + sys.getsizeof(self.section)
+        for field in self.request_fields + self.response_fields:
+            size += _FIELD_OVERHEAD_BYTES + sys.getsizeof(field.name) + sys.getsizeof(field.type)
+        for source in self.column_sources.values():
+            size += _FIELD_OVERHEAD_BYTES + sys.getsizeof(source)
+        return size
+
+
+class SectionCache:
+    """按字节数淘汰的LRU缓存"""
+
+    def __init__(self, max_bytes: int = SECTION_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, RenderedApi]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "oversized": 0}
+
+    def get(self, key: str) -> Optional[RenderedApi]:
+        """查找缓存项，命中时移到最近使用的位置"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry
+
+    def put(self, key: str, entry: RenderedApi):
+        """写入缓存项，超出容量时淘汰最久未使用的项"""
+        if entry.size > self.max_bytes:
+            # 单项超过总容量时不缓存
+            self.stats["oversized"] += 1
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old.size
+            self._entries[key] = entry
+            self._bytes += entry.size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+                self.stats["evictions"] += 1
+
+    def get_or_render(self, api: ApiInfo, render: Callable[[ApiInfo], RenderedApi], salt: str = "") -> RenderedApi:
+        """
+        获取接口的渲染结果，未命中时渲染并写入缓存
+
+        Args:
+            api: 接口信息
+            render: 渲染函数
+            salt: 附加到键上的版本标识（如模板版本）
+
+        Returns:
+            渲染结果
+        """
+        key = hash_api(api) + salt
+        entry = self.get(key)
+        if entry is None:
+            entry = render(api)
+            self.put(key, entry)
+        return entry
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """缓存统计"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+        stats["max_bytes"] = self.max_bytes
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+# 延迟初始化的全局缓存实例
+_cache_instance = None
+
+def get_section_cache() -> SectionCache:
+    """获取接口渲染结果缓存实例（单例模式）"""
+    global _cache_instance
+    if _cache_instance is None:
+        _cache_instance = SectionCache()
+    return _cache_instance
@@ -0,0 +1,329 @@
+"""
+AI调用用量统计模块
+按 用户 × 模型 × 流水线阶段 × 日期 聚合每次上游调用的token用量、延迟、首字节时间、
+状态码和路由结果（首选/故障转移/降级档案），以及流水线回退到基础版本的次数，
+内存中累积增量并定期合并写入紧凑的JSON文件
+"""
+
+import asyncio
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+# 统计配置
+USAGE_FLUSH_INTERVAL_SECONDS = float(os.getenv("USAGE_FLUSH_INTERVAL_SECONDS", "60"))
+
+# 调用结果来源
+# 按路由顺序首选的健康档案
+OUTCOME_UPSTREAM = "upstream"
+# 之前的档案调用失败后故障转移到的健康档案
+OUTCOME_FAILOVER = "failover"
+# 处于降级冷却期的档案（没有其他可用档案时仍会尝试）
+OUTCOME_DEGRADED = "degraded"
+# 流水线回退到基础版本（只计入结果来源，不计为一次调用）
+OUTCOME_FALLBACK = "fallback"
+
+# 延迟直方图的桶上界（秒），用于估算百分位
+LATENCY_BUCKETS = (0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, float("inf"))
+
+UsageKey = Tuple[str, int, str, str]
+
+
+class UsageAggregate:
+    """一组调用的累计统计"""
+
+    __slots__ = ("calls", "errors", "prompt_tokens", "completion_tokens",
+                 "latency_sum", "latency_max", "ttfb_sum", "ttfb_count",
+                 "buckets", "statuses", "outcomes")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.ttfb_sum = 0.0
+        self.ttfb_count = 0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.statuses: Dict[str, int] = {}
+        self.outcomes: Dict[str, int] = {}
+
+    def add(self, success: bool, prompt_tokens: int, completion_tokens: int, latency: float,
+            ttfb: Optional[float], status: str, outcome: str):
+        """累加一次调用"""
+        self.calls += 1
+        if not success:
+            self.errors += 1
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.latency_sum += latency
+        self.latency_max = max(self.latency_max, latency)
+        if ttfb is not None:
+            self.ttfb_sum += ttfb
+            self.ttfb_count += 1
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if latency <= bound:
+                self.buckets[i] += 1
+                break
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.add_outcome(outcome)
+
+    def add_outcome(self, outcome: str):
+        """只累加结果来源（不对应一次上游调用，如回退到基础版本）"""
+        self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+
+    def merge(self, other: "UsageAggregate"):
+        """合并另一组统计"""
+        self.calls += other.calls
+        self.errors += other.errors
+        self.prompt_tokens += other.prompt_tokens
+        self.completion_tokens += other.completion_tokens
+        self.latency_sum += other.latency_sum
+        self.latency_max = max(self.latency_max, other.latency_max)
+        self.ttfb_sum += other.ttfb_sum
+        self.ttfb_count += other.ttfb_count
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+        for status, count in other.statuses.items():
+            self.statuses[status] = self.statuses.get(status, 0) + count
+        for outcome, count in other.outcomes.items():
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + count
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """根据直方图估算延迟百分位（返回所在桶的上界）"""
+        if not self.calls:
+            return None
+        target = self.calls * pct / 100
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.buckets):
+            seen += count
+            if seen >= target:
+                return round(min(bound, self.latency_max), 3)
+        return round(self.latency_max, 3)
+
+    def to_record(self) -> Dict[str, Any]:
+        """序列化为紧凑的存储格式"""
+        return {
+            "n": self.calls, "e": self.errors,
+            "pt": self.prompt_tokens, "ct": self.completion_tokens,
+            "ls": round(self.latency_sum, 4), "lm": round(self.latency_max, 4),
+            "ts": round(self.ttfb_sum, 4), "tn": self.ttfb_count,
+            "b": self.buckets, "s": self.statuses, "o": self.outcomes
+        }
+
+    @classmethod
+    def from_record(cls, record: Dict[str, Any]) -> "UsageAggregate":
+        """从存储格式反序列化"""
+        aggregate = cls()
+        aggregate.calls = record.get("n", 0)
+        aggregate.errors = record.get("e", 0)
+        aggregate.prompt_tokens = record.get("pt", 0)
+        aggregate.completion_tokens = record.get("ct", 0)
+        aggregate.latency_sum = record.get("ls", 0.0)
+        aggregate.latency_max = record.get("lm", 0.0)
+        aggregate.ttfb_sum = record.get("ts", 0.0)
+        aggregate.ttfb_count = record.get("tn", 0)
+        buckets = record.get("b") or []
+        if len(buckets) == len(LATENCY_BUCKETS):
+            aggregate.buckets = list(buckets)
+        aggregate.statuses = dict(record.get("s", {}))
+        aggregate.outcomes = dict(record.get("o", {}))
+        return aggregate
+
+    def summary(self) -> Dict[str, Any]:
+        """可读的统计摘要"""
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "error_rate": round(self.errors / self.calls, 4) if self.calls else 0.0,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.prompt_tokens + self.completion_tokens,
+            "avg_latency": round(self.latency_sum / self.calls, 3) if self.calls else None,
+            "p50_latency": self.percentile(50),
+            "p95_latency": self.percentile(95),
+            "max_latency": round(self.latency_max, 3),
+            "avg_ttfb": round(self.ttfb_sum / self.ttfb_count, 3) if self.ttfb_count else None,
+            "statuses": self.statuses,
+            "outcomes": self.outcomes
+        }
+
+
+class UsageTracker:
+    """用量统计器：内存中累积增量，定期合并到磁盘"""
+
+    GROUP_FIELDS = {"day": 0, "user": 1, "model": 2, "stage": 3}
+
+    def __init__(self, storage_dir: str = "data"):
+        self.storage_file = Path(storage_dir) / "usage_stats.json"
+        self._pending: Dict[UsageKey, UsageAggregate] = {}
+        self._lock = threading.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def record(
+        self,
+        user_id: int,
+        model: Optional[str],
+        stage: str,
+        success: bool,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        latency: float = 0.0,
+        ttfb: Optional[float] = None,
+        status_code: Optional[int] = None,
+        outcome: str = OUTCOME_UPSTREAM
+    ):
+        """
+        记录一次AI调用
+
+        Args:
+            user_id: 用户ID
+            model: 模型名称
+            stage: 流水线阶段
+            success: 是否成功
+            prompt_tokens: 输入token数
+            completion_tokens: 输出token数
+            latency: 总耗时（秒）
+            ttfb: 首字节时间（秒）
+            status_code: HTTP状态码，连接失败时为None
+            outcome: 结果来源（首选档案/故障转移/降级档案）
+        """
+        status = str(status_code) if status_code is not None else "error"
+        with self._lock:
+            self._aggregate(user_id, model, stage).add(
+                success, prompt_tokens, completion_tokens, latency, ttfb, status, outcome
+            )
+
+    def record_fallback(self, user_id: int, stage: str, model: Optional[str] = None):
+        """
+        记录一次流水线回退到基础版本（计入结果来源 fallback，不增加调用次数）
+
+        Args:
+            user_id: 用户ID
+            stage: 回退发生的流水线阶段
+            model: 模型名称（回退不针对单个模型时为空）
+        """
+        with self._lock:
+            self._aggregate(user_id, model, stage).add_outcome(OUTCOME_FALLBACK)
+
+    def _aggregate(self, user_id: int, model: Optional[str], stage: str) -> UsageAggregate:
+        """当天对应分组的增量（调用方持有锁）"""
+        key = (datetime.now().strftime("%Y-%m-%d"), user_id, model or "unknown", stage)
+        aggregate = self._pending.get(key)
+        if aggregate is None:
+            aggregate = self._pending[key] = UsageAggregate()
+        return aggregate
+
+    def _load(self) -> Dict[UsageKey, UsageAggregate]:
+        """加载磁盘上的累计统计"""
+        try:
+            with open(self.storage_file, "r", encoding="utf-8") as f:
+                rows = json.load(f).get("rows", {})
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+        result = {}
+        for raw_key, record in rows.items():
+            day, user_id, model, stage = raw_key.split("|", 3)
+            result[(day, int(user_id), model, stage)] = UsageAggregate.from_record(record)
+        return result
+
+    def flush(self):
+        """将内存中的增量合并写入磁盘（原子替换）"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+
+        try:
+            totals = self._load()
+            for key, aggregate in pending.items():
+                if key in totals:
+                    totals[key].merge(aggregate)
+                else:
+                    totals[key] = aggregate
+
+            self.storage_file.parent.mkdir(parents=True, exist_ok=True)
+            rows = {"|".join(str(part) for part in key): agg.to_record() for key, agg in totals.items()}
+            tmp_file = self.storage_file.with_suffix(".tmp")
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump({"version": 1, "rows": rows}, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp_file, self.storage_file)
+        except Exception as e:
+            print(f"写入用量统计时出错: {str(e)}")
+            # 写入失败时把增量放回，等待下次重试
+            with self._lock:
+                for key, aggregate in pending.items():
+                    if key in self._pending:
+                        self._pending[key].merge(aggregate)
+                    else:
+                        self._pending[key] = aggregate
+
+    def query(self, user_id: int, group_by: List[str], days: int = 7) -> List[Dict[str, Any]]:
+        """
+        查询用户的用量统计（包含尚未写入磁盘的增量）；需读取统计文件，在异步代码中通过线程调用
+
+        Args:
+            user_id: 用户ID
+            group_by: 分组维度（day、model、stage 的组合）
+            days: 统计最近多少天
+
+        Returns:
+            按分组维度聚合的统计列表
+        """
+        since = (datetime.now() - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+        totals = self._load()
+        with self._lock:
+            pending = list(self._pending.items())
+        sources = list(totals.items()) + pending
+
+        groups: Dict[Tuple, UsageAggregate] = {}
+        for key, aggregate in sources:
+            if key[1] != user_id or key[0] < since:
+                continue
+            group_key = tuple(key[self.GROUP_FIELDS[field]] for field in group_by)
+            if group_key not in groups:
+                groups[group_key] = UsageAggregate()
+            groups[group_key].merge(aggregate)
+
+        result = []
+        for group_key in sorted(groups):
+            entry = dict(zip(group_by, group_key))
+            entry.update(groups[group_key].summary())
+            result.append(entry)
+        return result
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(USAGE_FLUSH_INTERVAL_SECONDS)
+            await asyncio.to_thread(self.flush)
+
+    def start(self):
+        """启动定期写盘任务"""
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    async def stop(self):
+        """停止定期写盘任务并写入剩余增量"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await asyncio.to_thread(self.flush)
+
+
+# 延迟初始化的全局统计实例
+_tracker_instance = None
+
+def get_usage_tracker() -> UsageTracker:
+    """获取用量统计实例（单例模式）"""
+    global _tracker_instance
+    if _tracker_instance is None:
+        _tracker_instance = UsageTracker()
+    return _tracker_instance
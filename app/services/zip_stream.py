@@ -0,0 +1,156 @@
+"""
+ZIP流式打包模块
+边读取边生成ZIP归档（条目不压缩存储）：各条目的大小和CRC预先计算在清单中，
+归档的总大小和任意偏移处的内容都可以直接确定，因此可以逐条目流式输出并支持Range断点续传，
+整个归档不会保存在内存中
+"""
+
+import struct
+import time
+import zlib
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+# ZIP（非ZIP64）格式的上限
+ZIP_MAX_OFFSET = 0xFFFFFFFF
+ZIP_MAX_ENTRIES = 0xFFFF
+
+# 通用标志位：文件名为UTF-8编码
+_FLAG_UTF8 = 0x0800
+# 压缩方式：不压缩
+_METHOD_STORED = 0
+# 解压所需的版本（2.0）
+_VERSION = 20
+
+# 按键顺序读取条目内容的函数：参数为起始键，返回 (键, 内容) 迭代器
+ZipLoader = Callable[[Any], Iterator[Tuple[Any, bytes]]]
+
+
+class ZipTooLargeError(ValueError):
+    """归档超出ZIP格式的大小或条目数上限"""
+
+
+class ZipContentChangedError(RuntimeError):
+    """输出过程中条目内容与清单不一致（内容在生成清单后被修改）"""
+
+
+def dos_datetime(timestamp: float) -> Tuple[int, int]:
+    """把时间戳转换为ZIP使用的DOS时间和日期"""
+    t = time.localtime(max(timestamp, 315532800))
+    dos_time = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+    dos_date = ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+    return dos_time, dos_date
+
+
+class ZipEntry:
+    """清单中的一个条目"""
+
+    __slots__ = ("key", "name", "size", "crc", "dos_time", "dos_date", "offset")
+
+    def __init__(self, key: Any, name: str, size: int, crc: int, mtime: float, offset: int):
+        self.key = key
+        self.name = name.encode("utf-8")
+        self.size = size
+        self.crc = crc
+        self.dos_time, self.dos_date = dos_datetime(mtime)
+        self.offset = offset
+
+    def local_header(self) -> bytes:
+        return struct.pack(
+            "<IHHHHHIIIHH", 0x04034B50, _VERSION, _FLAG_UTF8, _METHOD_STORED, self.dos_time, self.dos_date,
+            self.crc, self.size, self.size, len(self.name), 0
+        ) + self.name
+
+    def central_header(self) -> bytes:
+        return struct.pack(
+            "<IHHHHHHIIIHHHHHII", 0x02014B50, _VERSION, _VERSION, _FLAG_UTF8, _METHOD_STORED,
+            self.dos_time, self.dos_date, self.crc, self.size, self.size, len(self.name), 0, 0, 0, 0, 0, self.offset
+        ) + self.name
+
+    @property
+    def header_size(self) -> int:
+        return 30 + len(self.name)
+
+
+class ZipManifest:
+    """ZIP归档清单：条目的名称、大小、CRC和偏移，以及中央目录"""
+
+    def __init__(self):
+        self.entries: List[ZipEntry] = []
+        self._offset = 0
+        self._central: Optional[bytes] = None
+
+    def add(self, key: Any, name: str, data: bytes, mtime: float):
+        """
+        添加条目（只保存大小和CRC，不保存内容）
+
+        Args:
+            key: 读取条目内容时使用的键（须与 ZipLoader 返回的顺序一致）
+            name: 归档中的文件名
+            data: 条目内容
+            mtime: 修改时间
+        """
+        entry = ZipEntry(key, name, len(data), zlib.crc32(data), mtime, self._offset)
+        self._offset += entry.header_size + entry.size
+        if self._offset > ZIP_MAX_OFFSET or len(self.entries) >= ZIP_MAX_ENTRIES:
+            raise ZipTooLargeError(f"导出内容超过ZIP格式上限（{ZIP_MAX_ENTRIES}个文件或4GB）")
+        self.entries.append(entry)
+
+    @property
+    def central_directory(self) -> bytes:
+        """中央目录和目录结束记录"""
+        if self._central is None:
+            directory = b"".join(entry.central_header() for entry in self.entries)
+            count = len(self.entries)
+            self._central = directory + struct.pack(
+                "<IHHHHIIH", 0x06054B50, 0, 0, count, count, len(directory), self._offset, 0
+            )
+        return self._central
+
+    @property
+    def size(self) -> int:
+        """归档总字节数"""
+        return self._offset + len(self.central_directory)
+
+    def iter_range(self, start: int, end: int, load: ZipLoader) -> Iterator[bytes]:
+        """
+        输出归档中 [start, end] 范围内的字节（含end）
+
+        只读取与范围相交的条目内容，逐条目输出
+
+        Args:
+            start: 起始偏移
+            end: 结束偏移（含）
+            load: 从指定键开始按顺序读取条目内容的函数
+
+        Raises:
+            ZipContentChangedError: 条目内容与清单不一致
+        """
+        stop = end + 1
+        selected = [
+            entry for entry in self.entries
+            if entry.offset < stop and entry.offset + entry.header_size + entry.size > start
+        ]
+        if selected:
+            contents = load(selected[0].key)
+            for entry in selected:
+                data = None
+                for key, content in contents:
+                    if key == entry.key:
+                        data = content
+                        break
+                if data is None or len(data) != entry.size or zlib.crc32(data) != entry.crc:
+                    raise ZipContentChangedError(f"条目 {entry.name.decode('utf-8')} 已变化，请重新下载")
+                yield from self._slice(entry.offset, entry.local_header(), start, stop)
+                yield from self._slice(entry.offset + entry.header_size, data, start, stop)
+
+        directory_offset = self._offset
+        if stop > directory_offset:
+            yield from self._slice(directory_offset, self.central_directory, start, stop)
+
+    @staticmethod
+    def _slice(offset: int, chunk: bytes, start: int, stop: int) -> Iterator[bytes]:
+        """截取 chunk（位于归档 offset 处）与 [start, stop) 相交的部分"""
+        begin = max(start - offset, 0)
+        finish = min(stop - offset, len(chunk))
+        if begin < finish:
+            yield chunk[begin:finish]
@@ -233,6 +233,120 @@ class JSONStorage:
         
         return None
 
+    
+    def get_user_ai_profiles_with_key(self, user_id: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        获取用户的全部AI服务配置档案（包含密钥，仅用于内部调用）
+        
+        Args:
+            user_id: 用户ID
+            
+        Returns:
+            配置档案列表，用户不存在时返回None
+        """
+        users = self._load_users()
+        
+        for user in users:
+            if user['id'] == user_id:
+                return user.get('ai_profiles', [])
+        
+        return None
+    
+    def add_user_ai_profile(self, user_id: int, profile: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        新增AI服务配置档案
+        
+        Args:
+            user_id: 用户ID
+            profile: 配置档案信息
+            
+        Returns:
+            新增的配置档案（包含分配的ID）
+        """
+        users = self._load_users()
+        
+        for i, user in enumerate(users):
+            if user['id'] == user_id:
+                profiles = user.setdefault('ai_profiles', [])
+                
+                if any(p['name'] == profile['name'] for p in profiles):
+                    raise ValueError("配置名称已存在")
+                
+                new_profile = dict(profile)
+                new_profile['id'] = max((p.get('id', 0) for p in profiles), default=0) + 1
+                new_profile['created_at'] = datetime.now().isoformat()
+                profiles.append(new_profile)
+                
+                user['updated_at'] = datetime.now().isoformat()
+                users[i] = user
+                
+                self._save_users(users)
+                return new_profile
+        
+        return None
+    
+    def update_user_ai_profile(self, user_id: int, profile_id: int, updates: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        更新AI服务配置档案
+        
+        Args:
+            user_id: 用户ID
+            profile_id: 配置档案ID
+            updates: 要更新的字段
+            
+        Returns:
+            更新后的配置档案
+        """
+        users = self._load_users()
+        
+        for i, user in enumerate(users):
+            if user['id'] == user_id:
+                profiles = user.get('ai_profiles', [])
+                for profile in profiles:
+                    if profile['id'] == profile_id:
+                        if 'name' in updates and updates['name'] != profile['name']:
+                            if any(p['name'] == updates['name'] for p in profiles if p['id'] != profile_id):
+                                raise ValueError("配置名称已存在")
+                        
+                        profile.update(updates)
+                        user['updated_at'] = datetime.now().isoformat()
+                        users[i] = user
+                        
+                        self._save_users(users)
+                        return profile
+                return None
+        
+        return None
+    
+    def delete_user_ai_profile(self, user_id: int, profile_id: int) -> bool:
+        """
+        删除AI服务配置档案
+        
+        Args:
+            user_id: 用户ID
+            profile_id: 配置档案ID
+            
+        Returns:
+            是否删除成功
+        """
+        users = self._load_users()
+        
+        for i, user in enumerate(users):
+            if user['id'] == user_id:
+                profiles = user.get('ai_profiles', [])
+                remaining = [p for p in profiles if p['id'] != profile_id]
+                if len(remaining) == len(profiles):
+                    return False
+                
+                user['ai_profiles'] = remaining
+                user['updated_at'] = datetime.now().isoformat()
+                users[i] = user
+                
+                self._save_users(users)
+                return True
+        
+        return False
+
 
 # 延迟初始化的全局存储实例
 _storage_instance = None
@@ -9,7 +9,14 @@ from dotenv import load_dotenv
 
 # 导入应用模块
 from app.models import HealthCheck, AppInfo
-from app.routers import prompt_generator, auth, ai_simple, menu
+from app.routers import prompt_generator, auth, ai_simple, menu, batch_translation
+from app.services.ai_client import close_http_clients
+from app.services.usage_service import get_usage_tracker
+from app.services.chat_log_writer import get_chat_log_writer
+from app.services.batch_render import shutdown_batch_renderer
+from app.services.render_offload import shutdown_render_offloader
+from app.services.batch_jobs import get_batch_job_queue
+from app.services.ai_jobs import get_ai_job_store
 
 # 加载环境变量
 load_dotenv()
@@ -37,6 +44,7 @@ app.include_router(menu.router)  # 主菜单路由，包含根路径
 app.include_router(auth.router)
 app.include_router(prompt_generator.router)
 app.include_router(ai_simple.router)
+app.include_router(batch_translation.router)
 
 # 基础路由已移至 menu.py
 
@@ -64,6 +72,15 @@ async def startup_event():
     # JSON存储会自动创建必要的文件和目录
     print("✅ JSON存储系统已初始化")
     
+    # 启动AI用量统计的定期写盘任务
+    get_usage_tracker().start()
+    
+    # 启动AI聊天日志的后台写入任务
+    get_chat_log_writer().start()
+    
+    # 启动批量转译任务的后台worker（继续执行上次中断的接口）
+    await get_batch_job_queue().start()
+    
     # 打印所有路由用于调试
     print("\n📋 注册的路由:")
     for route in app.routes:
@@ -71,6 +88,18 @@ async def startup_event():
             print(f"  {route.methods} {route.path}")
     print()
 
+# 应用关闭事件
+@app.on_event("shutdown")
+async def shutdown_event():
+    """应用关闭时释放资源"""
+    await get_batch_job_queue().stop()
+    await get_ai_job_store().shutdown()
+    await get_chat_log_writer().stop()
+    await get_usage_tracker().stop()
+    await close_http_clients()
+    shutdown_batch_renderer()
+    shutdown_render_offloader()
+
 # 启动应用
 if __name__ == "__main__":
     uvicorn.run(
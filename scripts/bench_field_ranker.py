@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+字段相似度排序基准测试
+随机生成大规模表结构和响应字段，测量候选数据库字段排序的耗时
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.services.ddl_parser import ColumnInfo  # noqa: E402
+from app.services.field_ranker import FieldRanker  # noqa: E402
+
+WORDS = [
+    "user", "order", "amount", "status", "time", "name", "code", "type", "price", "count",
+    "item", "shop", "address", "phone", "remark", "create", "update", "total", "pay", "refund"
+]
+
+
+def build_columns(count: int, rng: random.Random):
+    """生成 count 个数据库字段，分布在 count/50 张表中"""
+    tables = max(1, count // 50)
+    return [
+        ColumnInfo(f"t_{WORDS[i % len(WORDS)]}_{i % tables}", "_".join(rng.sample(WORDS, 3)), "varchar", "")
+        for i in range(count)
+    ]
+
+
+def build_fields(count: int, rng: random.Random):
+    return [f"data.list[0].{rng.choice(WORDS)}{rng.choice(WORDS).capitalize()}" for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="字段相似度排序基准测试")
+    parser.add_argument("--columns", type=int, nargs="+", default=[100, 1000, 5000], help="数据库字段数量")
+    parser.add_argument("--fields", type=int, default=200, help="响应字段数量")
+    parser.add_argument("--repeat", type=int, default=5, help="重复次数（取最短耗时）")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    fields = build_fields(args.fields, rng)
+    print(f"{'数据库字段数':>10} {'响应字段数':>10} {'首次(ms)':>10} {'最短(ms)':>10}")
+    for count in args.columns:
+        columns = build_columns(count, rng)
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            FieldRanker(columns).rank(fields)
+            timings.append((time.perf_counter() - started) * 1000)
+        print(f"{count:>10} {len(fields):>10} {timings[0]:>10.2f} {min(timings):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+字段记录微基准测试
+对比每个字段构建 Pydantic FieldInfo 模型与轻量 FieldRecord 在字段提取和生成参数表格上的耗时
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.models import FieldInfo  # noqa: E402
+from app.services.prompt_service import PromptService  # noqa: E402
+
+
+def build_example(field_count: int) -> str:
+    """生成包含约 field_count 个字段的响应报文（每10个字段一个嵌套对象）"""
+    data = {}
+    group = None
+    for i in range(field_count):
+        if i % 10 == 0:
+            group = data[f"group{i // 10}"] = {}
+        group[f"field{i}"] = i if i % 3 else f"value{i}"
+    return json.dumps(data)
+
+
+def legacy_parse(json_string: str) -> List[FieldInfo]:
+    """原有实现：每个字段构建一个 FieldInfo 模型"""
+    data = json.loads(json_string)
+    fields = []
+
+    def extract_fields(obj, prefix=""):
+        if isinstance(obj, dict):
+            for key, value in obj.items():
+                field_name = f"{prefix}.{key}" if prefix else key
+                if isinstance(value, dict):
+                    fields.append(FieldInfo(name=field_name, type="object", required="是", description="对象类型"))
+                    extract_fields(value, field_name)
+                elif isinstance(value, list):
+                    fields.append(FieldInfo(name=field_name, type="array", required="是", description="数组类型"))
+                    if value and isinstance(value[0], dict):
+                        extract_fields(value[0], f"{field_name}[0]")
+                else:
+                    field_type = type(value).__name__
+                    fields.append(FieldInfo(name=field_name, type=field_type, required="是",
+                                            description=f"{field_type}类型字段"))
+        elif isinstance(obj, list) and obj:
+            extract_fields(obj[0], prefix)
+
+    extract_fields(data)
+    return fields
+
+
+def legacy_tables(fields: List[FieldInfo]) -> str:
+    """原有实现：逐行拼接请求表和响应表"""
+    table = "| 参数 | 类型 | 必填 | 说明 |\n| ---- | ---- | ---- | ---- |\n"
+    for field in fields:
+        table += f"| {field.name} | {field.type} | {field.required} | {field.description} |\n"
+    response = "| 响应报文字段 | 主数据库源 | 关联数据源 | 逻辑描述 |\n| ------------ | ---------- | ---------- | -------- |\n"
+    for field in fields:
+        response += f"| {field.name} | 待填写 | 待填写 | {field.description} |\n"
+    return table + response
+
+
+def current_tables(fields) -> str:
+    return PromptService.generate_request_table(fields) + PromptService.generate_response_table(fields)
+
+
+def best_of(func: Callable[[], object], repeat: int) -> float:
+    """多次运行取最短耗时（秒）"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="字段记录微基准测试")
+    parser.add_argument("--fields", type=int, nargs="+", default=[100, 1000, 5000], help="字段数量")
+    parser.add_argument("--repeat", type=int, default=20, help="每项重复次数")
+    args = parser.parse_args()
+
+    print(f"{'字段数':>8} {'阶段':8} {'FieldInfo(ms)':>14} {'FieldRecord(ms)':>16} {'加速比':>8}")
+    for count in args.fields:
+        example = build_example(count)
+        legacy_fields = legacy_parse(example)
+        fields = PromptService.parse_json_fields(example)
+        assert legacy_tables(legacy_fields) == current_tables(fields)
+
+        cases = [
+            ("解析", lambda: legacy_parse(example), lambda: PromptService.parse_json_fields(example)),
+            ("生成表格", lambda: legacy_tables(legacy_fields), lambda: current_tables(fields)),
+            ("合计", lambda: legacy_tables(legacy_parse(example)),
+             lambda: current_tables(PromptService.parse_json_fields(example))),
+        ]
+        for stage, legacy, current in cases:
+            before = best_of(legacy, args.repeat) * 1000
+            after = best_of(current, args.repeat) * 1000
+            print(f"{len(fields):>8} {stage:8} {before:>14.3f} {after:>16.3f} {before / after:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+JSON字段提取基准测试
+对比原有的 json.loads + 递归提取 与流式事件提取在超大报文、超深嵌套和异构大数组下的耗时与内存峰值
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, Any, List, Tuple
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.services.json_fields import JsonFieldExtractor  # noqa: E402
+
+
+def legacy_extract(json_string: str) -> List[Tuple[str, str]]:
+    """原有实现：整体加载后递归提取"""
+    data = json.loads(json_string)
+    fields = []
+
+    def extract_fields(obj, prefix=""):
+        if isinstance(obj, dict):
+            for key, value in obj.items():
+                field_name = f"{prefix}.{key}" if prefix else key
+                if isinstance(value, dict):
+                    fields.append((field_name, "object"))
+                    extract_fields(value, field_name)
+                elif isinstance(value, list):
+                    fields.append((field_name, "array"))
+                    if value and isinstance(value[0], dict):
+                        extract_fields(value[0], f"{field_name}[0]")
+                else:
+                    fields.append((field_name, type(value).__name__))
+        elif isinstance(obj, list) and obj:
+            extract_fields(obj[0], prefix)
+
+    extract_fields(data)
+    return fields
+
+
+def write_large_example(path: str, target_bytes: int) -> int:
+    """生成一个接近目标大小的列表查询响应报文，返回实际字节数"""
+    record = {
+        "id": 0,
+        "orderNo": "SO202401150001",
+        "customer": {"id": 1001, "name": "测试客户", "tags": ["vip", "new"]},
+        "items": [{"sku": "SKU-001", "qty": 2, "price": 19.9, "remark": None}],
+        "paid": True,
+        "createdAt": "2024-01-15T10:00:00"
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"code": 0, "message": "success", "data": {"total": 0, "list": [')
+        written = 0
+        index = 0
+        while written < target_bytes:
+            record["id"] = index
+            chunk = ("," if index else "") + json.dumps(record, ensure_ascii=False)
+            f.write(chunk)
+            written += len(chunk.encode("utf-8"))
+            index += 1
+        f.write("]}}")
+    return os.path.getsize(path)
+
+
+def heterogeneous_example(count: int) -> str:
+    """生成元素字段不一致的大数组：部分字段只在后面的元素中出现，类型逐步放宽"""
+    items = []
+    for i in range(count):
+        item = {"id": i, "name": f"item{i}"}
+        if i % 7 == 3:
+            item["discount"] = 0.5
+        if i % 11 == 5:
+            item["extra"] = {"note": None if i % 2 else "备注"}
+        if i == count - 1:
+            item["id"] = 1.5
+            item["lastOnly"] = True
+        items.append(item)
+    return json.dumps({"data": {"items": items}}, ensure_ascii=False)
+
+
+def deep_example(depth: int) -> str:
+    """生成指定嵌套深度的报文"""
+    return '{"a": ' * depth + "1" + "}" * depth
+
+
+def measure(name: str, func: Callable[[], Any]) -> Dict[str, Any]:
+    """测量耗时与Python内存分配峰值（内存跟踪会拖慢执行，耗时单独测一轮）"""
+    error = None
+    started = time.perf_counter()
+    try:
+        result = func()
+    except RecursionError as e:
+        result, error = None, f"RecursionError: {e}"
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    try:
+        func()
+    except RecursionError:
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    row = {
+        "case": name,
+        "seconds": round(elapsed, 3),
+        "peak_mb": round(peak / 1024 / 1024, 2),
+        "fields": len(result) if result is not None else None,
+        "error": error
+    }
+    status = error or f"{row['fields']} 个字段"
+    print(f"  {name:36} {row['seconds']:>8.3f}s  峰值 {row['peak_mb']:>9.2f}MB  {status}")
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON字段提取基准测试")
+    parser.add_argument("--size-mb", type=float, default=50.0, help="超大报文大小（MB）")
+    parser.add_argument("--depth", type=int, default=5000, help="超深嵌套层数")
+    parser.add_argument("--array-size", type=int, default=100000, help="异构大数组的元素数")
+    parser.add_argument("--output", help="JSON结果输出路径")
+    args = parser.parse_args()
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "large.json")
+        size = write_large_example(path, int(args.size_mb * 1024 * 1024))
+        print(f"📦 超大报文: {size / 1024 / 1024:.1f}MB")
+
+        def stream_file():
+            with open(path, "rb") as f:
+                return JsonFieldExtractor().extract(f)
+
+        rows.append(measure("流式提取（文件流）", stream_file))
+
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        rows.append(measure("流式提取（字符串）", lambda: JsonFieldExtractor().extract(text)))
+        rows.append(measure("原实现 json.loads + 递归", lambda: legacy_extract(text)))
+        del text
+
+    deep = deep_example(args.depth)
+    print(f"🪆 超深嵌套: {args.depth} 层")
+    rows.append(measure("流式提取（不限深度）",
+                        lambda: JsonFieldExtractor(max_depth=args.depth + 1).extract(io.StringIO(deep))))
+    rows.append(measure("流式提取（默认深度上限）", lambda: JsonFieldExtractor().extract(deep)))
+    rows.append(measure("原实现 json.loads + 递归", lambda: legacy_extract(deep)))
+
+    mixed = heterogeneous_example(args.array_size)
+    print(f"🧩 异构数组: {args.array_size} 个元素")
+    rows.append(measure("联合Schema（默认采样上限）", lambda: JsonFieldExtractor().extract(mixed)))
+    rows.append(measure("联合Schema（不限采样）", lambda: JsonFieldExtractor(array_sample=0).extract(mixed)))
+    rows.append(measure("联合Schema（不限采样，流式）",
+                        lambda: JsonFieldExtractor(array_sample=0).extract(io.StringIO(mixed))))
+    rows.append(measure("原实现（只看第一个元素）", lambda: legacy_extract(mixed)))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"size_bytes": size, "depth": args.depth, "array_size": args.array_size, "results": rows}, f, ensure_ascii=False, indent=2)
+        print(f"📄 结果已写入: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+本地模拟大模型服务
+提供与OpenAI Chat Completions兼容的 /v1/chat/completions 接口，
+用于压测和回放时替代真实的AI服务，避免产生真实的调用费用；
+字段映射请求按请求中的建表语句返回真实存在的 表名.字段名，回复能通过流水线的校验
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import sys
+from pathlib import Path
+
+from typing import Dict
+
+import uvicorn
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.services.ddl_parser import ColumnIndex, field_leaf_name  # noqa: E402
+
+# 匹配响应参数表中的数据行：| 字段 | 主数据库源 | 关联数据源 | 逻辑描述 |
+TABLE_ROW_PATTERN = re.compile(r"^\|\s*([^|]+?)\s*\|\s*([^|]*?)\s*\|\s*([^|]*?)\s*\|\s*([^|]*?)\s*\|\s*$")
+# 匹配候选字段表中的数据行：| 字段 | 候选数据库字段 |
+CANDIDATE_ROW_PATTERN = re.compile(r"^\|\s*([^|]+?)\s*\|\s*([^|]*?)\s*\|\s*$")
+# 候选数据库字段单元格中的第一个 表名.字段名（相似度）
+CANDIDATE_SOURCE_PATTERN = re.compile(r"([^\s、（]+\.[^\s、（]+)（")
+# 多个接口有同名字段时字段名后的接口序号
+LABEL_SUFFIX_PATTERN = re.compile(r"（接口\d+）$")
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算token数（中文按字计，其余按4个字符计）"""
+    cjk = sum(1 for ch in text if '一' <= ch <= '鿿')
+    return cjk + max(1, (len(text) - cjk) // 4)
+
+
+def request_section(content: str, title: str) -> str:
+    """请求中一级标题 title 下的内容（到下一个一级标题为止），不存在时返回空字符串"""
+    parts = content.split(f"# {title}\n", 1)
+    if len(parts) < 2:
+        return ""
+    return re.split(r"^# ", parts[1], maxsplit=1, flags=re.MULTILINE)[0]
+
+
+def candidate_sources(content: str) -> Dict[str, str]:
+    """候选字段表中每个响应字段相似度最高的数据库字段（候选按各字段所属接口的表计算）"""
+    sources = {}
+    for line in request_section(content, "候选数据库字段").splitlines():
+        match = CANDIDATE_ROW_PATTERN.match(line.strip())
+        source = CANDIDATE_SOURCE_PATTERN.search(match.group(2)) if match else None
+        if source:
+            sources[match.group(1)] = source.group(1)
+    return sources
+
+
+def build_reply(content: str) -> str:
+    """
+    根据请求内容构造模拟回复
+
+    字段映射请求返回填充后的响应参数表，其余请求返回一段业务逻辑描述。
+    主数据库源取自请求中的建表语句：优先使用候选字段，其次按字段名匹配；都没有时使用同一接口
+    （响应参数表中的同一张表格）已匹配到的表的第一个字段，尚无匹配时按表格序号取对应的表，
+    保证每一行都是真实存在的 表名.字段名
+    """
+    if "接口响应报文格式表" not in content:
+        return "1. 校验请求参数；\n2. 查询主表数据并关联相关表；\n3. 组装响应报文返回。"
+
+    column_index = ColumnIndex.from_ddl_list([request_section(content, "相关表及表模型设计信息")])
+    tables = [table for table in column_index.tables if table.columns]
+    candidates = candidate_sources(content)
+
+    # 每个接口一张表格：(字段名, 主数据库源或None, 逻辑描述)
+    blocks = []
+    for line in request_section(content, "接口响应报文格式表").splitlines():
+        match = TABLE_ROW_PATTERN.match(line.strip())
+        if not match:
+            continue
+        name, _, _, description = match.groups()
+        if name == "响应报文字段":
+            blocks.append([])
+            continue
+        if set(name) <= {"-", " "}:
+            continue
+        if not blocks:
+            blocks.append([])
+        source = candidates.get(name)
+        if source is None:
+            matches = column_index.lookup(field_leaf_name(LABEL_SUFFIX_PATTERN.sub("", name)))
+            source = matches[0].source if matches else None
+        blocks[-1].append((name, source, description))
+
+    rows = ["| 响应报文字段 | 主数据库源 | 关联数据源 | 逻辑描述 |",
+            "| ------------ | ---------- | ---------- | -------- |"]
+    for number, block in enumerate(blocks):
+        matched = next((source for _, source, _ in block if source), None)
+        if matched:
+            table_name = matched.rpartition(".")[0]
+            table = next((table for table in tables if table.name == table_name), None)
+        else:
+            table = tables[min(number, len(tables) - 1)] if tables else None
+        fallback = table.columns[0].source if table else "-"
+        for name, source, description in block:
+            rows.append(f"| {name} | {source or fallback} | - | {description} |")
+    return "\n".join(rows)
+
+
+class FakeLLMApp:
+    """最小化的ASGI应用，模拟Chat Completions接口"""
+
+    def __init__(self, latency: float = 0.2, jitter: float = 0.1, error_rate: float = 0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.request_count = 0
+
+    async def _read_body(self, receive) -> bytes:
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                return body
+
+    async def _send_json(self, send, status: int, payload: dict):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json"),
+                        (b"content-length", str(len(data)).encode())],
+        })
+        await send({"type": "http.response.body", "body": data})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+
+        if scope["method"] == "GET" and scope["path"] == "/health":
+            await self._send_json(send, 200, {"status": "healthy", "requests": self.request_count})
+            return
+
+        if scope["method"] != "POST" or not scope["path"].endswith("/chat/completions"):
+            await self._send_json(send, 404, {"error": {"message": "Not Found"}})
+            return
+
+        self.request_count += 1
+        try:
+            payload = json.loads(await self._read_body(receive) or b"{}")
+        except json.JSONDecodeError:
+            await self._send_json(send, 400, {"error": {"message": "invalid json"}})
+            return
+
+        # 模拟上游延迟
+        delay = max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+        await asyncio.sleep(delay)
+
+        if self.error_rate and random.random() < self.error_rate:
+            await self._send_json(send, 503, {"error": {"message": "fake upstream overloaded"}})
+            return
+
+        messages = payload.get("messages") or [{}]
+        content = messages[-1].get("content", "")
+        reply = build_reply(content)
+        prompt_tokens = estimate_tokens(content)
+        completion_tokens = estimate_tokens(reply)
+
+        await self._send_json(send, 200, {
+            "id": f"fake-{self.request_count}",
+            "object": "chat.completion",
+            "model": payload.get("model", "fake-model"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": reply},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        })
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="本地模拟大模型服务")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址")
+    parser.add_argument("--port", type=int, default=9090, help="监听端口")
+    parser.add_argument("--latency", type=float, default=0.2, help="平均响应延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.1, help="延迟抖动（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="模拟失败比例（0-1）")
+    args = parser.parse_args()
+
+    app = FakeLLMApp(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate)
+    print(f"🤖 模拟大模型服务: http://{args.host}:{args.port}/v1/chat/completions")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning", access_log=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+离线批量Prompt生成脚本
+不启动Web服务（不加载uvicorn、认证和路由），只依赖 PromptService 和数据模型：
+从目录或JSON Lines流中读取接口定义，在进程池中按接口并行渲染基础Prompt，生成一个写出一个。
+输入逐个读取、进程池中排队的任务数有上限，处理数万个接口时内存占用保持平稳
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, TextIO, Tuple
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+# 每个接口通常只渲染一次，缩小各工作进程中的接口渲染缓存（可通过环境变量覆盖）
+os.environ.setdefault("SECTION_CACHE_MAX_BYTES", str(8 * 1024 * 1024))
+
+from app.models import ApiInfo, PromptRequest  # noqa: E402
+from app.services.prompt_service import PromptService  # noqa: E402
+from app.services.api_document import JSON_LINES_SUFFIXES, iter_api_document, iter_json_lines  # noqa: E402
+
+# 目录输入时读取的文件类型
+INPUT_SUFFIXES = {".json"} | JSON_LINES_SUFFIXES
+# 输出文件名中接口名称部分的最大长度
+FILE_NAME_MAX_LENGTH = 80
+
+# 待渲染的一项：(序号, 来源, 接口信息的JSON, 名称, 路由, 错误信息)
+Entry = Tuple[int, str, Optional[str], str, str, Optional[str]]
+
+
+def iter_entries(inputs: List[str]) -> Iterator[Entry]:
+    """按顺序逐个读取输入中的接口（目录递归读取 .json/.jsonl/.ndjson，- 表示从标准输入读取JSON Lines）"""
+    seq = 0
+    for source in inputs:
+        if source == "-":
+            documents = [("<stdin>", iter_json_lines(sys.stdin))]
+        else:
+            path = Path(source)
+            if path.is_dir():
+                files = sorted(p for p in path.rglob("*") if p.is_file() and p.suffix.lower() in INPUT_SUFFIXES)
+                documents = ((str(p.relative_to(path)), iter_api_document(p)) for p in files)
+            elif path.is_file():
+                documents = [(path.name, iter_api_document(path))]
+            else:
+                documents = [(source, iter([(None, "", "", "输入不存在")]))]
+        for name, entries in documents:
+            for payload, api_name, route, error in entries:
+                yield seq, name, payload, api_name, route, error
+                seq += 1
+
+
+def render_chunk(chunk: List[Entry], author: str) -> List[Dict[str, Any]]:
+    """在工作进程中渲染一组接口（每个接口单独生成一个Prompt，单个失败不影响其他接口）"""
+    results = []
+    for seq, source, payload, name, route, _ in chunk:
+        result: Dict[str, Any] = {"index": seq, "source": source, "name": name, "route": route}
+        try:
+            prompt_data = PromptRequest(apis=[ApiInfo.model_validate_json(payload)])
+            result["prompt"] = PromptService.generate_prompt_template(prompt_data, author)
+            result["resolved_fields"], result["total_fields"] = PromptService.count_premapped_fields(prompt_data)
+        except Exception as e:
+            result["error"] = f"生成prompt时出错: {str(e)}"
+        results.append(result)
+    return results
+
+
+class ResultWriter:
+    """逐条写出结果：Markdown文件目录，或JSON Lines（文件或标准输出）"""
+
+    def __init__(self, output_dir: Optional[Path], jsonl: Optional[TextIO]):
+        self.output_dir = output_dir
+        self.jsonl = jsonl
+        self.stats = {"total": 0, "succeeded": 0, "failed": 0}
+
+    @staticmethod
+    def file_name(result: Dict[str, Any]) -> str:
+        """输出文件名：序号-接口名称.md（去掉文件名中不能使用的字符）"""
+        name = re.sub(r"[^\w\-]+", "_", result["name"]).strip("_")[:FILE_NAME_MAX_LENGTH] or "api"
+        return f"{result['index'] + 1:05d}-{name}.md"
+
+    def write(self, result: Dict[str, Any]):
+        self.stats["total"] += 1
+        if "error" in result:
+            self.stats["failed"] += 1
+            print(f"[失败] {result['source']} #{result['index'] + 1} {result['name']}: {result['error']}", file=sys.stderr)
+        else:
+            self.stats["succeeded"] += 1
+            if self.output_dir is not None:
+                (self.output_dir / self.file_name(result)).write_text(result["prompt"], encoding="utf-8")
+        if self.jsonl is not None:
+            self.jsonl.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+
+def chunked(entries: Iterator[Entry], size: int) -> Iterator[List[Entry]]:
+    chunk: List[Entry] = []
+    for entry in entries:
+        chunk.append(entry)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run(args: argparse.Namespace, writer: ResultWriter) -> Dict[str, Any]:
+    """读取输入并渲染，返回统计信息"""
+    started = time.perf_counter()
+    last_report = 0
+
+    def emit(results: List[Dict[str, Any]]):
+        nonlocal last_report
+        for result in results:
+            writer.write(result)
+        if args.progress and writer.stats["total"] - last_report >= args.progress:
+            last_report = writer.stats["total"]
+            elapsed = time.perf_counter() - started
+            print(f"已处理 {last_report} 个接口，{last_report / elapsed:.0f} 个/秒", file=sys.stderr)
+
+    def split_invalid(chunk: List[Entry]) -> List[Entry]:
+        """无法解析的接口直接写出错误，不提交到进程池"""
+        emit([{"index": seq, "source": source, "name": name, "route": route, "error": error}
+              for seq, source, payload, name, route, error in chunk if payload is None])
+        return [entry for entry in chunk if entry[2] is not None]
+
+    chunks = chunked(iter_entries(args.inputs), args.chunk_size)
+    if args.workers <= 1:
+        # 单进程直接渲染，省去进程池的启动和序列化开销
+        for chunk in chunks:
+            emit(render_chunk(split_invalid(chunk), args.author))
+    else:
+        # 每个工作进程最多排队2组，读取输入的速度跟随渲染速度
+        max_pending = args.workers * 2
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            pending: Set[Future] = set()
+            for chunk in chunks:
+                valid = split_invalid(chunk)
+                if valid:
+                    pending.add(pool.submit(render_chunk, valid, args.author))
+                while len(pending) >= max_pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        emit(future.result())
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    emit(future.result())
+
+    elapsed = time.perf_counter() - started
+    return dict(writer.stats, elapsed_seconds=round(elapsed, 3),
+                per_second=round(writer.stats["total"] / elapsed, 1) if elapsed > 0 else 0.0)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="离线批量生成基础Prompt（每个接口一个Prompt）")
+    parser.add_argument("inputs", nargs="+",
+                        help="接口定义：目录（递归读取 .json/.jsonl/.ndjson）、文件，或 - 表示从标准输入读取JSON Lines")
+    parser.add_argument("--output-dir", "-o", type=Path, help="输出目录，每个接口写出一个Markdown文件")
+    parser.add_argument("--jsonl", help="以JSON Lines写出结果（含prompt和错误），- 表示标准输出")
+    parser.add_argument("--author", default=os.getenv("PROMPT_AUTHOR", "CI"), help="Prompt中的开发者名称")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="工作进程数，1表示在当前进程中渲染")
+    parser.add_argument("--chunk-size", type=int, default=32, help="每次提交给工作进程的接口数")
+    parser.add_argument("--progress", type=int, default=1000, help="每处理多少个接口输出一次进度（0表示不输出）")
+    args = parser.parse_args()
+
+    if args.output_dir is None and args.jsonl is None:
+        parser.error("需要指定 --output-dir 或 --jsonl")
+    args.chunk_size = max(1, args.chunk_size)
+    if args.output_dir is not None:
+        args.output_dir.mkdir(parents=True, exist_ok=True)
+
+    jsonl = None
+    if args.jsonl == "-":
+        jsonl = sys.stdout
+    elif args.jsonl:
+        jsonl = open(args.jsonl, "w", encoding="utf-8")
+    try:
+        stats = run(args, ResultWriter(args.output_dir, jsonl))
+    finally:
+        if jsonl is not None and jsonl is not sys.stdout:
+            jsonl.close()
+
+    print(json.dumps(stats, ensure_ascii=False), file=sys.stderr)
+    return 1 if stats["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
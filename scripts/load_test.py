@@ -0,0 +1,496 @@
+#!/usr/bin/env python3
+"""
+端到端压测脚本
+模拟真实用户旅程（注册 -> 登录 -> 配置AI -> 查询用户 -> 生成Prompt -> AI增强生成），
+在可配置的并发下压测一个或多个uvicorn worker，输出可对比的JSON报告
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+import psutil
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+REPORT_VERSION = 1
+# 压测前AI增强生成冒烟检查的最多尝试次数（模拟大模型可配置失败比例）
+SMOKE_CHECK_ATTEMPTS = 3
+
+
+def find_free_port() -> int:
+    """获取一个空闲端口"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """计算已排序序列的百分位数（线性插值）"""
+    if not sorted_values:
+        return 0.0
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    position = (len(sorted_values) - 1) * pct / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    weight = position - lower
+    return sorted_values[lower] * (1 - weight) + sorted_values[upper] * weight
+
+
+def build_api_payload(index: int, fields: int, array_length: int, tables: int) -> dict:
+    """
+    构造单个接口的请求数据
+
+    Args:
+        index: 接口序号
+        fields: 响应报文中每个列表元素的字段数
+        array_length: 响应报文中列表的长度
+        tables: 关联的DDL数量
+    """
+    item = {f"field{i}Name": (i if i % 2 else f"value{i}") for i in range(fields)}
+    response = {"code": 0, "message": "success", "data": {"total": array_length, "list": [item] * array_length}}
+    request = {"pageNum": 1, "pageSize": array_length, "keyword": "test"}
+
+    ddls = []
+    for t in range(tables):
+        columns = ",\n".join(f"  field{i}_name varchar(64) COMMENT '字段{i}'" for i in range(fields))
+        ddls.append(f"CREATE TABLE t_load_{index}_{t} (\n  id bigint NOT NULL,\n{columns},\n  PRIMARY KEY (id)\n) ENGINE=InnoDB;")
+
+    return {
+        "name": f"压测接口{index}",
+        "route": f"POST /api/load/{index}",
+        "request_example": json.dumps(request, ensure_ascii=False, indent=2),
+        "response_example": json.dumps(response, ensure_ascii=False, indent=2),
+        "database_tables": ddls
+    }
+
+
+class Recorder:
+    """按接口汇总请求结果"""
+
+    def __init__(self):
+        # 全部收到响应的请求的耗时（含失败和降级的响应），以及失败请求（含连接错误）的耗时
+        self.latencies: Dict[str, List[float]] = {}
+        self.error_latencies: Dict[str, List[float]] = {}
+        self.successes: Dict[str, int] = {}
+        self.errors: Dict[str, Dict[str, int]] = {}
+        self.bytes_received: Dict[str, int] = {}
+
+    def record(self, name: str, latency: float, ok: bool, status: str, size: int = 0, completed: bool = True):
+        """
+        记录一次请求
+
+        Args:
+            completed: 是否收到了响应（连接错误、超时为False，不计入响应耗时）
+        """
+        self.latencies.setdefault(name, [])
+        self.error_latencies.setdefault(name, [])
+        self.successes.setdefault(name, 0)
+        self.errors.setdefault(name, {})
+        self.bytes_received[name] = self.bytes_received.get(name, 0) + size
+        if completed:
+            self.latencies[name].append(latency)
+        if ok:
+            self.successes[name] += 1
+        else:
+            self.error_latencies[name].append(latency)
+            self.errors[name][status] = self.errors[name].get(status, 0) + 1
+
+    @staticmethod
+    def latency_summary(values: List[float]) -> Dict[str, float]:
+        """耗时分布（毫秒）"""
+        values = sorted(values)
+        return {
+            "mean": round(statistics.fmean(values) * 1000, 2) if values else 0.0,
+            "p50": round(percentile(values, 50) * 1000, 2),
+            "p90": round(percentile(values, 90) * 1000, 2),
+            "p95": round(percentile(values, 95) * 1000, 2),
+            "p99": round(percentile(values, 99) * 1000, 2),
+            "max": round(values[-1] * 1000, 2) if values else 0.0
+        }
+
+    def summary(self, elapsed: float) -> Dict[str, dict]:
+        result = {}
+        for name in sorted(self.latencies):
+            success = self.successes[name]
+            error_count = sum(self.errors[name].values())
+            total = success + error_count
+            result[name] = {
+                "requests": total,
+                "success": success,
+                "errors": error_count,
+                "error_rate": round(error_count / total, 4) if total else 0.0,
+                "error_breakdown": self.errors[name],
+                "throughput_rps": round(success / elapsed, 2) if elapsed else 0.0,
+                "bytes_received": self.bytes_received.get(name, 0),
+                # 全部收到响应的请求（失败和降级的响应也计入，慢的失败不会被隐藏）
+                "latency_ms": self.latency_summary(self.latencies[name]),
+                # 失败请求（含连接错误和超时）单独统计
+                "error_latency_ms": self.latency_summary(self.error_latencies[name])
+            }
+        return result
+
+
+class ResourceSampler(threading.Thread):
+    """周期性采样服务端进程（含子进程）的CPU与内存"""
+
+    def __init__(self, pid: int, interval: float = 0.5):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.cpu_samples: List[float] = []
+        self.rss_samples: List[int] = []
+        self._stop_event = threading.Event()
+
+    def _processes(self) -> List[psutil.Process]:
+        try:
+            root = psutil.Process(self.pid)
+            return [root] + root.children(recursive=True)
+        except psutil.Error:
+            return []
+
+    def run(self):
+        known: Dict[int, psutil.Process] = {}
+        while not self._stop_event.is_set():
+            cpu_total = 0.0
+            rss_total = 0
+            for proc in self._processes():
+                # 复用Process对象，cpu_percent才能计算两次采样之间的差值
+                proc = known.setdefault(proc.pid, proc)
+                try:
+                    cpu_total += proc.cpu_percent(None)
+                    rss_total += proc.memory_info().rss
+                except psutil.Error:
+                    continue
+            self.cpu_samples.append(cpu_total)
+            self.rss_samples.append(rss_total)
+            self._stop_event.wait(self.interval)
+
+    def stop(self) -> dict:
+        self._stop_event.set()
+        self.join(timeout=2)
+        # 第一次采样的cpu_percent恒为0，丢弃
+        cpu = self.cpu_samples[1:] or [0.0]
+        rss = self.rss_samples or [0]
+        return {
+            "pid": self.pid,
+            "samples": len(self.cpu_samples),
+            "cpu_percent_mean": round(statistics.fmean(cpu), 2),
+            "cpu_percent_max": round(max(cpu), 2),
+            "rss_mb_mean": round(statistics.fmean(rss) / 1024 / 1024, 2),
+            "rss_mb_max": round(max(rss) / 1024 / 1024, 2)
+        }
+
+
+class LoadTest:
+    """压测执行器"""
+
+    def __init__(self, args: argparse.Namespace, base_url: str, llm_url: str):
+        self.args = args
+        self.base_url = base_url.rstrip("/")
+        self.llm_url = llm_url
+        self.recorder = Recorder()
+        self.run_id = uuid.uuid4().hex[:8]
+        self.prompt_payload = {
+            "apis": [build_api_payload(i, args.fields, args.array_length, args.tables)
+                     for i in range(args.apis)]
+        }
+        self.payload_bytes = len(json.dumps(self.prompt_payload, ensure_ascii=False).encode("utf-8"))
+
+    async def _call(self, client: httpx.AsyncClient, name: str, method: str, path: str,
+                    expect=(200,), **kwargs) -> Optional[httpx.Response]:
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, self.base_url + path, **kwargs)
+        except httpx.HTTPError as e:
+            self.recorder.record(name, time.perf_counter() - start, False, type(e).__name__, completed=False)
+            return None
+
+        latency = time.perf_counter() - start
+        ok = response.status_code in expect
+        status = str(response.status_code)
+        # 业务接口在HTTP 200时也可能返回 success=false
+        if ok and name.startswith("generate"):
+            try:
+                body = response.json()
+                if not body.get("success"):
+                    ok, status = False, "success_false"
+                elif body.get("error"):
+                    ok, status = False, "degraded"
+            except ValueError:
+                ok, status = False, "invalid_json"
+        self.recorder.record(name, latency, ok, status, len(response.content))
+        return response if ok else None
+
+    def _ai_config(self) -> dict:
+        return {"api_type": "openai", "api_url": self.llm_url, "api_key": "fake-key", "model_name": "fake-model"}
+
+    async def smoke_check(self, attempts: int = SMOKE_CHECK_ATTEMPTS):
+        """
+        压测前执行一次AI增强生成，确认模拟大模型的回复能通过流水线校验（成功且全部字段已填写），
+        避免压测只覆盖失败和补充请求的路径；结果不计入压测统计
+
+        Raises:
+            RuntimeError: 多次尝试均未成功
+        """
+        email = f"load_{self.run_id}_smoke@example.com"
+        password = "loadtest123"
+        async with httpx.AsyncClient(base_url=self.base_url, timeout=self.args.timeout) as client:
+            await client.post("/auth/register", json={"username": f"load_{self.run_id}_smoke",
+                                                      "email": email, "password": password})
+            response = await client.post("/auth/login", json={"email": email, "password": password})
+            response.raise_for_status()
+            headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+            (await client.put("/ai/config", headers=headers, json=self._ai_config())).raise_for_status()
+
+            body: dict = {}
+            for _ in range(attempts):
+                response = await client.post("/prompt-generator/generate-ai", headers=headers,
+                                             json=self.prompt_payload)
+                body = response.json() if response.status_code == 200 else {"error": response.text}
+                if body.get("success") and not body.get("error"):
+                    chunking = body.get("chunking") or {}
+                    print(f"✅ AI增强生成冒烟检查通过（补充请求{chunking.get('retry_rounds', 0)}轮，"
+                          f"未填写字段{chunking.get('unfilled_fields', 0)}个）")
+                    return
+        raise RuntimeError(f"AI增强生成冒烟检查失败: {body.get('error')} chunking={body.get('chunking')}")
+
+    async def _user_journey(self, client: httpx.AsyncClient, user_index: int, deadline: float):
+        email = f"load_{self.run_id}_{user_index}@example.com"
+        password = "loadtest123"
+        username = f"load_{self.run_id}_{user_index}"
+
+        await self._call(client, "register", "POST", "/auth/register", expect=(201,),
+                         json={"username": username, "email": email, "password": password})
+        response = await self._call(client, "login", "POST", "/auth/login",
+                                    json={"email": email, "password": password})
+        if response is None:
+            return
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        if self.args.ai_ratio > 0:
+            await self._call(client, "ai_config", "PUT", "/ai/config", headers=headers, json=self._ai_config())
+
+        iteration = 0
+        while time.perf_counter() < deadline and iteration < self.args.iterations:
+            iteration += 1
+            await self._call(client, "auth_me", "GET", "/auth/me", headers=headers)
+            await self._call(client, "generate", "POST", "/prompt-generator/generate",
+                             headers=headers, json=self.prompt_payload)
+            # 按比例穿插AI增强生成，保证分布可复现
+            if int(iteration * self.args.ai_ratio) > int((iteration - 1) * self.args.ai_ratio):
+                await self._call(client, "generate_ai", "POST", "/prompt-generator/generate-ai",
+                                 headers=headers, json=self.prompt_payload)
+
+    async def run(self) -> dict:
+        limits = httpx.Limits(max_connections=self.args.concurrency * 2,
+                              max_keepalive_connections=self.args.concurrency)
+        async with httpx.AsyncClient(timeout=self.args.timeout, limits=limits) as client:
+            start = time.perf_counter()
+            deadline = start + self.args.duration
+            await asyncio.gather(*[
+                self._user_journey(client, i, deadline) for i in range(self.args.concurrency)
+            ])
+            elapsed = time.perf_counter() - start
+
+        endpoints = self.recorder.summary(elapsed)
+        total_requests = sum(e["requests"] for e in endpoints.values())
+        total_errors = sum(e["errors"] for e in endpoints.values())
+        return {
+            "elapsed_seconds": round(elapsed, 3),
+            "endpoints": endpoints,
+            "totals": {
+                "requests": total_requests,
+                "errors": total_errors,
+                "error_rate": round(total_errors / total_requests, 4) if total_requests else 0.0,
+                "throughput_rps": round((total_requests - total_errors) / elapsed, 2) if elapsed else 0.0
+            }
+        }
+
+
+def wait_for_http(url: str, timeout: float = 30.0):
+    """等待服务可用"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"服务启动超时: {url}")
+
+
+def start_process(name: str, command: List[str], cwd: str) -> subprocess.Popen:
+    """启动子进程，输出写入工作目录下的日志文件"""
+    log_file = open(Path(cwd) / f"{name}.out", "w")
+    return subprocess.Popen(command, cwd=cwd, stdout=log_file, stderr=subprocess.STDOUT)
+
+
+def stop_process(process: Optional[subprocess.Popen]):
+    """终止子进程"""
+    if process is None or process.poll() is not None:
+        return
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def compare_reports(baseline: dict, current: dict):
+    """打印与基线报告的关键指标对比"""
+    print("\n📊 与基线对比 (p95毫秒 / 吞吐rps / 错误率):")
+    for name, cur in current["result"]["endpoints"].items():
+        base = baseline.get("result", {}).get("endpoints", {}).get(name)
+        if not base:
+            print(f"  {name:12} 基线中不存在")
+            continue
+        print(f"  {name:12} p95 {base['latency_ms']['p95']:>9} -> {cur['latency_ms']['p95']:<9} "
+              f"rps {base['throughput_rps']:>8} -> {cur['throughput_rps']:<8} "
+              f"err {base['error_rate']:.2%} -> {cur['error_rate']:.2%}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="AI Prompt Generator 端到端压测")
+    parser.add_argument("--base-url", help="压测已运行的服务地址；不指定时自动启动uvicorn")
+    parser.add_argument("--server-pid", type=int, help="已运行服务的进程ID，用于采样CPU/内存")
+    parser.add_argument("--workers", type=int, default=1, help="自动启动时的uvicorn worker数量")
+    parser.add_argument("--concurrency", type=int, default=10, help="并发虚拟用户数")
+    parser.add_argument("--duration", type=float, default=30.0, help="压测时长（秒）")
+    parser.add_argument("--iterations", type=int, default=10 ** 9, help="每个虚拟用户的最大循环次数")
+    parser.add_argument("--apis", type=int, default=1, help="每次生成请求包含的接口数量")
+    parser.add_argument("--fields", type=int, default=20, help="响应报文中每个列表元素的字段数")
+    parser.add_argument("--array-length", type=int, default=5, help="响应报文中列表的长度")
+    parser.add_argument("--tables", type=int, default=1, help="每个接口关联的DDL数量")
+    parser.add_argument("--ai-ratio", type=float, default=0.2, help="每轮循环中执行AI增强生成的比例（0-1）")
+    parser.add_argument("--llm-url", help="使用外部模拟大模型地址；不指定时自动启动 scripts/fake_llm.py")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="自动启动的模拟大模型平均延迟（秒）")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="自动启动的模拟大模型失败比例")
+    parser.add_argument("--timeout", type=float, default=180.0, help="单个请求超时（秒）")
+    parser.add_argument("--label", default="", help="报告标签，便于区分多次压测")
+    parser.add_argument("--output", default="load_test_report.json", help="JSON报告输出路径")
+    parser.add_argument("--compare", help="基线JSON报告路径，输出关键指标对比")
+    return parser.parse_args()
+
+
+def main():
+    """主函数"""
+    args = parse_args()
+    workdir = tempfile.mkdtemp(prefix="load_test_")
+    server_process = None
+    llm_process = None
+
+    try:
+        llm_url = args.llm_url
+        if args.ai_ratio > 0 and not llm_url:
+            llm_port = find_free_port()
+            llm_process = start_process("fake_llm", [
+                sys.executable, str(project_root / "scripts" / "fake_llm.py"),
+                "--port", str(llm_port), "--latency", str(args.llm_latency),
+                "--error-rate", str(args.llm_error_rate)
+            ], workdir)
+            wait_for_http(f"http://127.0.0.1:{llm_port}/health")
+            llm_url = f"http://127.0.0.1:{llm_port}/v1/chat/completions"
+
+        base_url = args.base_url
+        server_pid = args.server_pid
+        if not base_url:
+            # 在临时目录中启动服务，data/ 与 logs/ 不会污染项目目录
+            port = find_free_port()
+            server_process = start_process("server", [
+                sys.executable, "-m", "uvicorn", "main:app",
+                "--app-dir", str(project_root),
+                "--host", "127.0.0.1", "--port", str(port),
+                "--workers", str(args.workers),
+                "--log-level", "warning", "--no-access-log"
+            ], workdir)
+            base_url = f"http://127.0.0.1:{port}"
+            server_pid = server_process.pid
+            wait_for_http(f"{base_url}/health")
+
+        load_test = LoadTest(args, base_url, llm_url or "")
+        if args.ai_ratio > 0:
+            asyncio.run(load_test.smoke_check())
+        print(f"🚀 压测开始: {base_url} 并发={args.concurrency} 时长={args.duration}s "
+              f"workers={args.workers if not args.base_url else '外部'} 报文={load_test.payload_bytes}字节")
+
+        sampler = ResourceSampler(server_pid) if server_pid else None
+        if sampler:
+            sampler.start()
+        result = asyncio.run(load_test.run())
+        server_stats = sampler.stop() if sampler else None
+
+        report = {
+            "report_version": REPORT_VERSION,
+            "label": args.label,
+            "created_at": datetime.now().isoformat(),
+            "environment": {
+                "python": platform.python_version(),
+                "platform": f"{platform.system()} {platform.release()}",
+                "cpu_count": psutil.cpu_count(),
+            },
+            "config": {
+                "base_url": base_url,
+                "workers": args.workers if not args.base_url else None,
+                "concurrency": args.concurrency,
+                "duration": args.duration,
+                "apis": args.apis,
+                "fields": args.fields,
+                "array_length": args.array_length,
+                "tables": args.tables,
+                "ai_ratio": args.ai_ratio,
+                "llm_latency": args.llm_latency if not args.llm_url else None,
+                "payload_bytes": load_test.payload_bytes
+            },
+            "result": result,
+            "server": server_stats
+        }
+
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+        print("\n" + "=" * 80)
+        for name, stats in result["endpoints"].items():
+            latency = stats["latency_ms"]
+            print(f"  {name:12} 请求 {stats['requests']:>6}  错误率 {stats['error_rate']:>7.2%}  "
+                  f"p50 {latency['p50']:>8}ms  p95 {latency['p95']:>8}ms  p99 {latency['p99']:>8}ms")
+            if stats["errors"]:
+                print(f"  {'':12} 失败请求 p95 {stats['error_latency_ms']['p95']}ms  "
+                      f"max {stats['error_latency_ms']['max']}ms")
+        print(f"  总吞吐: {result['totals']['throughput_rps']} rps, 总错误率: {result['totals']['error_rate']:.2%}")
+        if server_stats:
+            print(f"  服务端CPU: 平均 {server_stats['cpu_percent_mean']}% / 峰值 {server_stats['cpu_percent_max']}%, "
+                  f"内存: 平均 {server_stats['rss_mb_mean']}MB / 峰值 {server_stats['rss_mb_max']}MB")
+        print("=" * 80)
+        print(f"📄 报告已写入: {args.output}")
+
+        if args.compare:
+            with open(args.compare, "r", encoding="utf-8") as f:
+                compare_reports(json.load(f), report)
+
+    finally:
+        stop_process(server_process)
+        stop_process(llm_process)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
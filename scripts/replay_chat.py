@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+AI聊天记录回放脚本
+从结构化聊天记录存储中选取时间窗口内的真实请求，回放到本地模拟大模型或真实AI服务，
+用生产形态的流量对比不同AI服务（模型、地址、网关）的延迟与token用量。
+
+只回放上游调用：记录中保存的是当时发给大模型的最终请求内容，原样重新发送，
+不经过 AIPipelineService 的请求构建、压缩、分块和解析，因此无法衡量流水线本身的改动
+"""
+
+import argparse
+import asyncio
+import json
+import re
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+import httpx
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.services.ai_client import AIClient  # noqa: E402
+from app.services.chat_record_store import ChatRecordStore  # noqa: E402
+from fake_llm import FakeLLMApp  # noqa: E402
+from load_test import percentile  # noqa: E402
+
+RELATIVE_TIME_PATTERN = re.compile(r"^(\d+(?:\.\d+)?)([smhd])$")
+
+
+def parse_time(value: Optional[str]) -> Optional[float]:
+    """解析时间参数：ISO时间（2024-01-15T10:00:00）或相对当前的时间（30m、2h、1d 表示多久之前）"""
+    if not value:
+        return None
+    match = RELATIVE_TIME_PATTERN.match(value)
+    if match:
+        amount, unit = float(match.group(1)), match.group(2)
+        seconds = amount * {"s": 1, "m": 60, "h": 3600, "d": 86400}[unit]
+        return (datetime.now() - timedelta(seconds=seconds)).timestamp()
+    return datetime.fromisoformat(value).timestamp()
+
+
+def summarize(values: List[float]) -> Dict[str, Any]:
+    """延迟统计摘要（毫秒）"""
+    ordered = sorted(values)
+    if not ordered:
+        return {"count": 0}
+    return {
+        "count": len(ordered),
+        "mean": round(statistics.fmean(ordered) * 1000, 2),
+        "p50": round(percentile(ordered, 50) * 1000, 2),
+        "p95": round(percentile(ordered, 95) * 1000, 2),
+        "max": round(ordered[-1] * 1000, 2)
+    }
+
+
+async def replay(records: List[Dict[str, Any]], config: Dict[str, Any], args: argparse.Namespace,
+                 client: Optional[httpx.AsyncClient] = None) -> List[Dict[str, Any]]:
+    """按原始到达间隔（可缩放）或尽快回放记录"""
+    semaphore = asyncio.Semaphore(args.concurrency)
+    results: List[Dict[str, Any]] = []
+    first_ts = records[0]["ts"] if records else 0
+    started = time.perf_counter()
+
+    async def run_one(record: Dict[str, Any]):
+        if args.speed > 0:
+            # 保持生产流量的到达节奏
+            delay = (record["ts"] - first_ts) / args.speed - (time.perf_counter() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        async with semaphore:
+            result = await AIClient.chat_completion(config, record["request"], timeout=args.timeout, client=client)
+        results.append({"original": record, "replayed": result})
+
+    await asyncio.gather(*[run_one(record) for record in records])
+    return results
+
+
+def build_report(results: List[Dict[str, Any]], elapsed: float, args: argparse.Namespace) -> Dict[str, Any]:
+    """按阶段汇总原始与回放的延迟、token和成功率"""
+    stages: Dict[str, Dict[str, List]] = {}
+    for item in results:
+        stage = item["original"].get("stage") or "unknown"
+        bucket = stages.setdefault(stage, {"original": [], "replayed": [], "errors": 0,
+                                           "original_tokens": 0, "replayed_tokens": 0})
+        if item["original"].get("latency") is not None:
+            bucket["original"].append(item["original"]["latency"])
+        bucket["original_tokens"] += (item["original"].get("prompt_tokens") or 0) + \
+            (item["original"].get("completion_tokens") or 0)
+        if item["replayed"]["success"]:
+            bucket["replayed"].append(item["replayed"]["latency"])
+            bucket["replayed_tokens"] += item["replayed"]["prompt_tokens"] + item["replayed"]["completion_tokens"]
+        else:
+            bucket["errors"] += 1
+
+    return {
+        "created_at": datetime.now().isoformat(),
+        # 只重发记录中的最终上游请求，不经过流水线
+        "mode": "provider",
+        "target": args.target,
+        "window": {"start": args.start, "end": args.end, "user": args.user, "stage": args.stage},
+        "records": len(results),
+        "elapsed_seconds": round(elapsed, 3),
+        "stages": {
+            stage: {
+                "original_latency_ms": summarize(bucket["original"]),
+                "replayed_latency_ms": summarize(bucket["replayed"]),
+                "errors": bucket["errors"],
+                "original_tokens": bucket["original_tokens"],
+                "replayed_tokens": bucket["replayed_tokens"]
+            }
+            for stage, bucket in sorted(stages.items())
+        }
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="AI聊天记录回放（原样重发记录中的上游请求，只衡量AI服务）")
+    parser.add_argument("--records-dir", default=str(project_root / "logs" / "chat_records"), help="结构化聊天记录目录")
+    parser.add_argument("--start", help="起始时间：ISO格式或相对时间（如 2h 表示2小时前）")
+    parser.add_argument("--end", help="结束时间：ISO格式或相对时间")
+    parser.add_argument("--user", type=int, help="只回放指定用户的记录")
+    parser.add_argument("--stage", help="只回放指定阶段（response_table / business_logic）")
+    parser.add_argument("--limit", type=int, default=0, help="最多回放的记录数（0表示不限）")
+    parser.add_argument("--target", default="fake", help="回放目标：fake（本地模拟）或Chat Completions接口地址")
+    parser.add_argument("--api-key", default="fake-key", help="真实接口的API密钥")
+    parser.add_argument("--model", help="真实接口的模型名称（默认使用记录中的模型）")
+    parser.add_argument("--fake-latency", type=float, default=0.2, help="本地模拟的平均延迟（秒）")
+    parser.add_argument("--concurrency", type=int, default=4, help="最大并发数")
+    parser.add_argument("--speed", type=float, default=0.0, help="按原始到达间隔回放的倍速（0表示尽快回放）")
+    parser.add_argument("--timeout", type=float, default=60.0, help="单次调用超时（秒）")
+    parser.add_argument("--output", default="replay_report.json", help="JSON报告输出路径")
+    return parser.parse_args()
+
+
+async def main_async(args: argparse.Namespace):
+    store = ChatRecordStore(args.records_dir)
+    records = list(store.iter_records(parse_time(args.start), parse_time(args.end), args.user, args.stage))
+    records = [r for r in records if not r["response"].startswith("错误:")] or records
+    records.sort(key=lambda r: r["ts"])
+    if args.limit:
+        records = records[:args.limit]
+    if not records:
+        print("⚠ 时间窗口内没有可回放的记录")
+        return
+
+    model = args.model or records[0].get("model") or "fake-model"
+    client = None
+    if args.target == "fake":
+        # 进程内调用模拟服务，不经过网络
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=FakeLLMApp(latency=args.fake_latency)))
+        config = {"api_url": "http://fake-llm/v1/chat/completions", "api_key": "fake-key", "model_name": model}
+    else:
+        config = {"api_url": args.target, "api_key": args.api_key, "model_name": model}
+
+    print(f"🔁 回放 {len(records)} 条上游请求 -> {args.target}（并发 {args.concurrency}，倍速 {args.speed or '尽快'}，不经过流水线）")
+    started = time.perf_counter()
+    try:
+        results = await replay(records, config, args, client)
+    finally:
+        if client is not None:
+            await client.aclose()
+    report = build_report(results, time.perf_counter() - started, args)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    for stage, stats in report["stages"].items():
+        original, replayed = stats["original_latency_ms"], stats["replayed_latency_ms"]
+        print(f"  {stage:16} 原始p50 {original.get('p50', '-'):>9}ms p95 {original.get('p95', '-'):>9}ms | "
+              f"回放p50 {replayed.get('p50', '-'):>9}ms p95 {replayed.get('p95', '-'):>9}ms | 失败 {stats['errors']}")
+    print(f"📄 报告已写入: {args.output}")
+
+
+def main():
+    """主函数"""
+    asyncio.run(main_async(parse_args()))
+
+
+if __name__ == "__main__":
+    main()